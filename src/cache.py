@@ -0,0 +1,121 @@
+"""
+The local cache directory, for things that are slow to compute from a file and cheap to keep, like extracted columns.
+
+Everything lives under `$XDG_CACHE_HOME/pprint_problems` (usually `~/.cache/pprint_problems`). Summaries of a file
+are kept with the byte offset they cover and a checksum of the file up to there (see `stamp_prefix`), so that they
+are never used after those bytes change, but can be picked up where they left off after the file is appended to. Each kind of
+entry has its own subdirectory, which is trimmed back under a size limit by deleting the least recently used entries.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+CACHE_NAME = "pprint_problems"
+# The most each subdirectory of the cache can hold, before the least recently used entries are deleted
+MAX_CACHE_SIZE = 1 << 30
+# How much of a file `prefix_checksum` reads at once
+CHECKSUM_CHUNK_SIZE = 1 << 24
+
+# By file: its size and modification time, how many bytes have been checksummed, and the checksum so far
+_running_checksums: dict[str, tuple[tuple[int, int], int, "hashlib._Hash"]] = {}
+
+
+def cache_dir(kind: str) -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+    directory = Path(base) / CACHE_NAME / kind
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def _file_signature(path: str) -> Optional[tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def prefix_checksum(path: str, end: int) -> Optional[str]:
+    """
+    A checksum of the first `end` bytes of the file, or None if it's shorter than that or can't be read. Checksumming
+    a longer prefix of the same version of a file carries on from the last one, instead of reading it all again.
+    """
+    signature = _file_signature(path)
+    if signature is None or signature[0] < end:
+        return None
+    running = _running_checksums.get(os.path.abspath(path))
+    if running is not None and running[0] == signature and running[1] <= end:
+        position, digest = running[1], running[2].copy()
+    else:
+        position, digest = 0, hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f:
+            f.seek(position)
+            while position < end:
+                chunk = f.read(min(CHECKSUM_CHUNK_SIZE, end - position))
+                if not chunk:
+                    return None
+                digest.update(chunk)
+                position += len(chunk)
+    except OSError:
+        return None
+    _running_checksums[os.path.abspath(path)] = (signature, end, digest.copy())
+    return digest.hexdigest()
+
+
+def stamp_prefix(path: str, end: int) -> Optional[dict]:
+    """
+    What identifies the first `end` bytes of the file, for an entry that summarizes them: a checksum of them, and the
+    size and modification time of the whole file. None if the file is shorter than `end` or can't be read.
+    """
+    # Taken before the checksum, so that if the file is appended to in the meantime, it's checked again next time
+    signature = _file_signature(path)
+    checksum = prefix_checksum(path, end)
+    if signature is None or checksum is None:
+        return None
+    return {"offset": end, "checksum": checksum, "size": signature[0], "mtime_ns": signature[1]}
+
+
+def prefix_unchanged(path: str, stamp: dict) -> bool:
+    """
+    Whether the bytes that `stamp_prefix` stamped are still the same. If the file's size and modification time haven't
+    changed, it isn't read at all. Otherwise, like after it's been appended to, the whole prefix is checksummed again,
+    so any change to those bytes is caught. The only change that isn't caught is one that keeps the size and the
+    modification time the same, like restoring the modification time after editing the file in place.
+    """
+    if _file_signature(path) == (stamp["size"], stamp["mtime_ns"]):
+        return True
+    return prefix_checksum(path, stamp["offset"]) == stamp["checksum"]
+
+
+def cache_key(*parts: str) -> str:
+    """A key for anything else, like an object in S3, made from everything that identifies its current version."""
+    return hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def touch(path: Path) -> None:
+    """Marks a cache entry as recently used."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict(directory: Path, max_size: int = MAX_CACHE_SIZE) -> None:
+    """Deletes the least recently used entries in the directory until it holds at most `max_size` bytes."""
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
@@ -0,0 +1,247 @@
+"""
+A catalog of the JSONL files under a directory, kept in the cache directory (see `cache.py`), so that finding the most
+recently modified file, reading a directory with --dataset, and listing one with --list don't walk the whole tree and
+inspect every file on each run.
+
+The catalog remembers the modification time of each directory, along with the JSONL files and subdirectories in it.
+Creating, deleting or renaming anything in a directory changes its modification time, so each directory is checked
+with a single `stat`, and only listed again when that time changes. The files in a changed directory are all checked
+again, but in a directory that hasn't changed, only the `NEWEST_FILES` most recently modified files in the whole
+catalog are, since they're the ones that are likely still being written to. For each file, the catalog also keeps its
+number of lines and a fingerprint of the structure of its first problem, which are only worked out again when the
+file's size or modification time changes.
+
+This means that appending to an older file, in a directory where nothing else changes, isn't noticed: its size,
+number of lines and modification time stay as they were, and it isn't picked as the most recently modified file. Pass
+--refresh-catalog to check every file again.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import time
+from typing import Any
+from typing import Iterator
+from typing import Optional
+
+import json_backend
+from cache import cache_dir, cache_key, evict
+from compressed import CompressedFile, JSONL_SUFFIXES, compression_of
+from printing import print_table, print_text
+from reading import MappedFile
+
+# Bump this when what's stored in the catalog changes, so that old catalogs aren't used
+CATALOG_VERSION = 2
+# Directories modified more recently than this might still be changing within the same timestamp, so they're listed
+# again next time
+RECENT_CHANGE_NS = 2_000_000_000
+# How many of the most recently modified files are checked again on every run, even in directories that haven't changed
+NEWEST_FILES = 16
+
+
+def _shape(value: Any) -> Any:
+    """The structure of a value: its keys and the types of its values, without the values themselves."""
+    if isinstance(value, dict):
+        return {k: _shape(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shape(value[0])] if value else []
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Scores can be 1 in one file and 0.5 in another
+        return "number"
+    return type(value).__name__
+
+
+def schema_fingerprint(problem: Any) -> str:
+    """A short hash of the structure of a problem, which is the same for problems with the same keys and types."""
+    shape = json.dumps(_shape(problem), sort_keys=True)
+    return hashlib.blake2b(shape.encode("utf-8"), digest_size=4).hexdigest()
+
+
+def inspect_file(path: str) -> tuple[int, Optional[str]]:
+    """Counts the lines in a local JSONL file, and fingerprints its first problem (None if it isn't valid JSON)."""
+    source = CompressedFile(path) if compression_of(path) else MappedFile(path)
+    with source:
+        first = next(source.iter_lines(), None)
+        num_lines = source.count_lines()
+    if first is None:
+        return num_lines, None
+    try:
+        return num_lines, schema_fingerprint(json_backend.loads(first[1]))
+    except ValueError:
+        return num_lines, None
+
+
+class Catalog:
+    """The JSONL files under a directory, and what's known about each of them."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        root = os.path.abspath(directory)
+        self.path = cache_dir("catalogs") / f"{cache_key(root, f'catalog-v{CATALOG_VERSION}')}.json"
+        # By path relative to the directory: each directory's modification time, subdirectories, and JSONL files, by
+        # name, with each one's size, modification time, number of lines and fingerprint
+        self.directories: dict[str, dict] = {}
+        # The most recently modified files, newest first, as `[directory, name]`
+        self.newest: list[list[str]] = []
+        self.changed = False
+        try:
+            with open(self.path, "rb") as f:
+                data = json_backend.loads(f.read())
+            self.directories, self.newest = data["directories"], data["newest"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self) -> None:
+        """Writes the catalog back to the cache, if anything changed."""
+        if not self.changed:
+            return
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"directories": self.directories, "newest": self.newest}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: could not save the catalog of {self.directory} in {self.path}: {e}")
+            return
+        self.changed = False
+        evict(self.path.parent)
+
+    def refresh(self, full: bool = False) -> None:
+        """
+        Brings the catalog up to date with what's on disk, only listing the directories that have changed. Unless
+        `full`, the files in directories that haven't changed aren't checked, other than the newest ones.
+        """
+        old_directories = self.directories
+        self.directories = {}
+        newest: dict[str, list[str]] = {}
+        for relative, name in self.newest:
+            newest.setdefault(relative, []).append(name)
+        now = time.time_ns()
+        pending = [""]
+        while pending:
+            relative = pending.pop()
+            full_path = os.path.join(self.directory, relative)
+            try:
+                mtime_ns = os.stat(full_path).st_mtime_ns
+            except OSError:
+                continue
+            entry = old_directories.get(relative)
+            if entry is None or entry["mtime_ns"] != mtime_ns:
+                old_files = entry["files"] if entry is not None else {}
+                entry = self._list_directory(full_path, mtime_ns, now)
+                entry["files"] = self._check_files(relative, entry["files"], old_files)
+                self.changed = True
+            elif full:
+                entry["files"] = self._check_files(relative, list(entry["files"]), entry["files"])
+            elif relative in newest:
+                entry["files"].update(self._check_files(relative, newest[relative], entry["files"]))
+            self.directories[relative] = entry
+            # Reversed, so they're popped in sorted order
+            pending.extend(os.path.join(relative, name) for name in reversed(entry["subdirectories"]))
+        if self.directories.keys() != old_directories.keys():
+            self.changed = True
+        if self.changed:
+            files = (
+                (file["mtime_ns"], relative, name)
+                for relative, entry in self.directories.items()
+                for name, file in entry["files"].items()
+            )
+            self.newest = [[relative, name] for _, relative, name in heapq.nlargest(NEWEST_FILES, files)]
+
+    @staticmethod
+    def _list_directory(full_path: str, mtime_ns: int, now: int) -> dict:
+        files, subdirectories = [], []
+        try:
+            with os.scandir(full_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.name)
+                    elif entry.name.endswith(JSONL_SUFFIXES) and entry.is_file():
+                        files.append(entry.name)
+        except OSError:
+            pass
+        # A directory that was just modified might change again without its modification time changing
+        recent = now - mtime_ns < RECENT_CHANGE_NS
+        return {"mtime_ns": None if recent else mtime_ns, "files": sorted(files), "subdirectories": sorted(subdirectories)}
+
+    def _check_files(self, relative: str, names: list[str], old_files: dict[str, dict]) -> dict[str, dict]:
+        """The entries of the named files in a directory, keeping the old ones of the files that haven't changed."""
+        files = {}
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.directory, relative, name))
+            except OSError:
+                continue
+            entry = old_files.get(name)
+            if entry is None or (entry["size"], entry["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "lines": None, "fingerprint": None}
+                self.changed = True
+            files[name] = entry
+        return files
+
+    def files(self) -> Iterator[tuple[str, dict]]:
+        """Each file's path relative to the directory, and what's known about it, in the order of a sorted walk."""
+        for relative, entry in self.directories.items():
+            for name, file in entry["files"].items():
+                yield os.path.join(relative, name), file
+
+    def paths(self) -> list[str]:
+        """The files, in the order that a sorted walk of the directory would find them."""
+        return [os.path.join(self.directory, relative) for relative, _ in self.files()]
+
+    def most_recent(self) -> Optional[str]:
+        """The most recently modified file, or None if there aren't any."""
+        if not self.newest:
+            return None
+        return os.path.join(self.directory, *self.newest[0])
+
+    def inspect(self) -> None:
+        """Counts the lines and fingerprints the first problem of every file that hasn't been since it changed."""
+        for relative, entry in self.files():
+            if entry["lines"] is None:
+                try:
+                    entry["lines"], entry["fingerprint"] = inspect_file(os.path.join(self.directory, relative))
+                except (OSError, EOFError, ValueError, UnicodeDecodeError):
+                    entry["lines"], entry["fingerprint"] = 0, None
+                self.changed = True
+
+
+def load_catalog(directory: str, refresh: bool = False) -> Catalog:
+    """The catalog of a directory, brought up to date, checking every file again if `refresh`."""
+    catalog = Catalog(directory)
+    catalog.refresh(full=refresh)
+    catalog.save()
+    return catalog
+
+
+def directory_files(directory: str, refresh: bool = False) -> list[str]:
+    """Every JSONL file in the directory and its subdirectories, in sorted order."""
+    return load_catalog(directory, refresh).paths()
+
+
+def most_recent_file(directory: str, refresh: bool = False) -> Optional[str]:
+    """The most recently modified JSONL file in the directory and its subdirectories, or None if there aren't any."""
+    return load_catalog(directory, refresh).most_recent()
+
+
+def _format_size(size: int) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def print_catalog(directory: str, refresh: bool = False) -> None:
+    """Prints a table of the JSONL files in the directory, most recently modified first."""
+    catalog = Catalog(directory)
+    catalog.refresh(full=refresh)
+    catalog.inspect()
+    catalog.save()
+    rows = []
+    for relative, entry in sorted(catalog.files(), key=lambda item: -item[1]["mtime_ns"]):
+        modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["mtime_ns"] / 1e9))
+        rows.append([modified, _format_size(entry["size"]), str(entry["lines"]), entry["fingerprint"] or "-", relative])
+    print_table(["Modified", "Size", "Problems", "Schema", "File"], rows, right_aligned=[1, 2])
+    fingerprints = {entry["fingerprint"] for _, entry in catalog.files() if entry["fingerprint"]}
+    print_text(f"{len(rows)} files with {len(fingerprints)} different schemas in {directory}")
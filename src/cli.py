@@ -35,26 +35,72 @@ Here are some recommended ways to use this script:
 10. Graph the distribution of a particular key:
     pprint_problems mydata.jsonl --graph --parts vocab_size
 
-11. Print stats, similarly to graphing:
+11. Print stats, similarly to graphing (values read from a whole file are cached, so reruns on the same file are instant, and reruns after it grows only read the new lines):
     pprint_problems mydata.jsonl --stats --parts vocab_size
 
 12. Print the structure, along with stats about the ranges of values:
     pprint_problems mydata.jsonl --structure --ranges
+
+13. Build a line index once, so later runs on a big file can jump straight to any problem:
+    pprint_problems big.jsonl --build-index -n 0
+    pprint_problems big.jsonl --start 4000000 -n 1
+
+14. Select problems by the values of their fields:
+    pprint_problems results.jsonl --where 'is_correct == false and doc/difficulty > 3' -p doc_id doc/question
+
+15. Build a search index for a file you search often (rerun it after the file grows to index the new data):
+    pprint_problems big.jsonl --build-search-index -n 0
+    pprint_problems big.jsonl --search marble -n 3
+
+16. Print the union of the structures of every problem, including optional keys and mixed types:
+    pprint_problems results.jsonl --union --schema-stable 1000
+
+17. Read gzip or zstd compressed files directly, and index where their pieces start to jump into them:
+    pprint_problems results.jsonl.gz --build-index -n 0
+    pprint_problems results.jsonl.gz --start 4000000 -n 1
+
+18. Read a file from S3, only fetching the parts that are needed (index it once to jump straight to any problem):
+    pprint_problems s3://my-bucket/results.jsonl -n 3
+    pprint_problems s3://my-bucket/results.jsonl --build-index -n 0
+    pprint_problems s3://my-bucket/results.jsonl -r -n 5
+
+19. Read every file of a sweep as one dataset, labelling problems with their file and line:
+    pprint_problems sweep/ --dataset --search marble -n 3
+    pprint_problems 'sweep/**/*.jsonl.gz' --stats --parts model --y_value score
+
+20. List the jsonl files in a directory, newest first, with their numbers of problems and schema fingerprints:
+    pprint_problems sweep/ --list
+
+21. Follow a file while it's being written, printing new problems as they land, or keeping stats up to date:
+    pprint_problems samples.jsonl --follow -n 0 --search marble -p doc_id response
+    pprint_problems samples.jsonl --follow --stats --parts model --y_value score
 """
 
 
 import argparse
+import itertools
 import os
 import random
 import sys
 
-from parsing import process_file, COMMON_LOCATIONS
+from parsing import COMMON_LOCATIONS
 from printing import (
     print_text, print_file_output,
-    configure_console, set_max_print_len, WIDTH
+    configure_console, choose_renderer, set_max_print_len, WIDTH, RENDERERS
 )
 from parsing import iterate_over_problems, print_structure
-from graphing import main as graph_main, ALL_GRAPHING_PARAMS
+from reading import MappedFile, iter_lines, search_lines, search_file, select_lines, reservoir_sample
+from catalog import most_recent_file as most_recent_file_in, print_catalog
+from compressed import (
+    CompressedFile, build_checkpoint_index, compression_of, compression_of_data, load_checkpoint_index
+)
+from object_store import S3Object, build_remote_index, is_s3_url, load_remote_index
+from follow import FollowedFile, POLL_INTERVAL
+from shards import expand_inputs, is_dataset, iter_shard_lines
+from indexing import build_index, load_index
+from query import Query
+from search_index import build_search_index, load_search_index
+import json_backend
 
 
 def main() -> None:
@@ -69,11 +115,32 @@ def main() -> None:
     # Add all existing arguments to both main parser and print parser for backwards compatibility
     group = parser.add_argument_group("Main Arguments")
     group.add_argument(
-        "file",
-        nargs="?",
+        "files",
+        nargs="*",
         type=str,
-        default=sys.stdin,
-        help="The file to process. This may be an S3 location. Defaults to stdin. If you pass in a directory, this will process the most recently modified jsonl file in that directory.",
+        metavar="file",
+        help="The file to process. This may be an S3 location, or compressed with gzip (.gz) or zstd (.zst). Defaults to stdin. If you pass in a directory, this will process the most recently modified jsonl file in that directory. If you pass in several files, globs (like 'sweep/*.jsonl', quoted) or directories with --dataset, they're all read as one dataset, and each problem is labelled with its file and line.",
+    )
+    group.add_argument(
+        "--dataset",
+        action="store_true",
+        help="Read every jsonl file in the directories that are passed in, instead of only the most recently modified one.",
+    )
+    group.add_argument(
+        "--list",
+        action="store_true",
+        help="List the jsonl files in a directory (the current one by default), most recently modified first, with their sizes, numbers of problems and schema fingerprints. Files with the same fingerprint have the same keys and types. What's found is kept in the cache directory, so listing again is fast.",
+    )
+    group.add_argument(
+        "--refresh-catalog",
+        action="store_true",
+        help="Check every jsonl file in the directory again, when finding the most recently modified one, reading it with --dataset or listing it with --list. Otherwise, only the files in subdirectories that have had files added, removed or renamed, and the most recently modified files, are checked, so appending to an older file in a subdirectory where nothing else changed isn't noticed.",
+    )
+    group.add_argument(
+        "--s3-endpoint-url",
+        type=str,
+        default=os.environ.get("PPRINT_PROBLEMS_S3_ENDPOINT_URL"),
+        help="The endpoint to use for s3:// files, for S3-compatible stores like MinIO. Defaults to $PPRINT_PROBLEMS_S3_ENDPOINT_URL, and otherwise to whatever boto3 is configured to use.",
     )
     group.add_argument("--dir_most_recent", type=str, help="Deprecated. You can now pass a directory directly as the file without this flag.")
     group.add_argument(
@@ -88,12 +155,41 @@ def main() -> None:
     group.add_argument("-n", "--number", type=int, help="Number of problems to print (defaults to all)")
     group.add_argument("--start", "-s", type=int, default=0, help="Start at this index (inclusive, 0-indexed).")
     group.add_argument("--search", type=str, help="Only include problems that contain this string in the JSON")
+    group.add_argument(
+        "--where",
+        type=str,
+        help='Only include problems matching this expression over their fields, using the same slash paths as --parts. For example: --where \'is_correct == false and doc/difficulty > 3\'. Supports ==, !=, <, <=, >, >=, contains, in, ~ (regex), and, or, not, and parentheses.',
+    )
     group.add_argument("-r", "--randomize", action="store_true", help="Randomize the order of the problems")
+    group.add_argument("--seed", type=int, help="Random seed for --randomize, to get the same problems every time.")
     group.add_argument(
         "--renumber",
         action="store_true",
         help="This only makes a difference with --randomize. If set, it renumbers problems from 1 to N. Otherwise, it keeps the original indexes.",
     )
+    group.add_argument(
+        "--no-count",
+        action="store_true",
+        help="Don't count the problems in the file before printing. Counting is a fast separate pass, but it still reads the whole file.",
+    )
+    group.add_argument(
+        "--build-index",
+        action="store_true",
+        help="Build (or rebuild) a line offset index next to the file, as <file>.ppidx. Later runs use it to count problems instantly and jump straight to --start or random problems. For compressed files, this indexes where each gzip member or zstd frame starts, so that only the parts that are needed are decompressed. For s3:// files, the index is kept in the cache directory, and lets problems be fetched on their own.",
+    )
+    group.add_argument(
+        "--build-search-index",
+        action="store_true",
+        help="Build or update a trigram index next to the file, as <file>.pptri, so that later --search and --where runs only scan the parts of the file that can match. Appended data is indexed incrementally.",
+    )
+    group.add_argument("--no-index", action="store_true", help="Don't use or build the line offset or search indexes, even if they exist. Overrides --build-index and --build-search-index.")
+    group.add_argument(
+        "-f",
+        "--follow",
+        action="store_true",
+        help="Keep reading a local file as it's written, like `tail -f`, until interrupted with Ctrl-C. The problems already in the file are selected as usual (use -n 0 to skip them), then every new problem that matches --search and --where is printed as it lands. With --stats or --graph, the stats or graphs are updated as new results arrive, without reading the file again.",
+    )
+    group.add_argument("--follow-interval", type=float, default=POLL_INTERVAL, help=f"How often --follow checks for new lines, in seconds (defaults to {POLL_INTERVAL}).")
 
     group = parser.add_argument_group("Printing Options")
     group.add_argument("-l", "--line-numbers", action="store_true", help="Print line numbers in the code blocks")
@@ -104,12 +200,29 @@ def main() -> None:
         help="Print the structure of the loaded data instead of printing the contents",
     )
     group.add_argument("--ranges", action="store_true", help="Like --structure, and also print the ranges of the data.")
+    group.add_argument(
+        "--union",
+        action="store_true",
+        help="Like --structure, but merge the structures of all of the selected problems, showing optional keys, mixed types and how often each appears. Use -n (and -r) to only look at a sample. Can be combined with --ranges.",
+    )
+    group.add_argument(
+        "--schema-stable",
+        type=int,
+        metavar="N",
+        help="With --union, stop reading once N problems in a row haven't added any new keys or types.",
+    )
     group.add_argument(
         "--raw",
         action="store_true",
         help="Print the raw JSONL data instead of pretty printing it. This ignores the --parts flag.",
     )
     group.add_argument("--max-str-len", type=int, help="Maximum length of strings in raw mode.")
+    group.add_argument(
+        "--renderer",
+        choices=RENDERERS,
+        default="auto",
+        help='How to render output. "rich" has markdown and syntax highlighting, and "plain" writes the text as it is, which is much faster for big dumps. "auto" (the default) uses rich in a terminal or with --file-output, and plain when the output is piped or redirected.',
+    )
 
     group = parser.add_argument_group("Filtering")
     group.add_argument(
@@ -121,7 +234,7 @@ def main() -> None:
     group.add_argument(
         "--file-output",
         type=str,
-        help='Output file for filtered problems. Defaults to text but will write html if the file name ends with ".html". Overwrites.',
+        help='Output file for filtered problems. Defaults to text but will write html if the file name ends with ".html". Overwrites. Needs the rich renderer.',
     )
 
     # Graphing
@@ -146,56 +259,328 @@ def main() -> None:
     # Summary statistics
     group = parser.add_argument_group("Miscellaneous Options")
     group.add_argument("--summary", action="store_true", help="Print summary statistics about the data")
+    group.add_argument(
+        "--json-backend",
+        type=str,
+        choices=["auto"] + json_backend.BACKENDS,
+        default="auto",
+        help="JSON library used to decode problems. \"auto\" uses the fastest one installed (orjson, ujson, simdjson), falling back to the standard library. Problems are always encoded with the standard library, so the output is the same either way.",
+    )
+    group.add_argument("--json-benchmark", action="store_true", help="Time decoding the selected problems with every installed JSON library, instead of printing them.")
+    group.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        help="Number of worker processes to use for each stage. By default: searching a file and summarizing it for --ranges use one per CPU when it's over 64MB; reading several files uses one per CPU, but at most one per file, when they add up to over 64MB; and rendering problems with rich uses one per CPU only when at least 64 problems are known to be printed (from -n or the number of problems, without --search or --where). Giving --jobs uses that many for every stage. Use 1 to disable. Stdin is always read by a single process.",
+    )
+    group.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't use or update the cache of values extracted for --stats and --graph, and of the summaries for --ranges, in $XDG_CACHE_HOME/pprint_problems (usually ~/.cache/pprint_problems). After a file is appended to, what's cached for it is picked up where it left off, so only the new lines are read.",
+    )
 
     args = parser.parse_args()
+    try:
+        args.query = Query(args.where) if args.where else None
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        json_backend.set_backend(args.json_backend)
+    except ImportError:
+        parser.error(f"The {args.json_backend} JSON library is not installed.")
 
     # Configure printing
+    if args.file_output and choose_renderer(args) != "rich":
+        if args.renderer == "plain":
+            parser.error(
+                "--file-output needs the rich renderer, so it can't be used with --renderer plain. "
+                "Redirect the output with `> output.txt` instead."
+            )
+        parser.error("--file-output needs the rich package. Install it, or redirect the output with `> output.txt` instead.")
     configure_console(args)
     if args.max_str_len:
         set_max_print_len(args.max_str_len)
 
+    if args.list:
+        directory = args.files[0] if args.files else "."
+        if len(args.files) > 1 or not os.path.isdir(directory):
+            parser.error("--list needs a single directory.")
+        print_catalog(directory, args.refresh_catalog)
+        return
+
+    args.file = sys.stdin
+    # How many problems the file has, when that's known before reading it
+    args.num_problems = None
+    if args.files and is_dataset(args.files, args.dataset):
+        try:
+            args.file = expand_inputs(args.files, args.s3_endpoint_url, args.refresh_catalog)
+        except (ImportError, ValueError) as e:
+            parser.error(str(e))
+        if not args.file:
+            parser.error(f"No jsonl files found in {' '.join(args.files)}")
+    elif args.files:
+        args.file = args.files[0]
+
     # Check args.dir_most_recent
-    if os.path.isdir(args.file) or args.dir_most_recent:
-        if os.path.isdir(args.file):
+    if isinstance(args.file, list):
+        pass
+    elif (args.file != sys.stdin and os.path.isdir(args.file)) or args.dir_most_recent:
+        if args.file != sys.stdin and os.path.isdir(args.file):
             args.dir_most_recent = args.file
         else:
             assert args.file == sys.stdin, "Cannot specify both --dir_most_recent and a file."
-        most_recent_file = max(
-            (os.path.join(root, f) for root, _, files in os.walk(args.dir_most_recent) for f in files if f.endswith('.jsonl')),
-            key=os.path.getmtime
-        )
+        most_recent_file = most_recent_file_in(args.dir_most_recent, args.refresh_catalog)
+        if most_recent_file is None:
+            parser.error(f"No jsonl files found in {args.dir_most_recent}")
         print(f"Using most recently modified jsonl file: {most_recent_file}")
         args.file = most_recent_file
 
-    if args.file == sys.stdin:
-        file_contents = process_file(sys.stdin)
-    elif args.file.lower().startswith("s3://"):
-        raise NotImplementedError("S3 support is not yet implemented.")
+    if args.follow:
+        if not isinstance(args.file, str) or is_s3_url(args.file) or not os.path.isfile(args.file) or compression_of(args.file):
+            parser.error("--follow needs a single local, uncompressed file.")
+        if args.randomize or args.structure or args.ranges or args.union or args.json_benchmark:
+            parser.error("--follow can't be used with --randomize, --structure, --ranges, --union or --json-benchmark.")
+
+    try:
+        if isinstance(args.file, list):
+            print_text(f"Found {len(args.file)} files")
+            process_problems(args, select_shard_problems(args, args.file), shards=args.file)
+        elif args.follow:
+            with FollowedFile(args.file, args.follow_interval) as followed:
+                process_followed_file(args, followed)
+        elif args.file == sys.stdin:
+            process_problems(args, select_problems(args, sys.stdin))
+        elif is_s3_url(args.file):
+            try:
+                remote = S3Object(args.file, args.s3_endpoint_url)
+            except (ImportError, ValueError, OSError) as e:
+                parser.error(str(e))
+            with remote:
+                process_remote_file(args, remote)
+        elif compression_of(args.file):
+            try:
+                compressed = CompressedFile(args.file)
+            except ImportError as e:
+                parser.error(str(e))
+            with compressed:
+                index = None
+                if args.no_index:
+                    pass
+                elif args.build_index:
+                    index = build_checkpoint_index(compressed)
+                else:
+                    index = load_checkpoint_index(args.file)
+                if args.build_search_index and not args.no_index:
+                    print_text("Search indexes aren't supported for compressed files, so the whole file will be searched.")
+                if index is not None:
+                    args.num_problems = len(index)
+                    if not args.no_count:
+                        print_text(f"Found {len(index)} problems")
+                process_problems(args, select_problems(args, compressed, index))
+        elif not os.path.isfile(args.file):
+            # Pipes and other special files can't be memory-mapped, so read them as a stream
+            with open(args.file, "r") as file:
+                process_problems(args, select_problems(args, file))
+        else:
+            # Else read local file
+            index = None
+            if args.no_index:
+                pass
+            elif args.build_index:
+                index = build_index(args.file)
+            else:
+                index = load_index(args.file)
+            with MappedFile(args.file) as mapped:
+                search_index = None
+                if args.no_index:
+                    pass
+                elif args.build_search_index:
+                    search_index = build_search_index(args.file)
+                elif args.search or args.query:
+                    search_index = load_search_index(args.file)
+                if index is not None:
+                    args.num_problems = len(index)
+                elif not args.no_count:
+                    args.num_problems = mapped.count_lines()
+                if not args.no_count:
+                    print_text(f"Found {args.num_problems} problems")
+                process_problems(args, select_problems(args, mapped, index, search_index), mapped)
+    finally:
+        # Finish the file even if we're interrupted, so it has everything up to that point
+        print_file_output(args)
+
+
+def process_remote_file(args, remote: S3Object) -> None:
+    """Prints problems from an object in S3, which is only fetched as far as it needs to be."""
+    kind = compression_of_data(remote.read_range(0, 4))
+    if kind is not None:
+        # Checkpoint indexes are only kept next to local files, so compressed objects are always read from the start
+        process_problems(args, select_problems(args, CompressedFile(args.file, kind, remote)))
+        return
+    index = None
+    if args.no_index:
+        pass
+    elif args.build_index:
+        index = build_remote_index(remote)
     else:
-        # Else read local file
-        with open(args.file, "r") as file:
-            file_contents = process_file(file)
-
-    problems = file_contents
-    lines = list(enumerate(problems.rstrip().split("\n")))
-    total_num_problems = len(lines)
-    print_text(f"Found {total_num_problems} problems")
-    if args.randomize:
-        random.shuffle(lines)
+        index = load_remote_index(remote)
+    if index is not None:
+        args.num_problems = len(index)
+        if not args.no_count:
+            print_text(f"Found {len(index)} problems")
+    process_problems(args, select_problems(args, remote, index))
+
+
+def shuffle_lines(args, lines, rng: random.Random) -> list:
+    """Puts the lines in a random order, only keeping as many in memory as we're going to print when possible."""
+    if args.number is not None:
+        return reservoir_sample(lines, (args.start or 0) + args.number, rng)
+    # Shuffling needs every line in memory
+    lines = list(lines)
+    if args.search or args.query:
+        print_text(f"After searching, found {len(lines)} problems")
+    rng.shuffle(lines)
+    return lines
+
+
+def filter_lines(args, lines):
+    """Only keeps the lines that match --search and --where."""
     if args.search:
-        lines = [(num, line) for num, line in lines if args.search in line]
-        print_text(f"After searching, found {total_num_problems} problems")
-    if args.start:
-        lines = lines[args.start :]
-    if args.number:
-        lines = lines[: args.number]
-
-    if args.structure or args.ranges:
-        print_structure(args, lines, args.ranges)
-    elif args.stats:
-        graph_main(args)
-    elif args.graph:
-        graph_main(args)
+        lines = search_lines(lines, args.search)
+    if args.query:
+        lines = args.query.filter_lines(lines)
+    return lines
+
+
+def select_problems(args, source, index=None, search_index=None):
+    """Lazily picks the lines selected by --search, --where, --randomize, --start and --number."""
+    rng = random.Random(args.seed)
+    start = args.start or 0
+    if isinstance(source, (CompressedFile, S3Object)) and index is not None and not (args.search or args.query):
+        return select_indexed_lines(args, source, index, rng)
+    if not isinstance(source, MappedFile):
+        # Streams like stdin can only be read once, from the start
+        lines = source.iter_lines() if isinstance(source, (CompressedFile, S3Object)) else iter_lines(source)
+        lines = filter_lines(args, lines)
+        if args.randomize:
+            lines = shuffle_lines(args, lines, rng)
+        return select_lines(lines, start, args.number)
+
+    if args.search or args.query:
+        if args.search:
+            lines = search_file(source, args.search, args.jobs, search_index)
+        elif args.query.required_literals:
+            # Jump straight to the lines that could possibly match
+            lines = search_file(source, args.query.required_literals[0], args.jobs, search_index)
+        else:
+            lines = source.iter_lines()
+        if args.query:
+            lines = args.query.filter_lines(lines)
+        if args.randomize:
+            lines = shuffle_lines(args, lines, rng)
+        return select_lines(lines, start, args.number)
+    if args.randomize:
+        # Pick line offsets, and only decode the lines that were picked
+        if index is not None:
+            # Sampled the same way as without the index, so that building one doesn't change what --seed picks
+            picks = shuffle_lines(args, index.nonblank_lines(), rng)
+            starts = [(int(i), index.offset(int(i))) for i in picks]
+        else:
+            starts = shuffle_lines(args, source.iter_line_starts(), rng)
+        # Blank lines were never picked, so every pick is printed
+        lines = ((i, source.line_at(offset)) for i, offset in starts)
+        return select_lines(lines, start, args.number)
+    # Seek straight to the first requested line instead of reading everything before it
+    offset = index.offset(start) if index is not None else source.line_offset(start)
+    return select_lines(source.iter_lines(offset, start), 0, args.number)
+
+
+def select_shard_problems(args, shards: list[str]):
+    """Like `select_problems`, for the lines of several files, labelled with the file and line they're from."""
+    lines = iter_shard_lines(args, shards)
+    if args.randomize:
+        lines = shuffle_lines(args, lines, random.Random(args.seed))
+    return select_lines(lines, args.start or 0, args.number)
+
+
+def select_followed_lines(args, followed: FollowedFile):
+    """
+    Yields the lines that are already in the file and selected by --search, --where, --start and --number, then waits
+    for more to be written, and yields each set of new lines that match --search and --where.
+    """
+    existing = followed.iter_new_lines()
+    yield select_lines(filter_lines(args, existing), args.start or 0, args.number)
+    # Skip whatever wasn't selected, so that only the lines written from now on are read next
+    for _ in existing:
+        pass
+    while True:
+        followed.wait()
+        yield filter_lines(args, followed.iter_new_lines())
+
+
+def process_followed_file(args, followed: FollowedFile) -> None:
+    """Prints problems or stats for a file as it's written, until interrupted."""
+    batches = select_followed_lines(args, followed)
+    try:
+        if args.stats or args.graph:
+            from graphing import follow as graph_follow
+            graph_follow(args, batches)
+        else:
+            iterate_over_problems(args, itertools.chain.from_iterable(batches))
+    except KeyboardInterrupt:
+        pass
+    print_text(f"Stopped following {args.file} after {followed.index} lines")
+
+
+def select_indexed_lines(args, source, index, rng: random.Random):
+    """
+    Picks lines from a compressed file with a checkpoint index, or an object in S3 with a line index, only reading
+    the parts of it that have the selected lines.
+    """
+    start = args.start or 0
+    if args.randomize:
+        # Sampled the same way as when reading every line, so that building an index doesn't change what --seed picks
+        picks = [int(i) for i in shuffle_lines(args, index.nonblank_lines(), rng)]
+        if isinstance(source, S3Object):
+            # Each line is fetched on its own, so they can be fetched in the order they're printed
+            return select_lines(source.lines_at(picks, index), start, args.number)
+        # Decompress the picked lines in file order, then put them back in random order
+        found = dict(source.lines_at(sorted(picks), index))
+        lines = ((i, found[i]) for i in picks)
+        return select_lines(lines, start, args.number)
+    if isinstance(source, S3Object):
+        return select_lines(source.iter_lines(index.offset(start), start), 0, args.number)
+    return select_lines(source.iter_lines(start, index), 0, args.number)
+
+
+def selects_every_line(args) -> bool:
+    """Whether every line is selected, in any order."""
+    return not (args.search or args.query or args.start or args.number is not None)
+
+
+def reads_whole_file(args) -> bool:
+    """Whether every line of a regular file is selected, so that values extracted from them can be cached."""
+    if args.no_cache or not isinstance(args.file, str) or not os.path.isfile(args.file):
+        return False
+    return selects_every_line(args)
+
+
+def process_problems(args, lines, mapped=None, shards=None) -> None:
+    """
+    Prints whatever was asked for about the selected lines. `mapped` is the file they came from, if it's a regular
+    file, and `shards` are the files they came from, if there are several. Either lets summaries of every line be
+    computed in parallel.
+    """
+    if not selects_every_line(args):
+        mapped = shards = None
+    if args.json_benchmark:
+        json_backend.benchmark(lines)
+    elif args.structure or args.ranges or args.union:
+        print_structure(args, lines, args.ranges, mapped, shards)
+    elif args.stats or args.graph:
+        # matplotlib and scipy are slow to import, so only load them when they're needed
+        from graphing import main as graph_main
+        graph_main(args, lines, args.file if reads_whole_file(args) else None, shards)
     elif args.summary:
         raise NotImplementedError("Summary statistics are not yet implemented.")
 
@@ -205,9 +590,5 @@ def main() -> None:
     else:
         iterate_over_problems(args, lines)
 
-    if args.file_output:
-        print_file_output(args)
-
-
 if __name__ == "__main__":
     main()
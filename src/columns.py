@@ -0,0 +1,283 @@
+"""
+Columnar storage of the values that `--stats` and `--graph` group by.
+
+Every requested param is pulled out of each problem in a single pass, and stored as integer codes into the list of its
+distinct values, like a categorical column in a data frame. Grouping by a param is then a few NumPy operations on the
+codes, instead of Python loops over every problem for every param.
+
+Columns extracted from a whole file are also cached (see `cache.py`), so exploring the same file with different
+`--stats` and `--graph` options only parses it the first time each param is used. After the file is appended to, only
+the new lines are parsed, and added to the end of the cached columns.
+"""
+
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Any
+from typing import Optional
+
+import numpy as np
+from scipy import stats
+
+import json_backend
+from cache import cache_dir, cache_key, evict, prefix_unchanged, stamp_prefix, touch
+
+# The code for a problem that doesn't have the param at all
+MISSING = -1
+# Bump this when the way values are extracted changes, so that old cached columns aren't used
+COLUMN_CACHE_VERSION = 4
+
+
+class Column:
+    """One param's value in every problem, as codes into `categories`, with MISSING where the problem doesn't have it."""
+
+    def __init__(self, codes: np.ndarray, categories: list):
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def present(self) -> np.ndarray:
+        return self.codes != MISSING
+
+    def as_float(self) -> np.ndarray:
+        """The values as floats, with NaN where they're missing."""
+        # The NaN at the end is what MISSING (-1) indexes
+        table = np.append(np.array(self.categories, dtype=np.float64), np.nan)
+        return table[self.codes]
+
+
+class ColumnBuilder:
+    """Collects a column one value at a time."""
+
+    def __init__(self):
+        self.codes = array("l")
+        self.categories = []
+        self._lookup = {}
+
+    def append(self, value: Any) -> None:
+        if isinstance(value, (list, dict)):
+            # Lists and dicts can't be dict keys, so group them by their JSON instead
+            value = json_backend.dumps(value)
+        self.codes.append(self.code(value))
+
+    def code(self, value: Any) -> int:
+        """The code for a value, adding it to the categories if it's new."""
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.categories)
+            self.categories.append(value)
+        return code
+
+    def append_missing(self) -> None:
+        self.codes.append(MISSING)
+
+    def build(self, start: int = 0) -> Column:
+        """The column so far, or only the values from `start` on, with all of the categories."""
+        codes = np.frombuffer(self.codes, dtype=f"i{self.codes.itemsize}")[start:].astype(np.int64)
+        return Column(codes, self.categories)
+
+
+def concat_columns(columns: list[Column]) -> Column:
+    """Joins columns end to end, like the columns of several files, merging their categories like `ColumnBuilder` does."""
+    builder = ColumnBuilder()
+    parts = []
+    for column in columns:
+        # MISSING (-1) indexes the MISSING at the end
+        recode = np.array([builder.code(category) for category in column.categories] + [MISSING], dtype=np.int64)
+        parts.append(recode[column.codes])
+    return Column(np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64), builder.categories)
+
+
+def group_stats(codes: np.ndarray, values: np.ndarray, num_groups: int) -> dict[str, np.ndarray]:
+    """
+    The count, mean, standard deviation, median, min and max of the values in each group, where `codes` says which group
+    each value is in. Groups without any values get NaN.
+    """
+    counts = np.bincount(codes, minlength=num_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.bincount(codes, weights=values, minlength=num_groups) / counts
+        stds = np.sqrt(np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=num_groups) / counts)
+    # Sorting by group, then by value, puts each group's values in order next to each other
+    sorted_values = values[np.lexsort((values, codes))]
+    starts = np.cumsum(counts) - counts
+    medians, mins, maxes = (np.full(num_groups, np.nan) for _ in range(3))
+    nonempty = counts > 0
+    first, last = starts[nonempty], starts[nonempty] + counts[nonempty] - 1
+    mins[nonempty] = sorted_values[first]
+    maxes[nonempty] = sorted_values[last]
+    medians[nonempty] = (sorted_values[(first + last) // 2] + sorted_values[(first + last + 1) // 2]) / 2
+    return {"count": counts, "mean": means, "std": stds, "median": medians, "min": mins, "max": maxes}
+
+
+def split_groups(codes: np.ndarray, values: np.ndarray, num_groups: int) -> list[np.ndarray]:
+    """The values in each group, in their original order."""
+    order = np.argsort(codes, kind="stable")
+    return np.split(values[order], np.cumsum(np.bincount(codes, minlength=num_groups))[:-1])
+
+
+class RunningGroupStats:
+    """
+    The same stats as `group_stats`, kept up to date as values are added in batches, like the new results of a file
+    that's being followed. Adding a batch only costs as much as the batch. The one exception is the medians, which need
+    every value, and so are only worked out again for the groups that got new values, when they're asked for.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros(0)
+        # The sum of squared differences from the mean, which is merged between batches rather than kept as a raw sum of
+        # squares, since that loses precision when the values are far from zero
+        self.squares = np.zeros(0)
+        self.mins = np.zeros(0)
+        self.maxes = np.zeros(0)
+        self.medians = np.zeros(0)
+        # The values of each group, in the batches they came in, and whether a group's median is out of date
+        self.values: list[list[np.ndarray]] = []
+        self.stale = np.zeros(0, dtype=bool)
+
+    def _grow(self, num_groups: int) -> None:
+        extra = num_groups - len(self.counts)
+        if extra <= 0:
+            return
+        self.counts = np.append(self.counts, np.zeros(extra, dtype=np.int64))
+        self.sums, self.squares = (np.append(a, np.zeros(extra)) for a in (self.sums, self.squares))
+        self.mins, self.maxes, self.medians = (
+            np.append(a, np.full(extra, np.nan)) for a in (self.mins, self.maxes, self.medians)
+        )
+        self.stale = np.append(self.stale, np.zeros(extra, dtype=bool))
+        self.values.extend([] for _ in range(extra))
+
+    def add(self, codes: np.ndarray, values: np.ndarray, num_groups: int) -> None:
+        """Adds a batch of values, where `codes` says which group each one is in."""
+        self._grow(num_groups)
+        batch = group_stats(codes, values, num_groups)
+        touched = batch["count"] > 0
+        counts, batch_counts = self.counts[touched], batch["count"][touched]
+        total = counts + batch_counts
+        # Chan et al.'s pairwise update, which combines the squares of both parts and how far apart their means are
+        means = self.sums[touched] / np.maximum(counts, 1)
+        delta = batch["mean"][touched] - means
+        self.squares[touched] += batch["std"][touched] ** 2 * batch_counts + delta ** 2 * counts * batch_counts / total
+        self.sums[touched] += batch["mean"][touched] * batch_counts
+        self.counts[touched] = total
+        self.mins[touched] = np.fmin(self.mins[touched], batch["min"][touched])
+        self.maxes[touched] = np.fmax(self.maxes[touched], batch["max"][touched])
+        for group, group_values in enumerate(split_groups(codes, values, num_groups)):
+            if len(group_values):
+                self.values[group].append(group_values)
+        self.stale |= touched
+
+    def stats(self) -> dict[str, np.ndarray]:
+        """The count, mean, standard deviation, median, min and max of each group, like `group_stats`."""
+        for group in np.flatnonzero(self.stale):
+            values = np.concatenate(self.values[group])
+            self.values[group] = [values]
+            self.medians[group] = np.median(values)
+        self.stale[:] = False
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = self.sums / self.counts
+            stds = np.sqrt(self.squares / self.counts)
+        return {"count": self.counts, "mean": means, "std": stds, "median": self.medians, "min": self.mins,
+                "max": self.maxes}
+
+    def anova(self, groups: list[int]) -> tuple[float, float]:
+        """The F-statistic and p-value of a one-way ANOVA between these groups, like `one_way_anova`."""
+        counts, sums = self.counts[groups], self.sums[groups]
+        k, n = len(groups), counts.sum()
+        means = sums / counts
+        between = np.sum(counts * (means - sums.sum() / n) ** 2)
+        within = np.sum(self.squares[groups])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            f_stat = (between / (k - 1)) / (within / (n - k))
+        return float(f_stat), float(stats.f.sf(f_stat, k - 1, n - k))
+
+    def linregress(self, groups: list[int], x: np.ndarray) -> tuple[float, float, float, float, float]:
+        """
+        The slope, intercept, r, p-value and standard error of the slope of a linear regression of the values in these
+        groups on the group's `x`, like `scipy.stats.linregress`.
+        """
+        counts, sums = self.counts[groups], self.sums[groups]
+        n = counts.sum()
+        x_mean, y_mean = np.sum(counts * x) / n, sums.sum() / n
+        group_means = sums / counts
+        # Every value in a group has the same x, so the sums of squares only need each group's count, mean and squares
+        ss_x = np.sum(counts * (x - x_mean) ** 2)
+        ss_xy = np.sum(counts * (x - x_mean) * (group_means - y_mean))
+        ss_y = np.sum(self.squares[groups]) + np.sum(counts * (group_means - y_mean) ** 2)
+        slope = ss_xy / ss_x
+        r = float(np.clip(ss_xy / np.sqrt(ss_x * ss_y), -1, 1)) if ss_y > 0 else 0.0
+        df = n - 2
+        if df <= 0:
+            p_value, std_err = (1.0 if ss_y == 0 else 0.0), 0.0
+        else:
+            t = r * np.sqrt(df / ((1 - r + 1e-20) * (1 + r + 1e-20)))
+            p_value = float(2 * stats.t.sf(abs(t), df))
+            std_err = float(np.sqrt((1 - r ** 2) * ss_y / ss_x / df))
+        return float(slope), float(y_mean - slope * x_mean), r, p_value, std_err
+
+
+def one_way_anova(codes: np.ndarray, values: np.ndarray, num_groups: int) -> tuple[float, float]:
+    """The F-statistic and p-value of a one-way ANOVA between the groups, like `scipy.stats.f_oneway`."""
+    counts = np.bincount(codes, minlength=num_groups)
+    nonempty = counts > 0
+    k, n = np.count_nonzero(nonempty), len(values)
+    grand_mean = values.mean()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.bincount(codes, weights=values, minlength=num_groups) / counts
+        between = np.sum(counts[nonempty] * (means[nonempty] - grand_mean) ** 2)
+        within = np.sum((values - means[codes]) ** 2)
+        f_stat = (between / (k - 1)) / (within / (n - k))
+    return float(f_stat), float(stats.f.sf(f_stat, k - 1, n - k))
+
+
+def _column_cache_path(file: str, name: str, paths: list[str]) -> Path:
+    # Not keyed by the file's size and modification time, so that a column can be extended after the file grows
+    return cache_dir("columns") / f"{cache_key(os.path.abspath(file), f'column-v{COLUMN_CACHE_VERSION}', name, *paths)}.npz"
+
+
+def load_cached_column(file: str, name: str, paths: list[str]) -> Optional[tuple[Column, int]]:
+    """
+    The column extracted from the file for `name` (by looking at `paths`), if it's in the cache, and the byte offset
+    that it was extracted up to. Columns of an earlier version of the file are only used if it's been appended to since.
+    """
+    cache_path = _column_cache_path(file, name, paths)
+    if not cache_path.exists():
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            column = Column(data["codes"], json.loads(str(data["categories"])))
+            stamp = {name: data[name].item() for name in ("offset", "checksum", "size", "mtime_ns")}
+    except (OSError, ValueError, KeyError):
+        return None
+    if not prefix_unchanged(file, stamp):
+        # The file was changed, rather than appended to
+        return None
+    touch(cache_path)
+    return column, stamp["offset"]
+
+
+def save_cached_column(file: str, name: str, paths: list[str], column: Column, offset: int) -> None:
+    """Caches the column extracted from the first `offset` bytes of the file."""
+    stamp = stamp_prefix(file, offset)
+    if stamp is None:
+        return
+    cache_path = _column_cache_path(file, name, paths)
+    tmp_path = cache_path.with_suffix(".tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            # The standard library writes NaN and other odd values the same way that it reads them back
+            np.savez(
+                f,
+                codes=column.codes,
+                categories=np.array(json.dumps(column.categories)),
+                **{name: np.array(value) for name, value in stamp.items()},
+            )
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not cache the {name} column in {cache_path}: {e}")
+        return
+    evict(cache_path.parent)
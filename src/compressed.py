@@ -0,0 +1,390 @@
+"""
+Gzip (`.gz`) and zstandard (`.zst`) compressed JSONL files, read as streams of lines.
+
+Compressed files can't be memory-mapped, so they're decompressed as they're read. Many compressed files are made of
+several independently compressed pieces: gzip members (from `bgzip`, or from appending with `gzip >>`) and zstd frames
+(from `pzstd`, or from appending with `zstd >>`). A checkpoint index, built with --build-index and stored next to the
+file as `<file>.ppidx`, records where each piece starts and which line starts first in it, so that --start and
+--randomize only decompress from the nearest piece instead of from the start of the file, and the problems can be
+counted instantly. It also records which lines are blank, so that --randomize only picks problems.
+
+Checkpoints are only at piece boundaries. Jumping into the middle of a gzip member would need zlib's `inflatePrime`,
+which Python's zlib doesn't expose, so a file compressed as a single piece is always read from the start.
+"""
+
+import io
+import os
+import struct
+import zlib
+from typing import BinaryIO
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+
+import numpy as np
+
+from reading import BlankLineFinder, iter_lines
+
+COMPRESSION_MAGIC = {
+    b"\x1f\x8b": "gzip",
+    b"\x28\xb5\x2f\xfd": "zstd",
+}
+# File names that directory mode picks from
+JSONL_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+COMPRESSION_SUFFIXES = (".gz", ".zst")
+
+# How much compressed data is decompressed at once, and the most decompressed data that gzip produces from it at once
+READ_SIZE = 1 << 16
+MAX_OUTPUT_SIZE = 1 << 22
+# Zstd frames with a magic number from 0x184D2A50 to 0x184D2A5F hold metadata, like the frame sizes that pzstd writes
+ZSTD_SKIPPABLE_MASK = 0xFFFFFFF0
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+
+CHECKPOINT_SUFFIX = ".ppidx"
+CHECKPOINT_MAGIC = b"PPCKP\x00\x00\x02"
+# Magic, file size, file mtime in nanoseconds, number of lines, number of checkpoints, number of blank lines
+CHECKPOINT_HEADER = struct.Struct("<8sQQQQQ")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            'Reading .zst files needs the zstandard package. Install it with `pip install "pprint_problems[zstd]"`.'
+        ) from None
+    return zstandard
+
+
+def compression_of(path: str) -> Optional[str]:
+    """ "gzip" or "zstd" if the path is a regular file compressed with them, going by its first bytes, or None."""
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        return compression_of_data(f.read(4))
+
+
+def compression_of_data(start: bytes) -> Optional[str]:
+    """ "gzip" or "zstd" if data starting with these bytes is compressed with them, or None."""
+    for magic, kind in COMPRESSION_MAGIC.items():
+        if start.startswith(magic):
+            return kind
+    return None
+
+
+def strip_compression_suffix(path: str) -> str:
+    """The path without a `.gz` or `.zst` at the end, like `results.jsonl` for `results.jsonl.gz`."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def _new_decompressor(kind: str):
+    """A decompressor for a single gzip member or zstd frame, which stops at its end and keeps what comes after."""
+    if kind == "gzip":
+        return zlib.decompressobj(wbits=31)
+    return _zstandard().ZstdDecompressor().decompressobj()
+
+
+class DecompressedReader(io.RawIOBase):
+    """
+    The decompressed contents of a compressed file, from a compressed offset where a piece starts. Each gzip member or
+    zstd frame gets its own decompressor, so that `on_piece(compressed_offset, decompressed_offset)` can be called as
+    each one starts. Wrap it in an `io.BufferedReader` to read lines.
+
+    The file is shared, and not closed with the reader.
+    """
+
+    def __init__(self, file: BinaryIO, kind: str, offset: int = 0, on_piece: Callable[[int, int], None] = None):
+        self.file = file
+        self.kind = kind
+        self.on_piece = on_piece
+        self.file.seek(offset)
+        # The compressed offset of the start of `pending`, and how much has been decompressed
+        self.compressed_offset = offset
+        self.decompressed_offset = 0
+        self.pending = b""
+        self.decompressor = None
+        # Decompressed data that hasn't been read yet, from `output_start` on
+        self.output = b""
+        self.output_start = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill_pending(self) -> bool:
+        if not self.pending:
+            self.pending = self.file.read(READ_SIZE)
+        return bool(self.pending)
+
+    def _skip_padding(self) -> bool:
+        """Skips anything between pieces that isn't data. Returns False at the end of the file."""
+        while self._fill_pending():
+            if self.kind == "gzip" and not self.pending.strip(b"\0"):
+                # Some tools pad gzip files with zeros
+                self.compressed_offset += len(self.pending)
+                self.pending = b""
+                continue
+            if self.kind == "zstd" and len(self.pending) < 8:
+                more = self.file.read(READ_SIZE)
+                if more:
+                    self.pending += more
+                    continue
+            if self.kind == "zstd" and len(self.pending) >= 8:
+                magic, size = struct.unpack_from("<II", self.pending)
+                if magic & ZSTD_SKIPPABLE_MASK == ZSTD_SKIPPABLE_MAGIC:
+                    self._discard(8 + size)
+                    continue
+            return True
+        return False
+
+    def _discard(self, size: int) -> None:
+        """Skips over `size` compressed bytes."""
+        self.compressed_offset += size
+        if size <= len(self.pending):
+            self.pending = self.pending[size:]
+        else:
+            self.file.seek(size - len(self.pending), os.SEEK_CUR)
+            self.pending = b""
+
+    def _decompress(self) -> bytes:
+        """Decompresses the next part of the file. Returns b"" at the end of the file."""
+        while True:
+            if self.decompressor is None:
+                if not self._skip_padding():
+                    return b""
+                self.decompressor = _new_decompressor(self.kind)
+                if self.on_piece is not None:
+                    self.on_piece(self.compressed_offset, self.decompressed_offset)
+            elif not self._fill_pending():
+                raise EOFError("Compressed file ended before the end of the data")
+            before = len(self.pending)
+            if self.kind == "gzip":
+                data = self.decompressor.decompress(self.pending, MAX_OUTPUT_SIZE)
+            else:
+                data = self.decompressor.decompress(self.pending)
+            if self.decompressor.eof:
+                self.pending = self.decompressor.unused_data
+                self.decompressor = None
+            else:
+                self.pending = getattr(self.decompressor, "unconsumed_tail", b"")
+            self.compressed_offset += before - len(self.pending)
+            if data:
+                self.decompressed_offset += len(data)
+                return data
+
+    def readinto(self, buffer) -> int:
+        if self.output_start >= len(self.output):
+            self.output = self._decompress()
+            self.output_start = 0
+        size = min(len(buffer), len(self.output) - self.output_start)
+        buffer[:size] = self.output[self.output_start:self.output_start + size]
+        self.output_start += size
+        return size
+
+
+class CheckpointIndex:
+    """
+    Where pieces of a compressed file start, as `(compressed_offset, skip, line_number)`, how many lines it has, and the
+    numbers of the blank lines.
+    """
+
+    def __init__(self, checkpoints: np.ndarray, num_lines: int, blank_lines: np.ndarray):
+        self.checkpoints = checkpoints
+        self.num_lines = num_lines
+        self.blank_lines = blank_lines
+
+    def __len__(self) -> int:
+        return self.num_lines
+
+    def nonblank_lines(self) -> np.ndarray:
+        """The numbers of the lines that aren't blank, which are what reading the file line by line finds."""
+        return np.delete(np.arange(self.num_lines), self.blank_lines.astype(np.int64))
+
+    def checkpoint(self, line_number: int) -> tuple[int, int, int]:
+        """
+        The closest checkpoint before a line: the compressed offset of a piece to start decompressing from, how many
+        decompressed bytes to skip from there to get to the start of a line, and the number of that line.
+        """
+        i = int(np.searchsorted(self.checkpoints[:, 2], line_number, side="right")) - 1
+        if i < 0:
+            return 0, 0, 0
+        offset, skip, first_line = self.checkpoints[i]
+        return int(offset), int(skip), int(first_line)
+
+
+class CompressedFile:
+    """A gzip or zstd compressed JSONL file, optionally with a checkpoint index for starting partway through."""
+
+    def __init__(self, path: str, kind: Optional[str] = None, file: Optional[BinaryIO] = None):
+        self.path = path
+        self.kind = kind or compression_of(path)
+        if self.kind == "zstd":
+            # Fail before reading anything if zstandard isn't installed
+            _zstandard()
+        # A seekable file can be passed in for data that isn't a local file, like an object in S3
+        self.file = open(path, "rb") if file is None else file
+
+    def __enter__(self) -> "CompressedFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def open(self, offset: int = 0, on_piece: Callable[[int, int], None] = None) -> io.BufferedReader:
+        """The decompressed contents, from a compressed offset where a piece starts."""
+        return io.BufferedReader(DecompressedReader(self.file, self.kind, offset, on_piece), READ_SIZE)
+
+    def iter_lines(self, start: int = 0, index: Optional[CheckpointIndex] = None) -> Iterator[tuple[int, str]]:
+        """Like `reading.iter_lines`, from line number `start`, starting at the closest checkpoint if there's an index."""
+        offset, skip, first_line = index.checkpoint(start) if index is not None else (0, 0, 0)
+        stream = self.open(offset)
+        while skip > 0:
+            skipped = len(stream.read(min(skip, READ_SIZE)))
+            if not skipped:
+                return
+            skip -= skipped
+        for line_number, line in iter_lines(stream, first_line):
+            if line_number >= start:
+                yield line_number, line
+
+    def count_lines(self) -> int:
+        """Counts the lines by decompressing the whole file, without decoding or splitting anything."""
+        stream = self.open()
+        count = 0
+        last = b"\n"
+        while True:
+            chunk = stream.read(READ_SIZE)
+            if not chunk:
+                break
+            count += chunk.count(b"\n")
+            last = chunk[-1:]
+        # The last line doesn't always end with a newline
+        return count if last == b"\n" else count + 1
+
+    def lines_at(self, line_numbers: Iterable[int], index: CheckpointIndex) -> Iterator[tuple[int, str]]:
+        """
+        Yields the lines with these numbers, which must be in increasing order, jumping to a closer checkpoint whenever
+        there's one past the line we're at, so that pieces of the file without any of the lines aren't decompressed.
+        Blank lines aren't yielded.
+        """
+        lines = None
+        current = None
+        for target in line_numbers:
+            next_line = current[0] if current is not None else -1
+            if lines is None or (next_line < target and index.checkpoint(target)[2] > next_line):
+                lines = self.iter_lines(target, index)
+                current = None
+            while current is None or current[0] < target:
+                current = next(lines, None)
+                if current is None:
+                    return
+            if current[0] == target:
+                yield current
+
+
+def checkpoint_path(path: str) -> str:
+    return path + CHECKPOINT_SUFFIX
+
+
+def _file_signature(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def find_checkpoints(compressed: CompressedFile) -> CheckpointIndex:
+    """
+    Decompresses the whole file once, counting its lines, finding the blank ones, and noting where each piece starts.
+    A piece that starts in the middle of a line gets a checkpoint at the first line that starts in it.
+    """
+    pieces = []
+    # Read without a buffer, so that a piece never starts in data that's been read ahead
+    stream = DecompressedReader(compressed.file, compressed.kind, 0, lambda *piece: pieces.append(piece))
+    checkpoints = []
+    blank_lines = BlankLineFinder()
+    position = 0
+    newlines = 0
+    at_line_start = True
+    # A piece that hasn't had a line start in it yet
+    waiting = None
+
+    def resolve(chunk: bytes, start: int, end: int) -> None:
+        nonlocal waiting
+        newline = chunk.find(b"\n", start, end)
+        if newline != -1:
+            offset, piece_start = waiting
+            checkpoints.append((offset, position + newline + 1 - piece_start, newlines + chunk.count(b"\n", 0, newline + 1)))
+            waiting = None
+
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        search_from = 0
+        for offset, piece_start in pieces:
+            relative = piece_start - position
+            if waiting is not None:
+                resolve(chunk, search_from, relative)
+            if (relative == 0 and at_line_start) or (relative > 0 and chunk[relative - 1] == ord("\n")):
+                checkpoints.append((offset, 0, newlines + chunk.count(b"\n", 0, relative)))
+                waiting = None
+            else:
+                waiting = (offset, piece_start)
+            search_from = relative
+        pieces.clear()
+        if waiting is not None:
+            resolve(chunk, search_from, len(chunk))
+        blank_lines.add(chunk, np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord("\n")))
+        newlines += chunk.count(b"\n")
+        position += len(chunk)
+        at_line_start = chunk.endswith(b"\n")
+    num_lines = newlines if at_line_start else newlines + 1
+    return CheckpointIndex(np.array(checkpoints, dtype=np.uint64).reshape(-1, 3), num_lines, blank_lines.finish())
+
+
+def build_checkpoint_index(compressed: CompressedFile) -> CheckpointIndex:
+    """Builds the checkpoint index for the file, and writes it next to the file if possible."""
+    path = compressed.path
+    size, mtime_ns = _file_signature(path)
+    index = find_checkpoints(compressed)
+    if len(index.checkpoints) <= 1:
+        print(
+            f"{path} is compressed as a single piece, so it can only be read from the start. Compress it with "
+            f"`bgzip` or `pzstd` to be able to jump into it."
+        )
+    try:
+        tmp_path = checkpoint_path(path) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(CHECKPOINT_HEADER.pack(
+                CHECKPOINT_MAGIC, size, mtime_ns, index.num_lines, len(index.checkpoints), len(index.blank_lines)
+            ))
+            f.write(index.checkpoints.tobytes())
+            f.write(index.blank_lines.tobytes())
+        os.replace(tmp_path, checkpoint_path(path))
+    except OSError as e:
+        print(f"Could not write index file {checkpoint_path(path)}: {e}")
+    return index
+
+
+def load_checkpoint_index(path: str) -> Optional[CheckpointIndex]:
+    """Loads the checkpoint index for the file, or returns None if there isn't one or it's out of date."""
+    try:
+        with open(checkpoint_path(path), "rb") as f:
+            header = f.read(CHECKPOINT_HEADER.size)
+            data = f.read()
+    except OSError:
+        return None
+    if len(header) != CHECKPOINT_HEADER.size:
+        return None
+    magic, size, mtime_ns, num_lines, num_checkpoints, num_blank = CHECKPOINT_HEADER.unpack(header)
+    if magic != CHECKPOINT_MAGIC or (size, mtime_ns) != _file_signature(path):
+        return None
+    if len(data) != (num_checkpoints * 3 + num_blank) * 8:
+        return None
+    values = np.frombuffer(data, dtype=np.uint64)
+    return CheckpointIndex(values[:num_checkpoints * 3].reshape(-1, 3), num_lines, values[num_checkpoints * 3:])
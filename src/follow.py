@@ -0,0 +1,89 @@
+"""
+Following a JSONL file that's still being written, like `tail -f`, for watching an eval run as its results land.
+
+Only complete lines are read: a line that's still being written at the end of the file is left until its newline
+arrives. If the file is truncated or replaced, like when a run is restarted, it's read again from the start.
+"""
+
+import os
+import sys
+import time
+from typing import Iterator
+
+from printing import flush_file_output, print_text
+
+# How often to check the file for new lines, in seconds
+POLL_INTERVAL = 1.0
+
+
+class FollowedFile:
+    """A local file that's read a line at a time as it grows, remembering where it got to."""
+
+    def __init__(self, path: str, interval: float = POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.file = open(path, "rb")
+        # Where the next complete line starts, and its line number
+        self.offset = 0
+        self.index = 0
+        # How big the file was when it was last read
+        self.size = 0
+
+    def __enter__(self) -> "FollowedFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def _restart(self, reason: str) -> None:
+        print_text(f"{self.path} was {reason}, so reading it again from the start")
+        self.offset = 0
+        self.index = 0
+        self.size = 0
+
+    def _check_replaced(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # Deleted, but it might be written again
+            return
+        if stat.st_ino != os.fstat(self.file.fileno()).st_ino:
+            self.file.close()
+            self.file = open(self.path, "rb")
+            self._restart("replaced")
+        elif stat.st_size < self.offset:
+            self._restart("truncated")
+
+    def iter_new_lines(self) -> Iterator[tuple[int, str]]:
+        """Yields `(line_number, line)` for every complete, non-blank line that's been written since the last call."""
+        self._check_replaced()
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.file.seek(self.offset)
+        for line in self.file:
+            if not line.endswith(b"\n"):
+                # Still being written, so it's read again once it's finished
+                return
+            self.offset += len(line)
+            self.index += 1
+            # A bad byte, like from a writer that was killed mid-character, mustn't stop the following
+            line = line.decode("utf-8", errors="replace").rstrip("\r\n")
+            if line.strip():
+                yield self.index - 1, line
+
+    def wait(self) -> None:
+        """Waits until the file might have new lines."""
+        # Show everything that's been printed so far, even when stdout is buffered
+        flush_file_output()
+        sys.stdout.flush()
+        while True:
+            time.sleep(self.interval)
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                continue
+            if stat.st_size != self.size or stat.st_ino != os.fstat(self.file.fileno()).st_ino:
+                return
+
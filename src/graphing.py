@@ -1,33 +1,222 @@
 import argparse
 import json
 import matplotlib.pyplot as plt
-from collections import defaultdict
 import os
+import time
 from pathlib import Path
 import numpy as np
 # import seaborn as sns
 from scipy import stats
 
+import json_backend
+from catalog import most_recent_file
+from columns import (
+    ColumnBuilder, MISSING, RunningGroupStats, concat_columns, group_stats, load_cached_column, one_way_anova,
+    save_cached_column, split_groups
+)
+from compressed import strip_compression_suffix
+from lazy_json import PartialDecoder
 from printing import print_header_1
+from reading import MappedFile
+from shards import map_shards, open_shard, shard_jobs, shard_size
 
 ALL_GRAPHING_PARAMS = ['bimodal_discount', 'set_size', 'num_people', 'num_interests', 'avg_points', 'think_through',
               'percent_chain_of_thought']
 
 def get_latest_file(directory):
-    return max(
-        (os.path.join(root, f) for root, _, files in os.walk(directory) for f in files if f.endswith('.jsonl')),
-        key=os.path.getmtime
-    )
+    return most_recent_file(directory)
 
 
-def load_results(file_path):
-    print(f"Loading results from: {file_path}")
-    with open(file_path, 'r') as f:
-        results = [json.loads(line) for line in f]
-    print(f"Loaded {len(results)} results")
-    if results:
-        print("First result keys:", results[0].keys())
-    return results
+class ColumnExtractor:
+    """
+    Parses `(index, line)` pairs and extracts each of the names from them into columns, which can keep growing as more
+    lines are added. Only the slash paths that could hold those values are decoded.
+    """
+
+    def __init__(self, names):
+        self.loads = PartialDecoder([path for name in names for path in value_paths(name)]).loads
+        self.builders = {name: ColumnBuilder() for name in names}
+        self.num_results = 0
+        # Lines that aren't valid JSON
+        self.skipped = 0
+        self.first_keys = None
+
+    def add_lines(self, lines) -> None:
+        for _, line in lines:
+            try:
+                result = self.loads(line)
+            except json.JSONDecodeError:
+                self.skipped += 1
+                continue
+            if self.first_keys is None:
+                self.first_keys = result.keys()
+            self.num_results += 1
+            for name, builder in self.builders.items():
+                try:
+                    builder.append(get_value(result, name))
+                except KeyError:
+                    builder.append_missing()
+
+    def columns(self, start=0):
+        """The columns so far, or only the values of the results from number `start` on."""
+        return {name: builder.build(start) for name, builder in self.builders.items()}
+
+
+def extract_columns(lines, names):
+    """
+    Parses each `(index, line)` pair once, and extracts each of the names from it into a column. Returns the columns,
+    the number of results, the number of lines that aren't valid JSON, and the keys of the first result.
+    """
+    extractor = ColumnExtractor(names)
+    extractor.add_lines(lines)
+    return extractor.columns(), extractor.num_results, extractor.skipped, extractor.first_keys
+
+
+def column_names(params, y_value=None):
+    return list(dict.fromkeys(params + ([y_value] if y_value else [])))
+
+
+def load_file_columns(path, names):
+    """
+    Extracts the names into columns from every line of a local file, using the cache. If the file has been appended to
+    since its columns were cached, only the new lines are parsed, and added to the end of the cached columns. Returns
+    the columns, the number of results, how many of them came from the cache, the number of lines read that aren't
+    valid JSON, and the keys of the first result read (None if nothing was read).
+    """
+    with open_shard(path) as source:
+        # Compressed files can't be read from where their columns left off, so they're only cached whole
+        appendable = isinstance(source, MappedFile)
+        # A last line without a newline might still be being written, so it's read but not cached
+        end = source.complete_size() if appendable else shard_size(path)
+        cached = {}
+        for name in names:
+            found = load_cached_column(path, name, value_paths(name))
+            if found is not None and (found[1] == end or appendable and found[1] < end):
+                cached[name] = found
+        # Names cached up to the same offset are extracted together, and the rest of the names from the start
+        by_offset = {}
+        for name in names:
+            by_offset.setdefault(cached[name][1] if name in cached else 0, []).append(name)
+        columns = {}
+        num_read = 0
+        skipped = 0
+        first_keys = None
+        for offset, offset_names in by_offset.items():
+            if offset == end:
+                # Nothing new to read, like for an empty file
+                columns.update({name: cached[name][0] if name in cached else ColumnBuilder().build() for name in offset_names})
+                continue
+            extractor = ColumnExtractor(offset_names)
+            extractor.add_lines(source.iter_lines(offset, end=end) if appendable else source.iter_lines())
+            for name, column in extractor.columns().items():
+                if name in cached:
+                    column = concat_columns([cached[name][0], column])
+                save_cached_column(path, name, value_paths(name), column, end)
+                columns[name] = column
+            # Lines that were read for several offsets are only counted once
+            if extractor.num_results > num_read:
+                num_read, skipped = extractor.num_results, extractor.skipped
+            if offset == 0:
+                first_keys = extractor.first_keys
+        if appendable and end < source.size:
+            extractor = ColumnExtractor(names)
+            extractor.add_lines(source.iter_lines(end))
+            columns = {name: concat_columns([columns[name], column]) for name, column in extractor.columns().items()}
+            num_read += extractor.num_results
+            skipped += extractor.skipped
+    num_results = len(next(iter(columns.values()))) if columns else 0
+    return columns, num_results, num_results - num_read, skipped, first_keys
+
+
+def load_columns(lines, params, y_value=None, cache_file=None):
+    """
+    Parses each of the selected `(index, line)` pairs once, and extracts the params and y_value from it into columns.
+    If `cache_file` is given, the lines are the whole of that file, which is read with `load_file_columns` instead.
+    """
+    names = column_names(params, y_value)
+    if cache_file:
+        columns, num_results, num_cached, skipped, first_keys = load_file_columns(cache_file, names)
+    else:
+        columns, num_results, skipped, first_keys = extract_columns(lines, names)
+        num_cached = 0
+    if num_cached == num_results and cache_file:
+        # Everything was cached, so the file wasn't read at all
+        print(f"Loaded {num_results} results from the cache")
+    elif num_cached:
+        print(f"Loaded {num_results} results ({num_cached} of them from the cache)")
+    else:
+        print(f"Loaded {num_results} results")
+    if skipped:
+        print(f"Skipped {skipped} lines that aren't valid JSON")
+    if first_keys is not None:
+        print("First result keys:", first_keys)
+    return columns
+
+
+def _shard_columns(task):
+    """
+    Worker for `load_shard_columns`. Returns one shard's columns, its number of results, the number of lines that
+    aren't valid JSON, and the keys of its first result, which is None if the columns were all cached.
+    """
+    path, names, use_cache, backend, s3_endpoint_url = task
+    json_backend.set_backend(backend)
+    if use_cache and os.path.isfile(path):
+        columns, num_results, num_cached, skipped, first_keys = load_file_columns(path, names)
+        if num_cached == num_results:
+            first_keys = None
+    else:
+        with open_shard(path, s3_endpoint_url) as source:
+            columns, num_results, skipped, first_keys = extract_columns(source.iter_lines(), names)
+    return columns, num_results, skipped, list(first_keys) if first_keys is not None else None
+
+
+def load_shard_columns(args, shards, params, y_value=None):
+    """
+    Like `load_columns`, for every line of several files. Each file is read by a worker process, with its columns
+    cached separately, and the columns are joined in the order of the files.
+    """
+    names = column_names(params, y_value)
+    tasks = [(path, names, not args.no_cache, json_backend.get_backend(), args.s3_endpoint_url) for path in shards]
+    parts = {name: [] for name in names}
+    num_results = 0
+    skipped = 0
+    first_keys = None
+    num_cached = 0
+    for columns, shard_results, shard_skipped, shard_keys in map_shards(_shard_columns, tasks, shard_jobs(args, shards)):
+        for name in names:
+            parts[name].append(columns[name])
+        num_results += shard_results
+        skipped += shard_skipped
+        if shard_keys is None:
+            num_cached += 1
+        elif first_keys is None:
+            first_keys = dict.fromkeys(shard_keys).keys()
+    if num_cached:
+        print(f"Loaded {num_results} results from {len(shards)} files ({num_cached} of them from the cache)")
+    else:
+        print(f"Loaded {num_results} results from {len(shards)} files")
+    if skipped:
+        print(f"Skipped {skipped} lines that aren't valid JSON")
+    if first_keys is not None:
+        print("First result keys:", first_keys)
+    return {name: concat_columns(name_parts) for name, name_parts in parts.items()}
+
+
+def get_output_dir(args) -> Path:
+    """
+    Where graphs are saved: next to the input file, in a "graphs" directory in the directory that all of the files of a
+    dataset are in, or in the current directory when reading from stdin.
+    """
+    if isinstance(args.file, list):
+        directories = [os.path.dirname(os.path.abspath(path)) for path in args.file if not path.lower().startswith("s3://")]
+        return (Path(os.path.commonpath(directories)) if directories else Path(".")) / "graphs"
+    if not isinstance(args.file, str):
+        return Path("stdin")
+    path = Path(strip_compression_suffix(args.file))
+    if args.file.lower().startswith("s3://"):
+        # Objects in S3 get a directory in the current directory
+        return Path(path.stem)
+    return path.parent / path.stem
 
 
 def get_value(result: dict, param: str):
@@ -58,61 +247,84 @@ def get_value(result: dict, param: str):
         raise e
 
 
-def get_data(param, results, y_value, min_n=1):
-    param_values = defaultdict(list)
-    for i, result in enumerate(results):
-        try:
-            param_value = get_value(result, param)
-            # For readability, convert integer values to strings
-            if param == "think_through":
-                param_value = {0: "No thinking through", 1: "Brief thought", 2: "Deep thought"}[param_value]
-            if y_value:
-                param_values[param_value].append(result[y_value])
-            else:
-                param_values[param_value].append(1)
-        except KeyError as e:
-            print(f"  KeyError: {e}")
-            raise e
-    
-    # Get all x values
-    all_x_data = list(param_values.keys())
-    
+def value_paths(param: str) -> list[str]:
+    """The slash paths that `get_value` might look at for this param."""
+    if "/" in param:
+        return [param]
+    return [param, f"doc/{param}", f"doc/scoring_guide/{param}", f"doc/scoring_guide/parameters/{param}"]
+
+
+def get_groups(param, columns, y_value, min_n=1):
+    """
+    The group code and y value of every result that has the param (and y_value), along with each group's label, and the
+    groups with at least `min_n` results, in order.
+    """
+    column = columns[param]
+    y = columns[y_value].as_float() if y_value else np.ones(len(column))
+    keep = column.present & ~np.isnan(y)
+    if not keep.all():
+        print_num_without(param, y_value, np.count_nonzero(~keep))
+    codes, y = column.codes[keep], y[keep]
+    labels = group_labels(param, column.categories)
+    valid_groups = select_groups(labels, np.bincount(codes, minlength=len(labels)), min_n)
+    return codes, y, labels, valid_groups
+
+
+def print_num_without(param, y_value, count):
+    print(f"  Skipping {count} results without {param}{' or ' + y_value if y_value else ''}")
+
+
+def group_labels(param, categories):
+    # For readability, convert integer values to strings
+    if param == "think_through":
+        return [{0: "No thinking through", 1: "Brief thought", 2: "Deep thought"}[label] for label in categories]
+    return categories
+
+
+def select_groups(labels, counts, min_n=1):
+    """The groups with at least `min_n` results, in the order they first appear, or in order if they're all numeric."""
+    all_groups = [group for group in range(len(labels)) if counts[group] > 0]
+
     # Filter out groups with insufficient N
     if min_n > 1:
-        valid_x_data = [x for x in all_x_data if len(param_values[x]) >= min_n]
-        if len(valid_x_data) < len(all_x_data):
+        valid_groups = [group for group in all_groups if counts[group] >= min_n]
+        if len(valid_groups) < len(all_groups):
             print(f"\nNote: Excluding groups with N < {min_n}")
-            print(f"Original groups: {len(all_x_data)}, Valid groups: {len(valid_x_data)}")
+            print(f"Original groups: {len(all_groups)}, Valid groups: {len(valid_groups)}")
     else:
-        valid_x_data = all_x_data
+        valid_groups = all_groups
 
-    # Sort x values if they're all numeric
-    if all(isinstance(x, (int, float)) for x in valid_x_data):
-        valid_x_data.sort()
-    
-    return param_values, valid_x_data
+    # Sort groups if they're all numeric
+    if all(isinstance(labels[group], (int, float)) for group in valid_groups):
+        valid_groups.sort(key=lambda group: labels[group])
 
+    return valid_groups
 
-def print_full_combinatoric_stats(results, params, y_value, args):
-    # Create combinations counter
-    combinations = defaultdict(int)
-    total_results = 0
 
-    for result in results:
-        try:
-            # Build combination tuple
-            combo = []
-            for p in params:
-                try:
-                    val = get_value(result, p)
-                    combo.append((p, val))
-                except KeyError:
-                    continue
-            combo = tuple(combo)
-            combinations[combo] += 1
-            total_results += 1
-        except KeyError:
-            continue
+def get_data(param, columns, y_value, min_n=1):
+    codes, y, labels, valid_groups = get_groups(param, columns, y_value, min_n)
+    groups = split_groups(codes, y, len(labels))
+    param_values = {labels[group]: values for group, values in enumerate(groups) if len(values)}
+    return param_values, [labels[group] for group in valid_groups]
+
+
+def count_combinations(columns, params):
+    """How many results have each combination of param values, as rows of codes, where MISSING is its own code."""
+    codes = np.stack([columns[p].codes for p in params], axis=1)
+    rows, counts = np.unique(codes, axis=0, return_counts=True)
+    return {tuple(row.tolist()): int(count) for row, count in zip(rows, counts)}
+
+
+def print_full_combinatoric_stats(columns, params, y_value, args):
+    print_combinations(columns, params, count_combinations(columns, params), len(columns[params[0]]))
+
+
+def print_combinations(columns, params, code_counts, total_results):
+    # Missing params are left out of the combination
+    combinations = {}
+    for row, count in code_counts.items():
+        combo = tuple((p, columns[p].categories[code]) for p, code in zip(params, row) if code != MISSING)
+        combinations[combo] = count
 
     # Print each combination and its count
     print_header_1("Combinations:")
@@ -123,52 +335,58 @@ def print_full_combinatoric_stats(results, params, y_value, args):
         print(f"Count: {count} ({count/total_results*100:.1f}%)")
 
 
-def print_stats(results, param, y_value, args):
-    param_values, valid_x_data = get_data(param, results, y_value, args.min_n)
-    
+def print_stats(columns, param, y_value, args):
+    codes, y, labels, valid_groups = get_groups(param, columns, y_value, args.min_n)
+    group_stat = group_stats(codes, y, len(labels))
+
+    # Only the results in the valid groups are analyzed
+    in_valid = np.isin(codes, valid_groups)
+    codes, y = codes[in_valid], y[in_valid]
+    regression = anova = None
+    if len(valid_groups) > 1 and all(isinstance(labels[group], (int, float)) for group in valid_groups):
+        all_x = np.array(labels, dtype=np.float64)[codes]
+        regression = stats.linregress(all_x, y)
+    if len(valid_groups) > 1 and y_value:
+        anova = one_way_anova(codes, y, len(labels))
+    print_analysis(param, y_value, labels, valid_groups, group_stat, regression, anova)
+
+
+def print_analysis(param, y_value, labels, valid_groups, group_stat, regression=None, anova=None):
     print(f"\nStatistical Analysis for {param.replace('_', ' ').title()} vs {y_value.replace('_', ' ').title() if y_value else 'Count'}")
     print("-" * 80)
 
     # Print summary statistics for each parameter value
-    for x in sorted(valid_x_data):
-        values = param_values[x]
-        print(f"\nGroup: {x}")
-        print(f"  N: {len(values)}")
+    for group in sorted(valid_groups, key=lambda group: labels[group]):
+        print(f"\nGroup: {labels[group]}")
+        print(f"  N: {group_stat['count'][group]}")
         if y_value:
-            print(f"  Mean: {np.mean(values):.3f}")
-            print(f"  Median: {np.median(values):.3f}")
-            print(f"  Std Dev: {np.std(values):.3f}")
-            print(f"  Min: {np.min(values):.3f}")
-            print(f"  Max: {np.max(values):.3f}")
-    
+            print(f"  Mean: {group_stat['mean'][group]:.3f}")
+            print(f"  Median: {group_stat['median'][group]:.3f}")
+            print(f"  Std Dev: {group_stat['std'][group]:.3f}")
+            print(f"  Min: {group_stat['min'][group]:.3f}")
+            print(f"  Max: {group_stat['max'][group]:.3f}")
+
     # If we have numeric x values and more than one group, perform regression analysis
-    if len(valid_x_data) > 1 and all(isinstance(x, (int, float)) for x in valid_x_data):
-        all_x = []
-        all_y = []
-        for x in valid_x_data:
-            all_x.extend([x] * len(param_values[x]))
-            all_y.extend(param_values[x])
-            
-        slope, intercept, r_value, p_value, std_err = stats.linregress(all_x, all_y)
+    if regression is not None:
+        slope, intercept, r_value, p_value, std_err = regression
         print(f"\nRegression Analysis:")
         print(f"  Slope: {slope:.3f}")
         print(f"  Intercept: {intercept:.3f}")
         print(f"  R-squared: {r_value**2:.3f}")
         print(f"  P-value: {p_value:.3f}")
         print(f"  Standard Error: {std_err:.3f}")
-    
+
     # If we have more than one group, perform ANOVA
-    if len(valid_x_data) > 1 and y_value:
-        groups = [param_values[x] for x in valid_x_data]
-        f_stat, anova_p = stats.f_oneway(*groups)
+    if anova is not None:
+        f_stat, anova_p = anova
         print(f"\nOne-way ANOVA:")
         print(f"  F-statistic: {f_stat:.3f}")
         print(f"  P-value: {anova_p:.3f}")
 
 
-def create_graph(results, param, y_value, args):
+def create_graph(columns, param, y_value, args):
     print(f"Creating graph with param: {param}, y_value: {y_value}")
-    param_values, x_data = get_data(param, results, y_value, args.min_n)
+    param_values, x_data = get_data(param, columns, y_value, args.min_n)
 
     assert y_value, "No y_value specified. You probably want to run this command with `--y_value=correct` or similar."
 
@@ -187,7 +405,7 @@ def create_graph(results, param, y_value, args):
         create_binary_plot(args, param, param_values, x_data, y_value)
 
     # print the location where these are all saved
-    output_dir = Path(args.file).parent / Path(args.file).stem
+    output_dir = get_output_dir(args)
     print(f"\nGraphs saved in: {output_dir}")
 
 
@@ -268,7 +486,7 @@ def create_binary_plot(args, param, param_values, x_data, y_value):
     plt.tight_layout()
     
     # Save the graph
-    output_dir = Path(args.file).parent / Path(args.file).stem
+    output_dir = get_output_dir(args)
     output_dir.mkdir(parents=True, exist_ok=True)
     output_file = output_dir / f"{param}_{y_value}_binary.png"
     plt.savefig(output_file, dpi=300, bbox_inches='tight')
@@ -334,7 +552,7 @@ def create_box_plot(args, param, param_values, x_data, y_value):
                loc='center left', bbox_to_anchor=(1, 0.5))
     plt.tight_layout()
     # Save the graph as an image
-    output_dir = Path(args.file).parent / Path(args.file).stem
+    output_dir = get_output_dir(args)
     output_dir.mkdir(parents=True, exist_ok=True)
     output_file = output_dir / f"{param}_{y_value}.png"
     plt.savefig(output_file, dpi=300, bbox_inches='tight')
@@ -345,36 +563,153 @@ def create_box_plot(args, param, param_values, x_data, y_value):
     plt.close()
 
 
-def main(args):
-    # default_input_dir = Path(__file__).parents[3] / "tasks" / "dinner_party" / "results"
-    # default_input_file = get_latest_file(default_input_dir)
-
-    params = args.parts
-
-    print(f"Input file: {args.file}")
+def print_inputs(args, params):
+    if isinstance(args.file, list):
+        print(f"Input files: {len(args.file)} files")
+    else:
+        print(f"Input file: {getattr(args.file, 'name', args.file)}")
     print(f"Params: {params}")
     print(f"Y-value: {args.y_value}")
     print(f"Display graph: {args.display_graph}")
 
-    results = load_results(args.file)
-
-    if params[0] == 'all':
-        params = ALL_GRAPHING_PARAMS
 
+def report(args, columns, params):
+    """Prints the stats or creates the graphs for each param."""
     if args.stats and args.full_combinatoric:
-        print_full_combinatoric_stats(results, params, args.y_value, args)
+        print_full_combinatoric_stats(columns, params, args.y_value, args)
         return
 
     for param in params:
         # Check to see if all the values are the same
-        all_values = set()
-        for result in results:
-            all_values.add(get_value(result, param))
-        if len(all_values) == 1:
+        column = columns[param]
+        if len(np.unique(column.codes[column.present])) == 1:
+            all_values = {column.categories[column.codes[column.present][0]]}
             print(f"  Skipping graph for parameter {param} because all values are the same: {all_values}")
             continue
 
         if args.stats:
-            print_stats(results, param, args.y_value, args)
+            print_stats(columns, param, args.y_value, args)
+        else:
+            create_graph(columns, param, args.y_value, args)
+
+
+def main(args, lines, cache_file=None, shards=None):
+    """
+    Prints stats or graphs about the lines that the CLI selected, after --search, --where, --start and --number. If
+    the lines are the whole of `cache_file`, the values extracted from them are cached. If they're every line of
+    several `shards`, the files are read in parallel instead.
+    """
+    # default_input_dir = Path(__file__).parents[3] / "tasks" / "dinner_party" / "results"
+    # default_input_file = get_latest_file(default_input_dir)
+
+    params = args.parts
+    print_inputs(args, params)
+
+    if params[0] == 'all':
+        params = ALL_GRAPHING_PARAMS
+
+    # Extract every param in one pass over the results
+    if shards:
+        columns = load_shard_columns(args, shards, params, args.y_value)
+    else:
+        columns = load_columns(lines, params, args.y_value, cache_file)
+
+    report(args, columns, params)
+
+
+class FollowedStats:
+    """
+    What --stats prints for --follow, kept up to date from only the new results in each batch: the running stats of
+    each param's groups, and how many results have each combination of params for --full_combinatoric.
+    """
+
+    def __init__(self, params, y_value, full_combinatoric=False):
+        self.params = params
+        self.y_value = y_value
+        self.full_combinatoric = full_combinatoric
+        self.groups = {param: RunningGroupStats() for param in params}
+        # How many results don't have each param (or the y_value)
+        self.num_without = dict.fromkeys(params, 0)
+        self.combinations = {}
+        self.num_results = 0
+        # The y_value of each of its categories as a float, and NaN at the end, which is what MISSING (-1) indexes
+        self.y_table = np.full(1, np.nan)
+        self.columns = None
+
+    def add(self, columns):
+        """Adds the columns of the new results, which have all of the categories so far."""
+        num_new = len(columns[self.params[0]])
+        self.num_results += num_new
+        self.columns = columns
+        if self.y_value:
+            categories = columns[self.y_value].categories
+            if len(categories) >= len(self.y_table):
+                new = np.array(categories[len(self.y_table) - 1:], dtype=np.float64)
+                self.y_table = np.concatenate([self.y_table[:-1], new, [np.nan]])
+            y = self.y_table[columns[self.y_value].codes]
+        else:
+            y = np.ones(num_new)
+        for param in self.params:
+            column = columns[param]
+            keep = column.present & ~np.isnan(y)
+            self.num_without[param] += num_new - np.count_nonzero(keep)
+            self.groups[param].add(column.codes[keep], y[keep], len(column.categories))
+        if self.full_combinatoric:
+            for row, count in count_combinations(columns, self.params).items():
+                self.combinations[row] = self.combinations.get(row, 0) + count
+
+    def report(self, args):
+        """Prints the stats for each param, like `report`."""
+        if self.full_combinatoric:
+            print_combinations(self.columns, self.params, self.combinations, self.num_results)
+            return
+
+        for param in self.params:
+            # Every category has at least one result, so a single category means all the values are the same
+            categories = self.columns[param].categories
+            if len(categories) == 1:
+                print(f"  Skipping graph for parameter {param} because all values are the same: {set(categories)}")
+                continue
+            if self.num_without[param]:
+                print_num_without(param, self.y_value, self.num_without[param])
+            groups = self.groups[param]
+            labels = group_labels(param, categories)
+            group_stat = groups.stats()
+            valid_groups = select_groups(labels, group_stat["count"], args.min_n)
+            regression = anova = None
+            if len(valid_groups) > 1 and all(isinstance(labels[group], (int, float)) for group in valid_groups):
+                x = np.array([labels[group] for group in valid_groups], dtype=np.float64)
+                regression = groups.linregress(valid_groups, x)
+            if len(valid_groups) > 1 and self.y_value:
+                anova = groups.anova(valid_groups)
+            print_analysis(param, self.y_value, labels, valid_groups, group_stat, regression, anova)
+
+
+def follow(args, batches):
+    """
+    Like `main`, for --follow. `batches` yields the lines that are already in the file, then each set of lines that's
+    been written since. Each line is only parsed once, into columns that keep growing. With --stats, only the new
+    results are added to running stats, so each update costs as much as its batch rather than the whole file, and
+    graphs are drawn again from the whole columns whenever there are new results.
+    """
+    params = args.parts
+    print_inputs(args, params)
+
+    if params[0] == 'all':
+        params = ALL_GRAPHING_PARAMS
+
+    extractor = ColumnExtractor(column_names(params, args.y_value))
+    followed_stats = FollowedStats(params, args.y_value, args.full_combinatoric) if args.stats else None
+    for batch in batches:
+        num_results, skipped = extractor.num_results, extractor.skipped
+        extractor.add_lines(batch)
+        if extractor.skipped > skipped:
+            print(f"Skipped {extractor.skipped - skipped} lines that aren't valid JSON")
+        if extractor.num_results == num_results:
+            continue
+        print_header_1(f"{extractor.num_results} results at {time.strftime('%H:%M:%S')} ({extractor.num_results - num_results} new)")
+        if followed_stats is not None:
+            followed_stats.add(extractor.columns(num_results))
+            followed_stats.report(args)
         else:
-            create_graph(results, param, args.y_value, args)
+            report(args, extractor.columns(), params)
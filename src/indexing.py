@@ -0,0 +1,134 @@
+"""
+A persistent line-offset index for JSONL files, stored next to the file as `<file>.ppidx`.
+
+The index records the byte offset where every line starts, so that we can count the problems instantly and seek
+straight to any line instead of reading everything before it, and which lines are blank, so that --randomize only picks
+problems. It is tagged with the size and modification time of the file it was built from, and is ignored once the file
+changes.
+"""
+
+import os
+import struct
+from typing import Iterable
+from typing import Optional
+
+import numpy as np
+
+from reading import BlankLineFinder, MappedFile, SCAN_CHUNK_SIZE
+
+INDEX_SUFFIX = ".ppidx"
+INDEX_MAGIC = b"PPIDX\x00\x00\x02"
+# Magic, file size, file mtime in nanoseconds, number of lines, number of blank lines
+INDEX_HEADER = struct.Struct("<8sQQQQ")
+
+
+class LineIndex:
+    """The start offsets of every line in a file, and the numbers of the blank lines."""
+
+    def __init__(self, offsets: np.ndarray, size: int, blank_lines: np.ndarray):
+        self.offsets = offsets
+        self.size = size
+        self.blank_lines = blank_lines
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def offset(self, line_number: int) -> int:
+        """The byte offset where a line starts, or the end of the file for lines past the end."""
+        if line_number >= len(self):
+            return self.size
+        return int(self.offsets[line_number])
+
+    def nonblank_lines(self) -> np.ndarray:
+        """The numbers of the lines that aren't blank, which are what reading the file line by line finds."""
+        return np.delete(np.arange(len(self)), self.blank_lines.astype(np.int64))
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def _file_signature(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def line_starts(chunks: Iterable[bytes], size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the offset of the start of every line in consecutive chunks of a file, by scanning them for newlines, and the
+    numbers of the blank lines.
+    """
+    starts = [np.zeros(1, dtype=np.uint64)]
+    blank_lines = BlankLineFinder()
+    chunk_start = 0
+    for chunk in chunks:
+        newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord("\n"))
+        starts.append(newlines.astype(np.uint64) + np.uint64(chunk_start + 1))
+        blank_lines.add(chunk, newlines)
+        chunk_start += len(chunk)
+    offsets = np.concatenate(starts)
+    # A trailing newline doesn't start another line
+    if offsets[-1] == size:
+        offsets = offsets[:-1]
+    return offsets, blank_lines.finish()
+
+
+def find_line_starts(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the byte offset of the start of every line, and the blank lines, by scanning the memory-mapped file for
+    newlines in large blocks.
+    """
+    with MappedFile(path) as mapped:
+        view = memoryview(mapped.buffer)
+        chunks = (view[chunk_start:chunk_start + SCAN_CHUNK_SIZE] for chunk_start in range(0, mapped.size, SCAN_CHUNK_SIZE))
+        starts = line_starts(chunks, mapped.size)
+        # Release the buffer before the file is unmapped
+        view.release()
+    return starts
+
+
+def write_index(index_file: str, offsets: np.ndarray, blank_lines: np.ndarray, size: int, mtime_ns: int) -> None:
+    """Writes the line offsets and blank lines of a file with this size and modification time."""
+    try:
+        tmp_path = index_file + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, size, mtime_ns, len(offsets), len(blank_lines)))
+            f.write(offsets.tobytes())
+            f.write(blank_lines.tobytes())
+        os.replace(tmp_path, index_file)
+    except OSError as e:
+        print(f"Could not write index file {index_file}: {e}")
+
+
+def read_index(index_file: str, size: int, mtime_ns: int) -> Optional[LineIndex]:
+    """Reads line offsets written by `write_index`, or returns None if there aren't any for this version of the file."""
+    try:
+        with open(index_file, "rb") as f:
+            header = f.read(INDEX_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != INDEX_HEADER.size:
+        return None
+    magic, index_size, index_mtime_ns, num_lines, num_blank = INDEX_HEADER.unpack(header)
+    if magic != INDEX_MAGIC or (index_size, index_mtime_ns) != (size, mtime_ns):
+        return None
+    if num_lines == 0:
+        return LineIndex(np.zeros(0, dtype=np.uint64), size, np.zeros(0, dtype=np.uint64))
+    offsets = np.memmap(index_file, dtype=np.uint64, mode="r", offset=INDEX_HEADER.size, shape=(num_lines,))
+    blank_lines = np.fromfile(index_file, dtype=np.uint64, count=num_blank, offset=INDEX_HEADER.size + num_lines * 8)
+    if len(blank_lines) != num_blank:
+        return None
+    return LineIndex(offsets, size, blank_lines)
+
+
+def build_index(path: str) -> LineIndex:
+    """Builds the index for the file, and writes it next to the file if possible."""
+    size, mtime_ns = _file_signature(path)
+    offsets, blank_lines = find_line_starts(path)
+    write_index(index_path(path), offsets, blank_lines, size, mtime_ns)
+    return LineIndex(offsets, size, blank_lines)
+
+
+def load_index(path: str) -> Optional[LineIndex]:
+    """Loads the index for the file, or returns None if there isn't one or it's out of date."""
+    return read_index(index_path(path), *_file_signature(path))
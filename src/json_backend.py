@@ -0,0 +1,105 @@
+"""
+A single place to decode and encode JSON, decoding with the fastest library that is installed.
+
+orjson, ujson and simdjson are all much faster than the standard library on large records, but none of them are
+required. Anything the accelerated library can't handle (like `NaN`, which the standard library accepts) falls back to
+the standard library, so the results and errors are the same whichever backend is used. The one difference is that
+orjson decodes integers too big for 64 bits as floats.
+
+Encoding always uses the standard library. Each library spaces and escapes its output a little differently, and the
+encoded values are printed for --raw and used as the categories in the column cache, so they mustn't depend on which
+libraries happen to be installed.
+"""
+
+import json
+import time
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Optional
+
+# In order of preference for "auto"
+BACKENDS = ["orjson", "ujson", "simdjson", "json"]
+
+_backend = "json"
+_loads: Callable[[str], Any] = json.loads
+
+
+def _make_backend(name: str) -> Callable[[str], Any]:
+    """Imports a backend's decoder, raising ImportError if it isn't installed."""
+    if name == "json":
+        return json.loads
+    if name == "orjson":
+        import orjson
+
+        return orjson.loads
+    if name == "ujson":
+        import ujson
+
+        return ujson.loads
+    if name == "simdjson":
+        import simdjson
+
+        return simdjson.loads
+    raise ValueError(f"Unknown JSON backend: {name}. Options are: auto, {', '.join(BACKENDS)}")
+
+
+def available_backends() -> list[str]:
+    available = []
+    for name in BACKENDS:
+        try:
+            _make_backend(name)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def set_backend(name: str = "auto") -> str:
+    """Switches to the named backend, or the fastest installed one for "auto". Returns the name of the backend used."""
+    global _backend, _loads
+    if name == "auto":
+        name = available_backends()[0]
+    _loads = _make_backend(name)
+    _backend = name
+    return name
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def loads(s: str) -> Any:
+    if _backend == "json":
+        return json.loads(s)
+    try:
+        return _loads(s)
+    except (ValueError, OverflowError):
+        # The standard library either handles it (like NaN or huge numbers) or raises the usual JSONDecodeError
+        return json.loads(s)
+
+
+def dumps(obj: Any, indent: Optional[int] = None) -> str:
+    return json.dumps(obj, indent=indent)
+
+
+def benchmark(lines: Iterable[tuple[int, str]]) -> None:
+    """Times decoding the lines with every installed backend."""
+    texts = [line for _, line in lines]
+    total_mb = sum(len(text) for text in texts) / 1e6
+    print(f"Benchmarking JSON backends on {len(texts)} problems ({total_mb:.1f} MB)")
+    previous = get_backend()
+    for name in available_backends():
+        set_backend(name)
+        start = time.perf_counter()
+        for text in texts:
+            try:
+                loads(text)
+            except json.JSONDecodeError:
+                pass
+        decode_time = time.perf_counter() - start
+        print(f"  {name:10} decode: {decode_time:.3f}s ({total_mb / max(decode_time, 1e-9):.0f} MB/s)")
+    set_backend(previous)
+
+
+set_backend("auto")
@@ -0,0 +1,190 @@
+"""
+Partial JSON decoding, which only materializes the keys that were asked for.
+
+Eval records often carry megabyte-sized strings (like `resps` or `executed_attempts`) that we never look at when
+printing a few `--parts`. A full `json.loads` still builds every one of them. Instead, this scans the line for the
+requested keys, and skips over every other value, so that skipped lists and objects are never built. Only the
+requested values are decoded, with the standard library's C decoder.
+
+Skipped values are still checked against the JSON grammar, so a line is only accepted if `json.loads` would accept it
+too. Anything malformed is handed to the full decoder, which raises the usual error.
+"""
+
+import json
+import re
+from json.decoder import scanstring
+from typing import Any
+from typing import Iterable
+from typing import Union
+
+import json_backend
+
+# Lines shorter than this are decoded in full, since a fast full decode beats scanning them in Python
+LAZY_MIN_LENGTH = 1 << 14
+
+_NUMBER = r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?"
+_NUMBER_RE = re.compile(_NUMBER)
+# Long strings are left to `_skip_string`, which finds their end much faster than a regex can
+_SHORT_STRING = r'"[^"\\\x00-\x1f]{0,256}"'
+_SIMPLE_VALUE = rf"(?:{_NUMBER}|true|false|null|{_SHORT_STRING})"
+_WS = r"[ \t\n\r]*"
+_MEMBER = rf"{_SHORT_STRING}{_WS}:{_WS}{_SIMPLE_VALUE}{_WS}"
+_FLAT_OBJECT = rf"\{{{_WS}(?:{_MEMBER}(?:,{_WS}{_MEMBER})*)?\}}"
+# Runs of small values at the start of a list or object, each followed by a comma, like a list of scores or of small
+# objects. These are checked in one go by the regex engine, instead of one at a time.
+_ELEMENTS_RE = re.compile(rf"(?:(?:{_SIMPLE_VALUE}|{_FLAT_OBJECT}){_WS},{_WS})*")
+_MEMBERS_RE = re.compile(rf"(?:{_SHORT_STRING}{_WS}:{_WS}(?:{_SIMPLE_VALUE}|{_FLAT_OBJECT}){_WS},{_WS})*")
+_UNSAFE_STRING_CHARACTERS = ["\\"] + [chr(i) for i in range(0x20)]
+# The standard library also accepts NaN and the infinities
+_CONSTANTS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+PathTree = dict[str, Union["PathTree", bool]]
+
+
+def build_path_tree(paths: Iterable[str]) -> PathTree:
+    """
+    Turns slash paths into a nested dict of the keys to keep, where `True` means the whole value is needed. For
+    example, ["doc/question", "doc_id"] becomes {"doc": {"question": True}, "doc_id": True}.
+    """
+    tree: PathTree = {}
+    for path in paths:
+        node = tree
+        keys = path.split("/")
+        for key in keys[:-1]:
+            child = node.get(key)
+            if child is True:
+                break
+            if child is None:
+                child = node[key] = {}
+            node = child
+        else:
+            node[keys[-1]] = True
+    return tree
+
+
+def _skip_whitespace(s: str, pos: int) -> int:
+    return _WHITESPACE_RE.match(s, pos).end()
+
+
+def _skip_string(s: str, pos: int) -> int:
+    """Returns the position just after the string that starts at `pos`."""
+    if s.isascii():
+        end = s.index('"', pos + 1)
+        # Without escapes or control characters, the string is valid and ends at the first quote. Looking for each of
+        # those characters with `str.find` is a few scans at memory speed, which beats checking each character in a
+        # regex. Wider strings are scanned more slowly, so they're left to the standard library.
+        for c in _UNSAFE_STRING_CHARACTERS:
+            if s.find(c, pos + 1, end) != -1:
+                break
+        else:
+            return end + 1
+    # The standard library's string scanner checks the escapes, and is faster than any regex that does
+    return scanstring(s, pos + 1)[1]
+
+
+def _skip_array(s: str, pos: int) -> int:
+    pos = _skip_whitespace(s, pos + 1)
+    if s[pos] == "]":
+        return pos + 1
+    while True:
+        pos = _skip_whitespace(s, _skip_value(s, _ELEMENTS_RE.match(s, pos).end()))
+        if s[pos] == "]":
+            return pos + 1
+        if s[pos] != ",":
+            raise ValueError(f"Expected ',' or ']' at position {pos}")
+        pos = _skip_whitespace(s, pos + 1)
+
+
+def _skip_object(s: str, pos: int) -> int:
+    pos = _skip_whitespace(s, pos + 1)
+    if s[pos] == "}":
+        return pos + 1
+    while True:
+        pos = _MEMBERS_RE.match(s, pos).end()
+        if s[pos] != '"':
+            raise ValueError(f"Expected a key at position {pos}")
+        pos = _skip_whitespace(s, _skip_string(s, pos))
+        if s[pos] != ":":
+            raise ValueError(f"Expected ':' at position {pos}")
+        pos = _skip_whitespace(s, _skip_value(s, _skip_whitespace(s, pos + 1)))
+        if s[pos] == "}":
+            return pos + 1
+        if s[pos] != ",":
+            raise ValueError(f"Expected ',' or '}}' at position {pos}")
+        pos = _skip_whitespace(s, pos + 1)
+
+
+def _skip_value(s: str, pos: int) -> int:
+    """Returns the position just after the value that starts at `pos`, checking it's valid without decoding it."""
+    c = s[pos]
+    if c == '"':
+        return _skip_string(s, pos)
+    if c == "{":
+        return _skip_object(s, pos)
+    if c == "[":
+        return _skip_array(s, pos)
+    match = _NUMBER_RE.match(s, pos)
+    if match:
+        return match.end()
+    for constant in _CONSTANTS:
+        if s.startswith(constant, pos):
+            return pos + len(constant)
+    raise ValueError(f"Expected a value at position {pos}")
+
+
+def _parse_key(s: str, pos: int) -> tuple[str, int]:
+    if s[pos] != '"':
+        raise ValueError(f"Expected a key at position {pos}")
+    return scanstring(s, pos + 1)
+
+
+def _extract_object(s: str, pos: int, tree: PathTree) -> tuple[dict[str, Any], int]:
+    """Decodes the requested keys from the object starting at `pos`."""
+    result = {}
+    pos = _skip_whitespace(s, pos + 1)
+    if s[pos] == "}":
+        return result, pos + 1
+    while True:
+        key, pos = _parse_key(s, pos)
+        pos = _skip_whitespace(s, pos)
+        if s[pos] != ":":
+            raise ValueError(f"Expected ':' at position {pos}")
+        pos = _skip_whitespace(s, pos + 1)
+        wanted = tree.get(key)
+        if wanted is None:
+            pos = _skip_value(s, pos)
+        elif wanted is not True and s[pos] == "{":
+            result[key], pos = _extract_object(s, pos, wanted)
+        else:
+            result[key], pos = _decoder.raw_decode(s, pos)
+        pos = _skip_whitespace(s, pos)
+        if s[pos] == "}":
+            return result, pos + 1
+        if s[pos] != ",":
+            raise ValueError(f"Expected ',' or '}}' at position {pos}")
+        pos = _skip_whitespace(s, pos + 1)
+
+
+class PartialDecoder:
+    """Decodes lines into dicts that only contain the given slash paths (and whatever else is convenient)."""
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths = list(paths)
+        self.tree = build_path_tree(self.paths)
+
+    def loads(self, line: str) -> Any:
+        if len(line) < LAZY_MIN_LENGTH:
+            return json_backend.loads(line)
+        try:
+            pos = _skip_whitespace(line, 0)
+            if line[pos] != "{":
+                return json_backend.loads(line)
+            result, pos = _extract_object(line, pos, self.tree)
+            if _skip_whitespace(line, pos) != len(line):
+                raise ValueError("Extra data after the object")
+            return result
+        except (ValueError, IndexError, RecursionError):
+            # Malformed JSON, so let the full decoder produce the usual error (or handle it, like NaN)
+            return json_backend.loads(line)
@@ -0,0 +1,225 @@
+"""
+Reading JSONL files from S3, or anything that speaks the S3 API (like MinIO, or moto for testing), without downloading
+them first.
+
+Objects are read with ranged GETs, in blocks, over a small pool of connections. Reading lines in order prefetches the
+blocks after the one being read in parallel, ramping up as long as reading stays sequential, so printing the first few
+problems only fetches the first block. A line index, built with --build-index, is kept in the local cache directory
+(objects can't have files next to them), and lets --start and --randomize fetch exactly the lines they need.
+"""
+
+import fnmatch
+import io
+import os
+import re
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+
+from cache import cache_dir, cache_key
+from compressed import JSONL_SUFFIXES
+from indexing import LineIndex, line_starts, read_index, write_index
+from reading import iter_lines
+
+# The size of the ranged GETs made while reading in order
+BLOCK_SIZE = 1 << 22
+# How many blocks can be fetched ahead of the one being read, and how many requests can be made at once
+MAX_PREFETCH_BLOCKS = 8
+MAX_CONNECTIONS = 8
+
+
+def _boto3():
+    try:
+        import boto3
+    except ImportError:
+        raise ImportError(
+            'Reading from S3 needs the boto3 package. Install it with `pip install "pprint_problems[s3]"`.'
+        ) from None
+    return boto3
+
+
+def is_s3_url(path) -> bool:
+    return isinstance(path, str) and path.lower().startswith("s3://")
+
+
+def parse_s3_url(url: str) -> tuple[str, str]:
+    """The bucket and key of an `s3://bucket/key` URL."""
+    bucket, _, object_key = url[len("s3://"):].partition("/")
+    if not bucket or not object_key:
+        raise ValueError(f"Expected an S3 URL like s3://bucket/path/to/file.jsonl, not {url}")
+    return bucket, object_key
+
+
+def list_s3_objects(pattern: str, endpoint_url: Optional[str] = None) -> list[str]:
+    """
+    The URLs of the objects matching a glob like `s3://bucket/sweep/*.jsonl`, or of every JSONL object under a prefix
+    that ends with a slash, like `s3://bucket/sweep/`. Unlike in a shell, `*` also matches slashes.
+    """
+    bucket, _, key_pattern = pattern[len("s3://"):].partition("/")
+    if not bucket:
+        raise ValueError(f"Expected an S3 URL like s3://bucket/path/*.jsonl, not {pattern}")
+    prefix = re.split(r"[*?\[]", key_pattern, maxsplit=1)[0]
+    client = _boto3().client("s3", endpoint_url=endpoint_url)
+    keys = []
+    for page in client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        keys.extend(item["Key"] for item in page.get("Contents", []))
+    if key_pattern != prefix:
+        keys = [object_key for object_key in keys if fnmatch.fnmatchcase(object_key, key_pattern)]
+    else:
+        keys = [object_key for object_key in keys if object_key.endswith(JSONL_SUFFIXES)]
+    return [f"s3://{bucket}/{object_key}" for object_key in sorted(keys)]
+
+
+class S3Object(io.RawIOBase):
+    """
+    A seekable, read-only file over an S3 object. Every request is pinned to the ETag that the object had when it was
+    opened, so that if the object is replaced while it's being read, reading fails instead of mixing two versions.
+    """
+
+    def __init__(self, url: str, endpoint_url: Optional[str] = None):
+        boto3 = _boto3()
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+
+        self.url = url
+        self.bucket, self.key = parse_s3_url(url)
+        self.client = boto3.client(
+            "s3", endpoint_url=endpoint_url, config=Config(max_pool_connections=MAX_CONNECTIONS)
+        )
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.key)
+        except ClientError as e:
+            raise OSError(f"Could not open {url}: {e}") from None
+        self.size = head["ContentLength"]
+        self.etag = head["ETag"]
+        self.mtime_ns = int(head["LastModified"].timestamp() * 1e9)
+        self.position = 0
+        self.executor = ThreadPoolExecutor(MAX_CONNECTIONS)
+        # Blocks that have been requested, by block number
+        self.blocks: dict[int, Future] = {}
+        self.prefetch = 0
+        # For reading lines. It's kept rather than made as needed, since closing it would close this too.
+        self.reader = io.BufferedReader(self, 1 << 16)
+
+    def __enter__(self) -> "S3Object":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if not self.closed:
+            # Don't wait for blocks that won't be read, like when we stop early with -n
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.blocks.clear()
+        super().close()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset // BLOCK_SIZE != self.position // BLOCK_SIZE:
+            # Reading isn't sequential anymore, so don't fetch ahead until it is again
+            self.prefetch = 0
+            self.blocks.clear()
+        self.position = max(0, offset)
+        return self.position
+
+    def read_range(self, start: int, end: int) -> bytes:
+        """Fetches the bytes from `start` to `end` with a single ranged GET."""
+        if start >= min(end, self.size):
+            return b""
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{min(end, self.size) - 1}", IfMatch=self.etag
+        )
+        return response["Body"].read()
+
+    def _block(self, number: int) -> Future:
+        future = self.blocks.get(number)
+        if future is None:
+            start = number * BLOCK_SIZE
+            future = self.blocks[number] = self.executor.submit(self.read_range, start, start + BLOCK_SIZE)
+        return future
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size:
+            return 0
+        number = self.position // BLOCK_SIZE
+        for ahead in range(number, min(number + self.prefetch, (self.size - 1) // BLOCK_SIZE) + 1):
+            self._block(ahead)
+        block = self._block(number).result()
+        start = self.position - number * BLOCK_SIZE
+        size = min(len(buffer), len(block) - start)
+        buffer[:size] = block[start:start + size]
+        self.position += size
+        if self.position // BLOCK_SIZE != number:
+            # Finished the block in order, so fetch further ahead
+            self.blocks.pop(number, None)
+            self.prefetch = min(MAX_PREFETCH_BLOCKS, self.prefetch + 1)
+        return size
+
+    def iter_blocks(self) -> Iterator[bytes]:
+        """Yields the whole object in order, a block at a time."""
+        self.seek(0)
+        while True:
+            block = self.read(BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+    def iter_lines(self, offset: int = 0, first_index: int = 0) -> Iterator[tuple[int, str]]:
+        """Like `reading.iter_lines`, from a byte offset where a line starts."""
+        self.reader.seek(offset)
+        yield from iter_lines(self.reader, first_index)
+
+    def lines_at(self, line_numbers: Iterable[int], index: LineIndex) -> Iterator[tuple[int, str]]:
+        """
+        Yields the lines with these numbers, in the same order, fetching each one with its own ranged GET, several at
+        a time. Blank lines aren't yielded.
+        """
+        window = deque()
+        line_numbers = iter(line_numbers)
+        while True:
+            while len(window) < MAX_CONNECTIONS * 4:
+                line_number = next(line_numbers, None)
+                if line_number is None:
+                    break
+                future = self.executor.submit(
+                    self.read_range, index.offset(line_number), index.offset(line_number + 1)
+                )
+                window.append((line_number, future))
+            if not window:
+                return
+            line_number, future = window.popleft()
+            line = future.result().decode("utf-8").rstrip("\r\n")
+            if line.strip():
+                yield line_number, line
+
+
+def _index_file(remote: S3Object) -> str:
+    return str(cache_dir("indexes") / f"{cache_key(remote.url, remote.etag)}.ppidx")
+
+
+def build_remote_index(remote: S3Object) -> LineIndex:
+    """Reads the whole object once to find where its lines start, and keeps the index in the cache directory."""
+    offsets, blank_lines = line_starts(remote.iter_blocks(), remote.size)
+    write_index(_index_file(remote), offsets, blank_lines, remote.size, remote.mtime_ns)
+    return LineIndex(offsets, remote.size, blank_lines)
+
+
+def load_remote_index(remote: S3Object) -> Optional[LineIndex]:
+    """Loads the index for the current version of the object, if one has been built."""
+    return read_index(_index_file(remote), remote.size, remote.mtime_ns)
@@ -11,15 +11,31 @@ python pprint_json.py dev.jsonl -n 1 -p label text -r
 import argparse
 import difflib
 import json
+import math
+import multiprocessing
+import os
+import pickle
 import random
 import sys
+from collections import deque
+from itertools import chain
+from pathlib import Path
 from typing import Any
 from typing import Dict
+from typing import Iterable
 from typing import Optional
 from typing import TextIO
 
+import json_backend
+from cache import cache_dir, cache_key, evict, prefix_unchanged, stamp_prefix, touch
+from lazy_json import PartialDecoder
+from sketches import ExactSum, HyperLogLog, stable_hash
+from reading import MappedFile, SEARCH_CHUNK_SIZE, resolve_jobs
+from schema import SchemaNode, format_schema
+from shards import map_shards, open_shard, shard_jobs
 from printing import print_header_2, print_code, print_text, print_header_3
-from printing import print_header_1, print_text, print_code
+from printing import print_header_1, print_text, print_code, print_plain, flush_file_output
+from printing import capture_output, get_render_settings, take_captured_output, write_rendered
 
 
 def process_file(file: TextIO) -> str:
@@ -44,6 +60,14 @@ COMMON_LOCATIONS: dict[str, list[str]] = {
 }
 
 
+# Other keys that `print_problem` reads from the original problem when printing these parts
+PART_DEPENDENCIES: dict[str, list[str]] = {
+    "broken_diff": COMMON_LOCATIONS["code"] + COMMON_LOCATIONS["broken_code"],
+    "tests": ["tests_pass", "tests_error", "tests_error_texts"],
+    "attempts": ["executed_attempts"],
+}
+
+
 def get_nested_value(d: dict, keys: list[str]) -> Any:
     for key in keys:
         if key in d:
@@ -86,6 +110,16 @@ def build_parts(problem: dict, parts: list[str]) -> dict[str, Any]:
     return results
 
 
+def required_paths(parts: list[str]) -> list[str]:
+    """The slash paths that `print_problem` might read to print these parts, so that nothing else has to be decoded."""
+    paths = []
+    for part in parts:
+        paths.append(part)
+        paths.extend(COMMON_LOCATIONS.get(part, []))
+        paths.extend(PART_DEPENDENCIES.get(part, []))
+    return paths
+
+
 def get_all_keys(problem: dict) -> list[str]:
     places = list(problem.keys())
     keys = []
@@ -169,7 +203,7 @@ def print_problem(orig_problem, parts: Optional[list[str]] = None, types_to_prin
                     print_text(f'Return code: {rc} ({"success" if rc == 0 else "failure" if rc == 1 else "unknown"})')
             except KeyError as e:
                 print_text(f"Error parsing attempts. KeyError: {e}")
-                print_text(f"Problem details: {json.dumps(orig_problem)}")
+                print_text(f"Problem details: {json_backend.dumps(orig_problem)}")
         elif part not in problem:
             if not using_default_parts:
                 print_text(f'Part "{part}" not found in problem. Run with --structure to see available parts.')
@@ -212,11 +246,11 @@ def print_problem(orig_problem, parts: Optional[list[str]] = None, types_to_prin
             print_text("\n".join([f" - {c}" for c in problem[part]]))
         elif isinstance(problem[part], list):
             for i, item in enumerate(problem[part]):
-                print(f"{i+1}.\t{item}")
+                print_plain(f"{i+1}.\t{item}")
         else:
             # Unknown type fallback
             if not isinstance(problem[part], str):
-                print_text(json.dumps(problem[part], indent=4))
+                print_text(json_backend.dumps(problem[part], indent=4))
             else:
                 if is_code_like:
                     print_code(problem[part], print_line_numbers=print_line_numbers)
@@ -234,32 +268,177 @@ def get_type(value: Any) -> str:
 
 
 class DataRange:
-    """A class to represent a range of data values, for stats printing"""
+    """
+    A summary of the values seen at one key path, for stats printing. It only keeps running totals, a few counts and a
+    bounded set of the distinct values, with long strings replaced by their hash, so it uses the same memory however
+    many problems are summarized, and however long their values are.
+    """
+
+    # Exact counts of each value are only kept while there are few enough distinct values to print them all
+    MAX_COUNTED_VALUES = 3
+    # Past this many distinct values, they're estimated with a HyperLogLog sketch instead of counted exactly
+    MAX_EXACT_DISTINCT = 1 << 14
+    # Strings longer than this are kept in the set as the bytes of their `stable_hash`, which no JSON value is equal to
+    MAX_KEPT_LENGTH = 64
 
     def __init__(self):
-        self.values = []
+        self.count = 0
+        self.all_lists = True
+        self.all_numbers = True
+        self.all_strings = True
+        # Lists can't be counted or put in a set
+        self.unhashable = False
+        # Lengths of lists and strings
+        self.min_length = None
+        self.max_length = None
+        self.minimum = None
+        self.maximum = None
+        self.int_sum = 0
+        self.float_sum = ExactSum()
+        self.has_floats = False
+        self.counts: Optional[dict] = {}
+        self.distinct: Optional[set] = set()
+        self.sketch: Optional[HyperLogLog] = None
+
+    def add(self, value: Any) -> None:
+        self.count += 1
+        if isinstance(value, list):
+            self.all_numbers = self.all_strings = False
+            self.unhashable = True
+            self._add_length(len(value))
+            return
+        self.all_lists = False
+        if isinstance(value, str):
+            self.all_numbers = False
+            self._add_length(len(value))
+        elif isinstance(value, (int, float)):
+            self.all_strings = False
+            if self.all_numbers:
+                self._add_number(value)
+        else:
+            self.all_numbers = self.all_strings = False
+        if not self.unhashable:
+            self._add_distinct(value)
+
+    def _add_length(self, length: int) -> None:
+        if self.min_length is None or length < self.min_length:
+            self.min_length = length
+        if self.max_length is None or length > self.max_length:
+            self.max_length = length
+
+    def _add_number(self, value) -> None:
+        # Like min() and max(), keep the first of equal values
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if isinstance(value, float):
+            self.float_sum.add(value)
+            self.has_floats = True
+        else:
+            self.int_sum += value
+
+    def _add_distinct(self, value) -> None:
+        if self.counts is not None:
+            self.counts[value] = self.counts.get(value, 0) + 1
+            if len(self.counts) > self.MAX_COUNTED_VALUES:
+                self.counts = None
+        if isinstance(value, str) and len(value) > self.MAX_KEPT_LENGTH:
+            value = stable_hash(value).to_bytes(8, "little")
+        self._add_distinct_value(value)
+
+    def _add_distinct_value(self, value) -> None:
+        if self.distinct is not None:
+            self.distinct.add(value)
+            if len(self.distinct) > self.MAX_EXACT_DISTINCT:
+                self._switch_to_sketch()
+        elif isinstance(value, bytes):
+            # Already hashed
+            self.sketch.add_hash(int.from_bytes(value, "little"))
+        else:
+            self.sketch.add(value)
+
+    def _switch_to_sketch(self) -> None:
+        distinct = self.distinct
+        self.sketch = HyperLogLog()
+        self.distinct = None
+        for value in distinct:
+            self._add_distinct_value(value)
+
+    def merge(self, other: "DataRange") -> None:
+        """
+        Adds in the summary of values that came after this one's, like those in a later part of the file. The result is
+        the same as if all the values had been added to this summary.
+        """
+        self.count += other.count
+        self.all_lists = self.all_lists and other.all_lists
+        self.all_strings = self.all_strings and other.all_strings
+        self.unhashable = self.unhashable or other.unhashable
+        if other.min_length is not None:
+            self._add_length(other.min_length)
+            self._add_length(other.max_length)
+        if self.all_numbers and other.all_numbers and other.minimum is not None:
+            self._add_number_range(other)
+        self.all_numbers = self.all_numbers and other.all_numbers
+        if self.counts is not None and other.counts is not None:
+            for value, count in other.counts.items():
+                self.counts[value] = self.counts.get(value, 0) + count
+            if len(self.counts) > self.MAX_COUNTED_VALUES:
+                self.counts = None
+        else:
+            self.counts = None
+        if other.distinct is not None:
+            for value in other.distinct:
+                self._add_distinct_value(value)
+        else:
+            if self.sketch is None:
+                self._switch_to_sketch()
+            self.sketch.merge(other.sketch)
+
+    def _add_number_range(self, other: "DataRange") -> None:
+        if self.minimum is None or other.minimum < self.minimum:
+            self.minimum = other.minimum
+        if self.maximum is None or other.maximum > self.maximum:
+            self.maximum = other.maximum
+        self.int_sum += other.int_sum
+        self.float_sum.merge(other.float_sum)
+        self.has_floats = self.has_floats or other.has_floats
+
+    @property
+    def mean(self) -> float:
+        if not self.has_floats:
+            return self.int_sum / self.count
+        total = ExactSum()
+        total.merge(self.float_sum)
+        total.add(self.int_sum)
+        return total.value() / self.count
+
+    def distinct_str(self) -> str:
+        if self.distinct is not None:
+            return str(len(self.distinct))
+        return f"~{self.sketch.estimate()}"
 
     def __str__(self) -> str:
         try:
-            if all(isinstance(value, list) for value in self.values):
+            if self.all_lists:
                 # Check this first, because lists aren't hashable
-                return f"lengths: {min(len(value) for value in self.values)} to {max(len(value) for value in self.values)}"
-            elif len(set(self.values)) <= 3:
-                if all(isinstance(value, str) for value in self.values) and any(len(value) > 20 for value in self.values):
+                return f"lengths: {self.min_length} to {self.max_length}"
+            elif self.unhashable:
+                # Lists mixed with other values can't be counted
+                return ""
+            elif self.counts is not None:
+                if self.all_strings and self.max_length > 20:
                     pass # Do nothing, pass through to next if
                 else:
-                    # Calculate counts of each value
-                    counts = {value: self.values.count(value) for value in set(self.values)}
-                    percentages = {value: count / sum(counts.values()) for value, count in counts.items()}
-                    return ", ".join([f"{percentages[value] * 100:.0f}% {value}" for value in sorted(counts.keys())])
+                    return ", ".join([f"{count / self.count * 100:.0f}% {value}" for value, count in sorted(self.counts.items(), key=lambda item: item[0])])
 
             # Don't make this elif
-            if all(isinstance(value, (int, float)) for value in self.values):
-                return f"{min(self.values)} to {max(self.values)}, avg: {sum(self.values) / len(self.values)}"
-            elif all(isinstance(value, str) for value in self.values):
-                return f"{len(set(self.values))} distinct values, length: {min(len(value) for value in self.values)} to {max(len(value) for value in self.values)}"
+            if self.all_numbers:
+                return f"{self.minimum} to {self.maximum}, avg: {self.mean}"
+            elif self.all_strings:
+                return f"{self.distinct_str()} distinct values, length: {self.min_length} to {self.max_length}"
             else:
-                return f"{len(set(self.values))} distinct values"
+                return f"{self.distinct_str()} distinct values"
         except TypeError:
             # No real fallback
             return ""
@@ -274,10 +453,10 @@ def add_to_data_ranges(data: dict[str, Any], keys: list[str], value_stats: dict[
         else:
             if key_str not in value_stats:
                 value_stats[key_str] = DataRange()
-            value_stats[key_str].values.append(value)
+            value_stats[key_str].add(value)
 
 
-def get_data_ranges(data: list[dict[str, Any]]) -> dict[str, DataRange]:
+def get_data_ranges(data: Iterable[dict[str, Any]]) -> dict[str, DataRange]:
     data_ranges = {}
     for item in data:
         add_to_data_ranges(item, [], data_ranges)
@@ -285,6 +464,140 @@ def get_data_ranges(data: list[dict[str, Any]]) -> dict[str, DataRange]:
     return data_ranges
 
 
+def merge_data_ranges(data_ranges: dict[str, DataRange], other: dict[str, DataRange]) -> None:
+    """Merges the summaries of later problems into `data_ranges`."""
+    for key, data_range in other.items():
+        if key in data_ranges:
+            data_ranges[key].merge(data_range)
+        else:
+            data_ranges[key] = data_range
+
+
+def _data_ranges_in_range(task: tuple[str, int, int, str]) -> tuple[int, dict[str, DataRange]]:
+    """Worker for `get_file_data_ranges`. Returns the number of problems in the byte range, and their summaries."""
+    path, start, end, backend = task
+    json_backend.set_backend(backend)
+    data_ranges = {}
+    num_problems = 0
+    with MappedFile(path) as mapped:
+        for _, line in mapped.iter_lines(start, end=end):
+            add_to_data_ranges(json_backend.loads(line), [], data_ranges)
+            num_problems += 1
+    return num_problems, data_ranges
+
+
+def get_file_data_ranges(
+    mapped: MappedFile, jobs: int, start: int = 0, end: Optional[int] = None
+) -> tuple[dict[str, DataRange], int]:
+    """
+    Summarizes every problem in the file, or in the whole lines from `start` to `end`, with a pool of worker processes
+    that each summarize newline-aligned byte ranges. Returns the summaries and the number of problems.
+    """
+    end = mapped.size if end is None else end
+    num_ranges = max(jobs, math.ceil((end - start) / SEARCH_CHUNK_SIZE))
+    ranges = mapped.split_ranges(num_ranges, start, end)
+    tasks = [(mapped.path, range_start, range_end, json_backend.get_backend()) for range_start, range_end in ranges]
+    data_ranges = {}
+    num_problems = 0
+    # Merge in file order, so the result is the same as summarizing the problems one by one
+    for range_problems, range_data_ranges in map_shards(_data_ranges_in_range, tasks, jobs):
+        merge_data_ranges(data_ranges, range_data_ranges)
+        num_problems += range_problems
+    return data_ranges, num_problems
+
+
+# Bump this when DataRange changes, so that old cached summaries aren't used
+DATA_RANGES_CACHE_VERSION = 3
+
+
+def _data_ranges_cache_path(path: str) -> Path:
+    return cache_dir("ranges") / f"{cache_key(os.path.abspath(path), f'ranges-v{DATA_RANGES_CACHE_VERSION}')}.pkl"
+
+
+def load_cached_data_ranges(path: str) -> Optional[tuple[dict[str, DataRange], int, int]]:
+    """
+    The summaries of the problems in the file, if they're in the cache, along with the number of problems and the byte
+    offset that they were summarized up to. Summaries of an earlier version of the file are only used if it's been
+    appended to since.
+    """
+    cache_path = _data_ranges_cache_path(path)
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not prefix_unchanged(path, cached["stamp"]):
+        # The file was changed, rather than appended to
+        return None
+    touch(cache_path)
+    return cached["data_ranges"], cached["num_problems"], cached["stamp"]["offset"]
+
+
+def save_cached_data_ranges(path: str, data_ranges: dict[str, DataRange], num_problems: int, offset: int) -> None:
+    """Caches the summaries of the problems in the first `offset` bytes of the file."""
+    stamp = stamp_prefix(path, offset)
+    if stamp is None:
+        return
+    cache_path = _data_ranges_cache_path(path)
+    tmp_path = cache_path.with_suffix(".tmp")
+    cached = {"data_ranges": data_ranges, "num_problems": num_problems, "stamp": stamp}
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print_text(f"Warning: could not cache the data ranges of {path} in {cache_path}: {e}")
+        return
+    evict(cache_path.parent)
+
+
+def get_cached_file_data_ranges(mapped: MappedFile, jobs: Optional[int]) -> tuple[dict[str, DataRange], int, int]:
+    """
+    Like `get_file_data_ranges`, using the cache. If the file has been appended to since it was summarized, only the
+    new problems are summarized, and merged into the cached summaries. Returns the summaries, the number of problems,
+    and how many of them were summarized from the cache.
+    """
+    # A last line without a newline might still be being written, so it's summarized but not cached
+    end = mapped.complete_size()
+    cached = load_cached_data_ranges(mapped.path)
+    data_ranges, num_cached, start = cached if cached is not None else ({}, 0, 0)
+    num_problems = num_cached
+    if start < end or cached is None:
+        new_data_ranges, num_new = get_file_data_ranges(mapped, resolve_jobs(jobs, end - start), start, end)
+        merge_data_ranges(data_ranges, new_data_ranges)
+        num_problems += num_new
+        save_cached_data_ranges(mapped.path, data_ranges, num_problems, end)
+    if end < mapped.size:
+        tail_problems, tail_data_ranges = _data_ranges_in_range((mapped.path, end, mapped.size, json_backend.get_backend()))
+        merge_data_ranges(data_ranges, tail_data_ranges)
+        num_problems += tail_problems
+    return data_ranges, num_problems, num_cached
+
+
+def _shard_data_ranges(task: tuple[str, str, Optional[str]]) -> tuple[int, dict[str, DataRange]]:
+    """Worker for `get_shards_data_ranges`. Returns the number of problems in a shard, and their summaries."""
+    path, backend, s3_endpoint_url = task
+    json_backend.set_backend(backend)
+    data_ranges = {}
+    num_problems = 0
+    with open_shard(path, s3_endpoint_url) as source:
+        for _, line in source.iter_lines():
+            add_to_data_ranges(json_backend.loads(line), [], data_ranges)
+            num_problems += 1
+    return num_problems, data_ranges
+
+
+def get_shards_data_ranges(args, shards: list[str]) -> tuple[dict[str, DataRange], int]:
+    """Summarizes every problem in several files, with a worker process for each file at a time."""
+    tasks = [(path, json_backend.get_backend(), args.s3_endpoint_url) for path in shards]
+    data_ranges = {}
+    num_problems = 0
+    for shard_problems, shard_data_ranges in map_shards(_shard_data_ranges, tasks, shard_jobs(args, shards)):
+        merge_data_ranges(data_ranges, shard_data_ranges)
+        num_problems += shard_problems
+    return data_ranges, num_problems
+
+
 def print_json_structure(data: Dict[str, Any], indent: int = 1, keys: list[dict] = None, data_ranges: dict[str, DataRange] = None) -> str:
     """Recursively print the structure of a JSON object."""
     if keys is None:
@@ -321,17 +634,82 @@ def print_json_structure(data: Dict[str, Any], indent: int = 1, keys: list[dict]
     return s + "    " * (indent - 1) + "}"
 
 
-def print_structure(args, lines: list[tuple[int, str]], print_data_ranges: bool = False):
+def print_structure(
+    args,
+    lines: Iterable[tuple[int, str]],
+    print_data_ranges: bool = False,
+    mapped: Optional[MappedFile] = None,
+    shards: Optional[list[str]] = None,
+):
+    """
+    Prints the structure of the first problem. With `print_data_ranges`, also prints summaries of every problem's
+    values. If `mapped` is given, the lines are every line of that file, and if `shards` is given, they're every line
+    of those files, so they can be summarized in parallel.
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        print_text("No problems to show the structure of.")
+        return
+    problem = json_backend.loads(first[1])
+    if args.union:
+        print_union_structure(args, problem, lines, print_data_ranges)
+        return
+    data_ranges = None
+    num_samples = 1
+    if print_data_ranges and mapped is not None and not args.no_cache:
+        data_ranges, num_samples, num_cached = get_cached_file_data_ranges(mapped, args.jobs)
+        if num_cached == num_samples:
+            print_text(f"Loaded the summaries of {num_cached} problems from the cache")
+        elif num_cached:
+            print_text(f"Summarized {num_samples - num_cached} new problems, and {num_cached} from the cache")
+    elif print_data_ranges and mapped is not None and resolve_jobs(args.jobs, mapped.size) > 1:
+        data_ranges, num_samples = get_file_data_ranges(mapped, resolve_jobs(args.jobs, mapped.size))
+    elif print_data_ranges and shards:
+        data_ranges, num_samples = get_shards_data_ranges(args, shards)
+    elif print_data_ranges:
+        # Stream the rest of the problems through the summaries, without keeping them around
+        def problems():
+            nonlocal num_samples
+            yield problem
+            for _, line in lines:
+                num_samples += 1
+                yield json_backend.loads(line)
+
+        data_ranges = get_data_ranges(problems())
     if print_data_ranges:
-        print_header_1(f"JSON Structure (problem {lines[0][0]}), with Data Ranges from {len(lines)} Samples")
+        print_header_1(f"JSON Structure (problem {first[0]}), with Data Ranges from {num_samples} Samples")
     else:
-        print_header_1(f"JSON Structure (problem {lines[0][0]})")
-    data_ranges = get_data_ranges([json.loads(line[1]) for line in lines]) if print_data_ranges else None
-    problem = json.loads(lines[0][1])
+        print_header_1(f"JSON Structure (problem {first[0]})")
     structure = print_json_structure(problem, data_ranges=data_ranges)
     print_code(structure, print_line_numbers=args.line_numbers, lexer="python")
 
 
+def print_union_structure(args, problem: dict, lines: Iterable[tuple[int, str]], print_data_ranges: bool = False):
+    """Prints the union of the structures of `problem` and the problems in the rest of the lines."""
+    schema = SchemaNode()
+    data_ranges = {} if print_data_ranges else None
+    num_samples = 0
+    unchanged = 0
+    stable = False
+    for item in chain([problem], (json_backend.loads(line) for _, line in lines)):
+        num_samples += 1
+        if data_ranges is not None:
+            add_to_data_ranges(item, [], data_ranges)
+        unchanged = 0 if schema.add(item) else unchanged + 1
+        if args.schema_stable and unchanged >= args.schema_stable:
+            stable = True
+            break
+    header = f"Union JSON Structure of {num_samples} Problems"
+    if print_data_ranges:
+        header += ", with Data Ranges"
+    print_header_1(header)
+    if stable:
+        print_text(f"Stopped early, because the structure didn't change in the last {unchanged} problems.")
+    structure = format_schema(schema, data_ranges=data_ranges)
+    print_code(structure, print_line_numbers=args.line_numbers, lexer="python")
+
+
 def remove_type_keys(data: Any) -> Any:
     if isinstance(data, dict):
         return {k: remove_type_keys(v) for k, v in data.items() if k != "__type"}
@@ -355,28 +733,119 @@ def truncate_strings(data, max_length):
         return data
 
 
+# The arguments that `print_one_problem` uses, which are all that rendering workers get
+RENDER_ARGS = ["parts", "types", "line_numbers", "raw", "max_str_len", "renumber", "manual_filter"]
+# Don't start rendering workers for fewer problems than this
+PARALLEL_RENDER_MIN_PROBLEMS = 64
+# How many problems each rendering worker can be ahead of what's been written
+RENDER_WINDOW_PER_JOB = 8
+
+
+def print_one_problem(args, selection_index: int, original_index: int, line: str, decoder: Optional[PartialDecoder]) -> Optional[Any]:
+    """Prints one problem's header and parts. Returns the decoded problem, or None if it isn't valid JSON."""
+    if args.renumber:
+        print_header_1(f"Problem {selection_index + 1}")
+    else:
+        print_header_1(f"Problem {original_index}")
+    try:
+        problem = decoder.loads(line) if decoder else json_backend.loads(line)
+    except json.JSONDecodeError:
+        print_text(f"Problem on line {original_index} is not valid JSON")
+        return None
+    if args.raw:
+        p = problem
+        if args.max_str_len:
+            p = truncate_strings(p, args.max_str_len)
+        print_code(json_backend.dumps(p, indent=4), print_line_numbers=args.line_numbers, lexer="json")
+    else:
+        print_problem(problem, parts=args.parts, types_to_print=args.types, print_line_numbers=args.line_numbers)
+    return problem
+
+
+def get_decoder(args) -> Optional[PartialDecoder]:
+    """Only decode the parts that will be printed, unless the whole problem is needed."""
+    if args.parts and "all" not in args.parts and not args.raw and not args.manual_filter:
+        return PartialDecoder(required_paths(args.parts))
+    return None
+
+
+_worker_args = None
+_worker_decoder = None
+
+
+def _init_render_worker(render_args: argparse.Namespace, render_settings: dict, backend: str) -> None:
+    global _worker_args, _worker_decoder
+    _worker_args = render_args
+    _worker_decoder = get_decoder(render_args)
+    json_backend.set_backend(backend)
+    capture_output(render_settings)
+
+
+def _render_problem(task: tuple[int, int, str]) -> tuple[str, Optional[str]]:
+    """Worker for `render_in_parallel`. Returns the rendered problem, and what should go in --file-output for it."""
+    selection_index, original_index, line = task
+    print_one_problem(_worker_args, selection_index, original_index, line, _worker_decoder)
+    return take_captured_output()
+
+
+def num_selected_problems(args) -> Optional[int]:
+    """How many problems will be printed, if that's known before reading them."""
+    if args.num_problems is None or args.search or args.query:
+        # Any number of them might match
+        return None
+    remaining = max(0, args.num_problems - (args.start or 0))
+    return remaining if args.number is None else min(args.number, remaining)
+
+
+def get_render_jobs(args) -> int:
+    """
+    How many processes to render problems with. Rendering with rich is slow, so it uses every CPU when there are known
+    to be enough problems to make starting the workers worth it.
+    """
+    if args.manual_filter or args.follow:
+        # Needs to ask about each problem as it's printed, or prints them as they're written
+        return 1
+    if args.jobs is not None:
+        return max(1, args.jobs)
+    if not get_render_settings()["use_rich"]:
+        return 1
+    num_problems = num_selected_problems(args)
+    if num_problems is None or num_problems < PARALLEL_RENDER_MIN_PROBLEMS:
+        return 1
+    return os.cpu_count() or 1
+
+
+def render_in_parallel(args, lines: Iterable[tuple[int, str]], jobs: int) -> None:
+    """
+    Renders problems in a pool of worker processes, and writes them in order as they finish. At most a few problems
+    per worker are read ahead of what's been written, so memory stays flat however many problems there are.
+    """
+    render_args = argparse.Namespace(**{name: getattr(args, name) for name in RENDER_ARGS})
+    initargs = (render_args, get_render_settings(), json_backend.get_backend())
+    with multiprocessing.Pool(jobs, initializer=_init_render_worker, initargs=initargs) as pool:
+        pending = deque()
+        for selection_index, (original_index, line) in enumerate(lines):
+            pending.append(pool.apply_async(_render_problem, ((selection_index, original_index, line),)))
+            if len(pending) >= jobs * RENDER_WINDOW_PER_JOB:
+                write_rendered(*pending.popleft().get())
+        while pending:
+            write_rendered(*pending.popleft().get())
+
+
 def iterate_over_problems(args, lines):
+    jobs = get_render_jobs(args)
+    if jobs > 1:
+        render_in_parallel(args, lines, jobs)
+        return
     problem_number = args.start if args.start else 0  # For the post-loop filtering summary
     filter_included = 0
+    decoder = get_decoder(args)
     try:
         for selection_index, (original_index, line) in enumerate(lines):
             problem_number += 1
-            if args.renumber:
-                print_header_1(f"Problem {selection_index + 1}")
-            else:
-                print_header_1(f"Problem {original_index}")
-            try:
-                problem = json.loads(line)
-            except json.JSONDecodeError:
-                print_text(f"Problem on line {original_index} is not valid JSON")
+            problem = print_one_problem(args, selection_index, original_index, line, decoder)
+            if problem is None:
                 continue
-            if args.raw:
-                p = problem
-                if args.max_str_len:
-                    p = truncate_strings(p, args.max_str_len)
-                print_code(json.dumps(p, indent=4), print_line_numbers=args.line_numbers, lexer="json")
-            else:
-                print_problem(problem, parts=args.parts, types_to_print=args.types, print_line_numbers=args.line_numbers)
             if args.manual_filter:
                 include = input(f"Include this problem in {args.filter_output}? (y/N/q) ")
                 if include.lower() == "q":
@@ -384,7 +853,8 @@ def iterate_over_problems(args, lines):
                 if include.lower() == "y":
                     filter_included += 1
                     with open(args.filter_output, "a") as f:
-                        f.write(json.dumps(problem) + "\n")
+                        f.write(json_backend.dumps(problem) + "\n")
+            flush_file_output()
     except KeyboardInterrupt:
         if args.manual_filter:
             print_text("")
@@ -1,14 +1,47 @@
+import hashlib
+import io
+import sys
+from collections import OrderedDict
 from typing import Optional
 
 try:
     from rich.console import Console
     from rich.markdown import Markdown
+    from rich.segment import Segments
     from rich.syntax import Syntax
+    from rich.table import Table
+    from rich.terminal_theme import DEFAULT_TERMINAL_THEME
 
-    USE_RICH = True
+    RICH_INSTALLED = True
 except ImportError:
-    USE_RICH = False
+    RICH_INSTALLED = False
 
+RENDERERS = ["auto", "rich", "plain"]
+# Whether to render with rich. The plain renderer writes text straight to stdout, which is much faster.
+USE_RICH = RICH_INSTALLED
+# Whether the plain renderer can use ANSI escapes for bold and underlined headers
+USE_ANSI = False
+# Used by the plain renderer when stdout isn't a terminal, so that many small writes become a few big ones
+STDOUT_BUFFER_SIZE = 1 << 20
+# The page that --file-output's HTML goes in, before and after the output. Each piece of output is exported with its
+# styles inline, since the pieces are exported separately.
+HTML_PAGE_START = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<style>
+body {{
+    color: {foreground};
+    background-color: {background};
+}}
+</style>
+</head>
+<body>
+    <pre style="font-family:Menlo,'DejaVu Sans Mono',consolas,'Courier New',monospace"><code style="font-family:inherit">"""
+HTML_PAGE_END = """</code></pre>
+</body>
+</html>
+"""
 
 WIDTH = 100
 if USE_RICH:
@@ -16,6 +49,23 @@ if USE_RICH:
 
 MAX_PRINT_LEN = None
 
+CODE_THEME = "monokai"
+# The most characters of highlighted code to keep in the cache
+RENDER_CACHE_SIZE = 1 << 25
+_render_cache: OrderedDict = OrderedDict()
+_render_cache_size = 0
+# For profiling how well the cache works
+render_cache_hits = 0
+render_cache_misses = 0
+
+# The open --file-output, if there is one
+_file_output = None
+_file_output_html = False
+
+# Where output goes in worker processes, and whether it's also recorded as HTML (True) or text (False)
+_captured: Optional[io.StringIO] = None
+_captured_html: Optional[bool] = None
+
 
 def set_max_print_len(length: Optional[int]) -> None:
     global MAX_PRINT_LEN 
@@ -23,31 +73,51 @@ def set_max_print_len(length: Optional[int]) -> None:
 
 
 
+def _style(text: str, codes: str) -> str:
+    return f"\033[{codes}m{text}\033[0m" if USE_ANSI else text
+
+
+def _center(text: str, width: int) -> str:
+    """Pads the text to be centered like rich does, with any odd space on the right."""
+    left = max(0, (width - len(text)) // 2)
+    return " " * left + text + " " * max(0, width - len(text) - left)
+
+
 def print_header_1(text: str) -> None:
     if USE_RICH:
         console.print(Markdown(f"# {text}"))
     else:
-        space = (WIDTH - len(text)) // 2
-        print("*" * WIDTH)
-        print(" " * space + text)
-        print("*" * WIDTH)
+        # The same box that rich draws
+        inner = max(WIDTH - 2, len(text))
+        sys.stdout.write(
+            f"┏{'━' * inner}┓\n"
+            f"┃{_center(text, inner).replace(text, _style(text, '1'), 1)}┃\n"
+            f"┗{'━' * inner}┛\n"
+        )
 
 
 def print_header_2(text: str) -> None:
     if USE_RICH:
         console.print(Markdown(f"## {text}"))
     else:
-        space = (WIDTH - len(text)) // 2
-        underline_start = "\033[4m"
-        underline_end = "\033[0m"
-        print("\n" + " " * space + underline_start + text + underline_end)
+        space = max(0, (WIDTH - len(text)) // 2)
+        sys.stdout.write("\n" + " " * space + _style(text, "1;4") + "\n")
 
 
 def print_header_3(text: str) -> None:
     if USE_RICH:
         console.print(Markdown(f"### {text}"))
     else:
-        print(f"\n**** {text} ****\n")
+        space = max(0, (WIDTH - len(text)) // 2)
+        sys.stdout.write(" " * space + _style(text, "1") + "\n")
+
+
+def print_plain(text: str) -> None:
+    """Prints the text as it is, without any markdown or highlighting."""
+    if USE_RICH:
+        console.print(text, markup=False, highlight=False, emoji=False, soft_wrap=True)
+    else:
+        sys.stdout.write(text + "\n")
 
 
 def print_text(text: str) -> None:
@@ -56,40 +126,205 @@ def print_text(text: str) -> None:
     if USE_RICH:
         console.print(Markdown(text))
     else:
-        print(text)
+        sys.stdout.write(text + "\n")
+
+
+def _render_code(code: str, lexer: str, print_line_numbers: bool) -> list:
+    """
+    Highlights the code into rich segments. Eval files repeat the same tests and prompts across thousands of problems,
+    so the segments are cached, keyed by everything that changes how they look, and the least recently used are
+    dropped once the cache holds more than RENDER_CACHE_SIZE characters.
+    """
+    global _render_cache_size, render_cache_hits, render_cache_misses
+    digest = hashlib.blake2b(code.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    key = (digest, lexer, console.width, print_line_numbers, CODE_THEME)
+    cached = _render_cache.get(key)
+    if cached is not None:
+        _render_cache.move_to_end(key)
+        render_cache_hits += 1
+        return cached[0]
+    render_cache_misses += 1
+    syntax = Syntax(code, lexer, theme=CODE_THEME, line_numbers=print_line_numbers, word_wrap=True)
+    segments = list(console.render(syntax))
+    size = sum(len(segment.text) for segment in segments)
+    if size <= RENDER_CACHE_SIZE:
+        _render_cache[key] = (segments, size)
+        _render_cache_size += size
+        while _render_cache_size > RENDER_CACHE_SIZE:
+            _, (_, evicted_size) = _render_cache.popitem(last=False)
+            _render_cache_size -= evicted_size
+    return segments
 
 
 def print_code(code: str, print_line_numbers: bool = False, lexer: str = "python") -> None:
     if MAX_PRINT_LEN is not None and len(code) > MAX_PRINT_LEN:
         code = code[:MAX_PRINT_LEN] + f"... ({len(code) - MAX_PRINT_LEN} characters truncated)"
     if USE_RICH:
-        console.print(Syntax(code, lexer, theme="monokai", line_numbers=print_line_numbers, word_wrap=True))
+        console.print(Segments(_render_code(code, lexer, print_line_numbers)))
+    elif print_line_numbers:
+        sys.stdout.write("".join(f"{i + 1:3}:\t{l}\n" for i, l in enumerate(code.split("\n"))))
     else:
-        for i, l in enumerate(code.split("\n")):
-            if print_line_numbers:
-                print(f"{i + 1:3}:\t{l}")
-            else:
-                print(l)
+        sys.stdout.write(code + "\n")
 
 
-def print_file_output(args):
+def print_table(columns: list[str], rows: list[list[str]], right_aligned: list[int] = ()) -> None:
+    """Prints rows of text in aligned columns, with the columns at the indexes in `right_aligned` aligned right."""
     if USE_RICH:
-        if args.file_output.lower().endswith(".html"):
-            console.save_html(args.file_output)
-        else:
-            console.save_text(args.file_output)
-    else:
+        table = Table(*columns, box=None, header_style="bold")
+        for i in right_aligned:
+            table.columns[i].justify = "right"
+        for row in rows:
+            table.add_row(*row, style=None)
+        console.print(table)
+        return
+    widths = [max([len(column)] + [len(row[i]) for row in rows]) for i, column in enumerate(columns)]
+
+    def format_row(row: list[str]) -> str:
+        cells = [cell.rjust(width) if i in right_aligned else cell.ljust(width) for i, (cell, width) in enumerate(zip(row, widths))]
+        return "  ".join(cells).rstrip()
+
+    sys.stdout.write(_style(format_row(columns), "1") + "\n")
+    sys.stdout.write("".join(format_row(row) + "\n" for row in rows))
+
+
+def start_file_output(args) -> None:
+    """
+    Opens --file-output. Everything printed is written to it as it goes, whenever `flush_file_output` is called, so
+    memory doesn't grow with the number of problems, and the file is usable even if the run is interrupted.
+    """
+    global _file_output, _file_output_html
+    if not USE_RICH:
         raise NotImplementedError(
-            "File output is only supported with the rich library. Use `> output.txt` instead."
+            "File output is only supported with the rich renderer. Use `> output.txt` instead."
         )
+    _file_output_html = args.file_output.lower().endswith(".html")
+    _file_output = open(args.file_output, "w", encoding="utf-8")
+    if _file_output_html:
+        _file_output.write(_html_page_part(0))
+
+
+def _html_page_part(part: int) -> str:
+    """The HTML page before (0) or after (1) the printed output."""
+    if part == 1:
+        return HTML_PAGE_END
+    theme = DEFAULT_TERMINAL_THEME
+    return HTML_PAGE_START.format(foreground=theme.foreground_color.hex, background=theme.background_color.hex)
+
+
+def _export_record(html: bool) -> str:
+    """Everything recorded since the last export, as an HTML fragment or text."""
+    if html:
+        return console.export_html(clear=True, code_format="{code}", inline_styles=True)
+    return console.export_text(clear=True)
+
+
+def flush_file_output() -> None:
+    """Writes everything printed since the last flush to --file-output, and forgets it."""
+    if _file_output is None:
+        return
+    _file_output.write(_export_record(_file_output_html))
+    _file_output.flush()
+
+
+def get_render_settings() -> dict:
+    """What another process needs to render output exactly like this one, with `capture_output`."""
+    return {
+        "use_rich": USE_RICH,
+        "use_ansi": USE_ANSI,
+        "width": console.width if USE_RICH else WIDTH,
+        "max_print_len": MAX_PRINT_LEN,
+        "file_output_html": _file_output_html if _file_output is not None else None,
+    }
+
+
+def capture_output(settings: dict) -> None:
+    """
+    Renders into a buffer instead of stdout, with the settings from `get_render_settings`, for rendering problems in
+    worker processes. Use `take_captured_output` to get what was printed.
+    """
+    global console, USE_RICH, USE_ANSI, WIDTH, MAX_PRINT_LEN, _captured, _captured_html
+    USE_RICH, USE_ANSI, WIDTH = settings["use_rich"], settings["use_ansi"], settings["width"]
+    MAX_PRINT_LEN = settings["max_print_len"]
+    _captured = io.StringIO()
+    _captured_html = settings["file_output_html"]
+    if USE_RICH:
+        console = Console(file=_captured, force_terminal=True, width=WIDTH, record=_captured_html is not None)
+    else:
+        sys.stdout = _captured
+
+
+def take_captured_output() -> tuple[str, Optional[str]]:
+    """What was printed since the last call, and what should go in --file-output for it, if there is one."""
+    text = _captured.getvalue()
+    _captured.seek(0)
+    _captured.truncate()
+    fragment = _export_record(_captured_html) if _captured_html is not None else None
+    return text, fragment
+
+
+def write_rendered(text: str, fragment: Optional[str]) -> None:
+    """Writes output that another process rendered with `capture_output`, after anything printed here so far."""
+    flush_file_output()
+    sys.stdout.write(text)
+    if fragment is not None and _file_output is not None:
+        _file_output.write(fragment)
+
+
+def print_file_output(args):
+    """Writes the rest of the output to --file-output, and closes it."""
+    global _file_output
+    if _file_output is None:
+        return
+    flush_file_output()
+    if _file_output_html:
+        _file_output.write(_html_page_part(1))
+    _file_output.close()
+    _file_output = None
+
+
+def _use_large_stdout_buffer() -> None:
+    """Swaps stdout for one with a large buffer, so that printing many small pieces only makes a few system calls."""
+    try:
+        fd = sys.stdout.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return
+    sys.stdout.flush()
+    sys.stdout = io.TextIOWrapper(
+        open(fd, "wb", buffering=STDOUT_BUFFER_SIZE, closefd=False),
+        encoding=sys.stdout.encoding,
+        errors=sys.stdout.errors,
+    )
+
+
+def choose_renderer(args) -> str:
+    """
+    Resolves --renderer. "auto" uses rich in a terminal, and the plain renderer when the output is piped or redirected,
+    unless --file-output needs rich to record it.
+    """
+    if args.renderer != "auto":
+        return args.renderer
+    if not RICH_INSTALLED:
+        return "plain"
+    if args.file_output or sys.stdout.isatty():
+        return "rich"
+    return "plain"
 
 
 def configure_console(args):
-    global WIDTH
+    global WIDTH, USE_RICH, USE_ANSI
+    USE_RICH = RICH_INSTALLED and choose_renderer(args) == "rich"
     if USE_RICH:
         global console
+        # Only keep what's printed when it's going to be written to a file, since the record grows with every problem
+        record = bool(args.file_output)
         if args.width and args.width != WIDTH:
-            console = Console(force_terminal=True, width=args.width, record=True)
+            console = Console(force_terminal=True, width=args.width, record=record)
         else:
-            console = Console(force_terminal=True, record=True)
+            console = Console(force_terminal=True, record=record)
+    else:
+        USE_ANSI = sys.stdout.isatty()
+        if not USE_ANSI:
+            _use_large_stdout_buffer()
     WIDTH = args.width
+    if args.file_output:
+        start_file_output(args)
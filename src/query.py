@@ -0,0 +1,336 @@
+"""
+A small query language for selecting problems by the values of their fields, for `--where`.
+
+Paths use the same slash syntax as `--parts`, like `doc/difficulty`. Some examples:
+
+    is_correct == false and doc/difficulty > 3
+    not (answer contains "yes") or doc_id in [1, 2, 3]
+    doc/question ~ "marbles?"
+
+Values are compared like JSON values rather than Python ones, so `true` and `false` are never equal to `1` and `0`.
+
+The expression is parsed once and compiled into nested closures, so evaluating it on each problem is just a few
+function calls. Strings and booleans that every match must contain are also collected, so that most lines can be
+rejected by a substring test on the raw JSON, before it is parsed.
+"""
+
+import ast
+import json
+import operator
+import re
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+
+from lazy_json import PartialDecoder
+
+Predicate = Callable[[Any], Any]
+
+TOKEN_RE = re.compile(
+    r"""\s*(?:
+    (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?(?![\w/]))
+    |(?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<op>==|!=|<=|>=|<|>|~|\(|\)|\[|\]|,)
+    |(?P<quoted_path>`[^`]*`)
+    |(?P<word>[\w][\w/.\-]*)
+    )""",
+    re.VERBOSE,
+)
+
+KEYWORDS = {"and", "or", "not", "contains", "in", "true", "false", "null"}
+CONSTANTS = {"true": True, "false": False, "null": None}
+ORDERINGS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+COMPARISONS = {"==", "!=", "~", "contains", "in"} | set(ORDERINGS)
+
+# Characters that are never escaped when JSON is written, so a string made of them appears verbatim in the raw line
+_VERBATIM_JSON_RE = re.compile(r'^[ !#-.0-\[\]-~]*$')
+
+
+def _tokenize(expression: str) -> list[tuple[str, Any]]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_RE.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Could not parse --where expression at: {expression[position:]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "number":
+            tokens.append(("literal", float(text) if any(c in text for c in ".eE") else int(text)))
+        elif kind == "string":
+            tokens.append(("literal", ast.literal_eval(text)))
+        elif kind == "quoted_path":
+            tokens.append(("path", text[1:-1]))
+        elif kind == "word" and text in CONSTANTS:
+            tokens.append(("literal", CONSTANTS[text]))
+        elif kind == "word" and text in KEYWORDS:
+            tokens.append(("op", text))
+        elif kind == "word":
+            tokens.append(("path", text))
+        else:
+            tokens.append(("op", text))
+    return tokens
+
+
+def _verbatim_json(value: Any) -> Optional[str]:
+    """How this literal must appear in the raw JSON, if it can only be written one way."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str) and _VERBATIM_JSON_RE.match(value):
+        return json.dumps(value)
+    return None
+
+
+def json_equal(a: Any, b: Any) -> bool:
+    """Whether two decoded JSON values are equal. Unlike in Python, true and false aren't equal to the numbers 1 and 0."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(json_equal(a[key], b[key]) for key in a)
+    return a == b
+
+
+def json_in_order(compare: Callable[[Any, Any], bool], a: Any, b: Any) -> bool:
+    """
+    Whether two decoded JSON values are in the order that `compare` checks for. Like in `json_equal`, true and false
+    only compare with each other, and lists compare by their first elements that aren't equal. Raises TypeError for
+    other values that can't be ordered.
+    """
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and compare(a, b)
+    if isinstance(a, list) and isinstance(b, list):
+        for x, y in zip(a, b):
+            if not json_equal(x, y):
+                return json_in_order(compare, x, y)
+        return compare(len(a), len(b))
+    return compare(a, b)
+
+
+def json_contains(container: Any, item: Any) -> bool:
+    """Whether a list has the item, a string has the substring, or an object has the key, comparing like `json_equal`."""
+    if isinstance(container, list):
+        return any(json_equal(item, element) for element in container)
+    if isinstance(container, (str, dict)):
+        return isinstance(item, str) and item in container
+    return False
+
+
+def compile_path(path: str) -> Predicate:
+    """
+    Compiles a slash path into a function that looks it up in a problem, returning None if it's missing. Numeric parts
+    of the path index into lists.
+    """
+    keys = path.split("/")
+
+    def get(problem: Any) -> Any:
+        value = problem
+        for key in keys:
+            if isinstance(value, dict):
+                if key not in value:
+                    return None
+                value = value[key]
+            elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+                value = value[int(key)]
+            else:
+                return None
+        return value
+
+    return get
+
+
+class _Operand:
+    def __init__(self, get: Predicate, path: Optional[str] = None, is_constant: bool = False, value: Any = None):
+        self.get = get
+        self.path = path
+        self.is_constant = is_constant
+        self.value = value
+
+
+class Query:
+    """A compiled `--where` expression."""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.paths: list[str] = []
+        self._tokens = _tokenize(expression)
+        self._position = 0
+        if not self._tokens:
+            raise ValueError("The --where expression is empty")
+        self.predicate, literals = self._parse_or()
+        if self._position != len(self._tokens):
+            raise ValueError(f"Unexpected {self._tokens[self._position][1]!r} in --where expression: {expression!r}")
+        # Check the longest strings first, since they're the least likely to appear by chance
+        self.required_literals = sorted(literals, key=len, reverse=True)
+        # Only the fields that the expression looks at need to be decoded
+        self.decoder = PartialDecoder(self.paths)
+
+    def __repr__(self) -> str:
+        return f"Query({self.expression!r})"
+
+    # Parsing, by recursive descent. Each method returns the compiled closure, plus the set of strings that the raw
+    # JSON must contain for it to be true.
+
+    def _peek(self) -> Optional[tuple[str, Any]]:
+        return self._tokens[self._position] if self._position < len(self._tokens) else None
+
+    def _accept(self, op: str) -> bool:
+        if self._peek() == ("op", op):
+            self._position += 1
+            return True
+        return False
+
+    def _expect(self, op: str) -> None:
+        if not self._accept(op):
+            raise ValueError(f"Expected {op!r} in --where expression: {self.expression!r}")
+
+    def _parse_or(self) -> tuple[Predicate, set[str]]:
+        predicate, literals = self._parse_and()
+        while self._accept("or"):
+            left, (right, right_literals) = predicate, self._parse_and()
+            predicate = lambda problem, left=left, right=right: left(problem) or right(problem)
+            # Only strings that both sides need are needed by the whole
+            literals = literals & right_literals
+        return predicate, literals
+
+    def _parse_and(self) -> tuple[Predicate, set[str]]:
+        predicate, literals = self._parse_not()
+        while self._accept("and"):
+            left, (right, right_literals) = predicate, self._parse_not()
+            predicate = lambda problem, left=left, right=right: left(problem) and right(problem)
+            literals = literals | right_literals
+        return predicate, literals
+
+    def _parse_not(self) -> tuple[Predicate, set[str]]:
+        if self._accept("not"):
+            inner, _ = self._parse_not()
+            return (lambda problem: not inner(problem)), set()
+        return self._parse_comparison()
+
+    def _parse_comparison(self) -> tuple[Predicate, set[str]]:
+        if self._accept("("):
+            predicate, literals = self._parse_or()
+            self._expect(")")
+            return predicate, literals
+        left = self._parse_operand()
+        token = self._peek()
+        if token is None or token[0] != "op" or token[1] not in COMPARISONS:
+            # A bare value is true if it's truthy
+            return left.get, self._key_literals(left)
+        self._position += 1
+        op = token[1]
+        right = self._parse_operand()
+        return self._compile_comparison(op, left, right), self._comparison_literals(op, left, right)
+
+    def _parse_operand(self) -> _Operand:
+        token = self._peek()
+        if token is None:
+            raise ValueError(f"Unexpected end of --where expression: {self.expression!r}")
+        kind, value = token
+        if kind == "path":
+            self._position += 1
+            self.paths.append(value)
+            return _Operand(compile_path(value), path=value)
+        if kind == "literal":
+            self._position += 1
+            return _Operand(lambda problem: value, is_constant=True, value=value)
+        if token == ("op", "["):
+            self._position += 1
+            values = []
+            while not self._accept("]"):
+                item = self._parse_operand()
+                if not item.is_constant:
+                    raise ValueError(f"Lists in --where expressions can only contain literals: {self.expression!r}")
+                values.append(item.value)
+                if not self._accept(","):
+                    self._expect("]")
+                    break
+            return _Operand(lambda problem: values, is_constant=True, value=values)
+        raise ValueError(f"Unexpected {value!r} in --where expression: {self.expression!r}")
+
+    @staticmethod
+    def _compile_comparison(op: str, left: _Operand, right: _Operand) -> Predicate:
+        get_left, get_right = left.get, right.get
+        if op == "~":
+            if not right.is_constant or not isinstance(right.value, str):
+                raise ValueError("The right side of ~ must be a regular expression string")
+            pattern = re.compile(right.value)
+
+            def matches(problem: Any) -> bool:
+                value = get_left(problem)
+                return isinstance(value, str) and pattern.search(value) is not None
+            return matches
+        if op == "in":
+            op, get_left, get_right = "contains", get_right, get_left
+        if op == "contains":
+            return lambda problem: json_contains(get_left(problem), get_right(problem))
+        # Compared like JSON values, so that which lines match doesn't depend on `required_literals`
+        if right.is_constant:
+            # The common case, comparing a field to a constant
+            value = right.value
+            if op == "==":
+                return lambda problem: json_equal(get_left(problem), value)
+            if op == "!=":
+                return lambda problem: not json_equal(get_left(problem), value)
+        elif op == "==":
+            return lambda problem: json_equal(get_left(problem), get_right(problem))
+        elif op == "!=":
+            return lambda problem: not json_equal(get_left(problem), get_right(problem))
+        compare = ORDERINGS[op]
+
+        def ordering(problem: Any) -> bool:
+            try:
+                return json_in_order(compare, get_left(problem), get_right(problem))
+            except TypeError:
+                # Missing values and mismatched types are never in order
+                return False
+        return ordering
+
+    @staticmethod
+    def _key_literals(operand: _Operand) -> set[str]:
+        """The keys along a path have to appear in the raw JSON for the path to have a value."""
+        if operand.path is None:
+            return set()
+        return {
+            literal for key in operand.path.split("/")
+            if not key.isdigit() and (literal := _verbatim_json(key)) is not None
+        }
+
+    def _comparison_literals(self, op: str, left: _Operand, right: _Operand) -> set[str]:
+        if op == "in":
+            op, left, right = "contains", right, left
+        if op == "==" and left.is_constant:
+            left, right = right, left
+        if op == "!=" or (op == "==" and right.is_constant and right.value is None):
+            # These can be true for missing values
+            return set()
+        literals = self._key_literals(left) if not left.is_constant else set()
+        if op == "==" and right.is_constant:
+            literal = _verbatim_json(right.value)
+            if literal is not None:
+                literals.add(literal)
+        elif op == "contains" and right.is_constant and isinstance(right.value, str):
+            literal = _verbatim_json(right.value)
+            if literal is not None:
+                # Without the quotes, since it may be part of a longer string
+                literals.add(literal[1:-1])
+        return literals
+
+    def matches_line(self, line: str) -> bool:
+        """Checks a raw JSON line, only parsing it if it contains all the strings that a match needs."""
+        for literal in self.required_literals:
+            if literal not in line:
+                return False
+        try:
+            problem = self.decoder.loads(line)
+        except json.JSONDecodeError:
+            return False
+        return bool(self.predicate(problem))
+
+    def filter_lines(self, lines: Iterable[tuple[int, str]]) -> Iterator[tuple[int, str]]:
+        return ((num, line) for num, line in lines if self.matches_line(line))
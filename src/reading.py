@@ -0,0 +1,344 @@
+"""
+Lazy line sources for JSONL files.
+
+Everything here yields `(original_index, line)` tuples, so that the selection steps (search, start, number) can be
+chained as generators and stop reading as soon as enough problems have been produced.
+"""
+
+import codecs
+import itertools
+import math
+import mmap
+import multiprocessing
+import os
+import random
+import re
+from typing import BinaryIO
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import TextIO
+from typing import TypeVar
+from typing import Union
+
+import numpy as np
+
+T = TypeVar("T")
+
+# Size of the blocks of a memory-mapped file that are scanned for newlines at once
+SCAN_CHUNK_SIZE = 1 << 24
+# Size of the byte ranges handed to each search worker
+SEARCH_CHUNK_SIZE = 1 << 25
+# Files smaller than this are searched in a single process unless --jobs says otherwise
+PARALLEL_MIN_SIZE = 1 << 26
+# The ASCII bytes that `str.strip` removes. A line with nothing else in it is blank, and isn't a problem.
+BLANK_BYTES = b"\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f "
+# The bytes that a blank line can start with: those, and the first bytes of the other Unicode spaces in UTF-8
+_BLANK_START_BYTES = frozenset(BLANK_BYTES + b"\xc2\xe1\xe2\xe3")
+_BLANK_START = np.zeros(256, dtype=bool)
+_BLANK_START[list(_BLANK_START_BYTES)] = True
+_NOT_BLANK_BYTE_RE = re.compile(b"[^" + re.escape(BLANK_BYTES) + b"]")
+
+
+def iter_lines(file: Union[TextIO, BinaryIO], first_index: int = 0) -> Iterator[tuple[int, str]]:
+    """
+    Yields `(line_number, line)` for every non-blank line in the file, without the trailing newline. Binary files are
+    decoded as UTF-8 one line at a time.
+
+    Blank lines are skipped, but they still count towards the line numbers, so that the printed indexes always match
+    the line in the file.
+    """
+    for index, line in enumerate(file, first_index):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r\n")
+        if line.strip():
+            yield index, line
+
+
+def is_blank(data, start: int, end: int, final: bool = True) -> bool:
+    """
+    Whether the bytes from `start` to `end` hold a blank line, which `str.strip` would leave empty. Unless `final`, the
+    line might carry on past `end`, so a character that's cut off there isn't counted.
+    """
+    if start < end and data[start] not in _BLANK_START_BYTES:
+        return False
+    match = _NOT_BLANK_BYTE_RE.search(data, start, end)
+    if match is None:
+        return True
+    if data[match.start()] < 0x80:
+        return False
+    # Unicode spaces, like non-breaking spaces, are only found by decoding
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    return not decoder.decode(bytes(data[start:end]), final).strip()
+
+
+class BlankLineFinder:
+    """
+    Finds the numbers of the blank lines in consecutive chunks of a file. Only the lines that start with a byte that a
+    blank line could start with are looked at, so this costs little more than finding the newlines.
+    """
+
+    def __init__(self):
+        self.blank_lines = []
+        # The line that the next chunk starts in, and what's been seen of it while it's blank, or None once it isn't
+        self.line = 0
+        self.pending = b""
+
+    def add(self, chunk, newlines: np.ndarray) -> None:
+        """Adds the next chunk, along with the positions of the newlines in it."""
+        size = len(chunk)
+        # The rest of the line that the last chunk ended in
+        first_end = int(newlines[0]) if len(newlines) else size
+        if self.pending is not None and first_end > 0:
+            ended = len(newlines) > 0
+            if not self.pending:
+                self.pending = bytes(chunk[:first_end]) if is_blank(chunk, 0, first_end, ended) else None
+            else:
+                line = self.pending + bytes(chunk[:first_end])
+                self.pending = line if is_blank(line, 0, len(line), ended) else None
+        if not len(newlines):
+            return
+        if self.pending is not None:
+            self.blank_lines.append(self.line)
+        # Then the lines that start in this chunk, the last of which might carry on into the next one
+        starts = newlines + 1
+        ends = np.append(newlines[1:], size)
+        might_be_blank = np.flatnonzero(_BLANK_START[np.frombuffer(chunk, dtype=np.uint8)[starts[starts < size]]])
+        last = len(newlines) - 1
+        self.pending = b"" if int(starts[-1]) == size else None
+        for i in might_be_blank.tolist():
+            if i < last:
+                if is_blank(chunk, int(starts[i]), int(ends[i])):
+                    self.blank_lines.append(self.line + 1 + i)
+            elif is_blank(chunk, int(starts[i]), size, final=False):
+                self.pending = bytes(chunk[int(starts[i]):])
+        self.line += len(newlines)
+
+    def finish(self) -> np.ndarray:
+        """The numbers of the blank lines, once every chunk has been added."""
+        # The last line doesn't always end with a newline
+        if self.pending and is_blank(self.pending, 0, len(self.pending)):
+            self.blank_lines.append(self.line)
+        self.pending = b""
+        return np.array(self.blank_lines, dtype=np.uint64)
+
+
+class MappedFile:
+    """
+    A local file that is memory-mapped instead of read, so that finding lines is a bulk byte scan over the page cache.
+    Lines are only decoded to `str` when they are yielded, and searching is done on the raw bytes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        # Empty files can't be memory-mapped
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+    def __enter__(self) -> "MappedFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.file.close()
+
+    def _line_end(self, offset: int) -> int:
+        end = self.buffer.find(b"\n", offset)
+        return self.size if end == -1 else end
+
+    def line_at(self, offset: int) -> str:
+        """Decodes the line starting at this byte offset."""
+        return self.buffer[offset:self._line_end(offset)].decode("utf-8").rstrip("\r")
+
+    def count_newlines(self, start: int = 0, end: Optional[int] = None) -> int:
+        end = self.size if end is None else end
+        count = 0
+        for chunk_start in range(start, end, SCAN_CHUNK_SIZE):
+            count += self.buffer[chunk_start:min(end, chunk_start + SCAN_CHUNK_SIZE)].count(b"\n")
+        return count
+
+    def count_lines(self) -> int:
+        """Counts the lines with a bulk byte scan, without decoding or splitting anything."""
+        count = self.count_newlines()
+        if self.size and self.buffer[-1:] != b"\n":
+            # The last line doesn't end with a newline
+            count += 1
+        return count
+
+    def complete_size(self) -> int:
+        """The size of the file up to the end of its last newline, leaving out a last line that might be unfinished."""
+        return self.buffer.rfind(b"\n") + 1 if self.size else 0
+
+    def line_offset(self, line_number: int) -> int:
+        """Finds the byte offset where a line starts, by counting newlines in large vectorized blocks."""
+        if line_number <= 0:
+            return 0
+        array = np.frombuffer(self.buffer, dtype=np.uint8)
+        seen = 0
+        for chunk_start in range(0, self.size, SCAN_CHUNK_SIZE):
+            newlines = np.flatnonzero(array[chunk_start:chunk_start + SCAN_CHUNK_SIZE] == ord("\n"))
+            if seen + len(newlines) >= line_number:
+                return chunk_start + int(newlines[line_number - seen - 1]) + 1
+            seen += len(newlines)
+        return self.size
+
+    def iter_line_starts(self, offset: int = 0, first_index: int = 0, end: Optional[int] = None) -> Iterator[tuple[int, int]]:
+        """Yields `(line_number, offset)` for every non-blank line before `end`, without decoding anything."""
+        index = first_index
+        end = self.size if end is None else end
+        while offset < end:
+            line_end = self._line_end(offset)
+            # Checking the first byte is enough for almost every line
+            if line_end > offset and (
+                self.buffer[offset] not in _BLANK_START_BYTES or not is_blank(self.buffer, offset, line_end)
+            ):
+                yield index, offset
+            index += 1
+            offset = line_end + 1
+
+    def iter_lines(self, offset: int = 0, first_index: int = 0, end: Optional[int] = None) -> Iterator[tuple[int, str]]:
+        """Like `iter_lines`, starting from a byte offset, and stopping at the line that `end` is in."""
+        for index, start in self.iter_line_starts(offset, first_index, end):
+            yield index, self.line_at(start)
+
+    def search(self, search: str, offset: int = 0, end: Optional[int] = None) -> Iterator[tuple[int, str]]:
+        """
+        Like `search_lines`, but jumps straight from one match to the next in the raw bytes, so only the matching
+        lines are ever decoded. `offset` and `end` limit the search to a range of whole lines, whose line numbers are
+        then counted from the start of the range.
+        """
+        end = self.size if end is None else end
+        needle = search.encode("utf-8")
+        if b"\n" in needle:
+            # Lines never contain a newline
+            return
+        index = 0
+        while True:
+            match = self.buffer.find(needle, offset, end)
+            if match == -1:
+                return
+            newline = self.buffer.rfind(b"\n", offset, match)
+            start = offset if newline == -1 else newline + 1
+            index += self.count_newlines(offset, start)
+            line = self.line_at(start)
+            if line.strip():
+                yield index, line
+            offset = self._line_end(match) + 1
+            index += 1
+
+    def split_ranges(self, num_ranges: int, start: int = 0, end: Optional[int] = None) -> list[tuple[int, int]]:
+        """
+        Splits the file, or the whole lines from `start` to `end`, into roughly equal byte ranges that each start at
+        the beginning of a line.
+        """
+        end = self.size if end is None else end
+        bounds = [start]
+        for i in range(1, num_ranges):
+            bound = self._line_end(max(bounds[-1], start + (end - start) * i // num_ranges)) + 1
+            if bound >= end:
+                break
+            bounds.append(bound)
+        bounds.append(end)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _search_range(task: tuple[str, str, int, int]) -> tuple[int, list[tuple[int, str]]]:
+    """Worker for `search_file`. Returns the number of lines in the range, and the matches within it."""
+    path, search, start, end = task
+    with MappedFile(path) as mapped:
+        return mapped.count_newlines(start, end), list(mapped.search(search, start, end))
+
+
+def resolve_jobs(jobs: Optional[int], size: int) -> int:
+    """The number of worker processes to use for a file. By default, small files aren't worth starting workers for."""
+    if jobs is None:
+        return (os.cpu_count() or 1) if size >= PARALLEL_MIN_SIZE else 1
+    return max(1, jobs)
+
+
+def search_file(mapped: MappedFile, search: str, jobs: Optional[int] = None, search_index=None) -> Iterator[tuple[int, str]]:
+    """
+    Searches a memory-mapped file, splitting it into newline-aligned byte ranges that are scanned by a pool of worker
+    processes. Matches are yielded in their original order, and the workers are stopped if we stop early.
+
+    If there's a `search_index.SearchIndex` for the file, only the blocks that it says could match are scanned.
+    """
+    if search_index is not None:
+        yield from search_index.search(mapped, search)
+        return
+    jobs = resolve_jobs(jobs, mapped.size)
+    if jobs <= 1:
+        yield from mapped.search(search)
+        return
+    num_ranges = max(jobs, math.ceil(mapped.size / SEARCH_CHUNK_SIZE))
+    ranges = mapped.split_ranges(num_ranges)
+    with multiprocessing.Pool(jobs) as pool:
+        first_index = 0
+        tasks = [(mapped.path, search, start, end) for start, end in ranges]
+        # `imap` hands back the results in order, as soon as each one is ready
+        for num_lines, matches in pool.imap(_search_range, tasks):
+            for index, line in matches:
+                yield first_index + index, line
+            first_index += num_lines
+
+
+def search_lines(lines: Iterable[tuple[int, str]], search: str) -> Iterator[tuple[int, str]]:
+    """Only keeps lines that contain the search string somewhere in the raw JSON."""
+    return ((num, line) for num, line in lines if search in line)
+
+
+def select_lines(lines: Iterable[tuple[int, str]], start: int = 0, number: Optional[int] = None) -> Iterator[tuple[int, str]]:
+    """Skips the first `start` lines and stops after `number` lines, without reading any further."""
+    stop = None if number is None else start + number
+    return itertools.islice(lines, start or 0, stop)
+
+
+def _random_open_interval(rng: random.Random) -> float:
+    """A random float in (0, 1), so that it's always safe to take the log of it."""
+    value = rng.random()
+    while value == 0.0:
+        value = rng.random()
+    return value
+
+
+def reservoir_sample(items: Iterable[T], k: int, rng: random.Random) -> list[T]:
+    """
+    Picks `k` items uniformly at random in a single pass, keeping only `k` items in memory. The sample is returned in
+    random order. If there are fewer than `k` items, all of them are returned.
+
+    This uses Algorithm L, which jumps over the items that won't be picked instead of drawing a random number for each.
+    Lists, ranges and arrays are jumped over by position, without looking at the items in between, and give the same
+    sample as the same items would one by one.
+    """
+    if isinstance(items, (Sequence, np.ndarray)):
+        reservoir = list(items[:k])
+        position = k
+    else:
+        iterator = iter(items)
+        reservoir = list(itertools.islice(iterator, k))
+    if len(reservoir) == k > 0:
+        w = math.exp(math.log(_random_open_interval(rng)) / k)
+        while True:
+            skip = math.floor(math.log(_random_open_interval(rng)) / math.log(1 - w))
+            if isinstance(items, (Sequence, np.ndarray)):
+                position += skip
+                if position >= len(items):
+                    break
+                item = items[position]
+                position += 1
+            else:
+                item = next(itertools.islice(iterator, skip, None), iterator)
+                if item is iterator:
+                    # Ran out of items
+                    break
+            reservoir[rng.randrange(k)] = item
+            w *= math.exp(math.log(_random_open_interval(rng)) / k)
+    rng.shuffle(reservoir)
+    return reservoir
@@ -0,0 +1,111 @@
+"""
+Union schema inference, for `--union`.
+
+`--structure` shows the shape of the first problem. This merges the shapes of every selected problem into one tree, so
+optional keys, keys with several types, and lists with different kinds of elements all show up, along with how often
+each one appears. Only the tree is kept, not the problems, and each dict keeps at most `MAX_KEYS` keys, so memory
+stays bounded even when dicts are used as maps with arbitrary keys. The keys past those are only counted, with a
+HyperLogLog sketch.
+"""
+
+from typing import Any
+from typing import Optional
+
+from sketches import HyperLogLog
+
+# Keys past this many in one dict (like IDs used as keys) are only counted
+MAX_KEYS = 1000
+
+LENGTH_UNITS = {"str": "characters", "list": "items", "dict": "items"}
+
+
+class SchemaNode:
+    """The union of every value seen at one path: their types, their lengths, and the union of their children."""
+
+    def __init__(self):
+        self.count = 0
+        self.types: dict[str, int] = {}
+        # Min and max lengths, by type
+        self.lengths: dict[str, list[int]] = {}
+        # For dicts, the children in the order they were first seen
+        self.keys: dict[str, SchemaNode] = {}
+        # The distinct keys that didn't fit in `keys`
+        self.other_keys: Optional[HyperLogLog] = None
+        # For lists, the union of all of their elements
+        self.items: Optional[SchemaNode] = None
+
+    def add(self, value: Any) -> bool:
+        """Adds a value to the union. Returns whether it changed the shape, with a new key or type anywhere inside."""
+        self.count += 1
+        name = type(value).__name__
+        changed = name not in self.types
+        self.types[name] = self.types.get(name, 0) + 1
+        if isinstance(value, (str, list, dict)):
+            length = len(value)
+            bounds = self.lengths.get(name)
+            if bounds is None:
+                self.lengths[name] = [length, length]
+            elif length < bounds[0]:
+                bounds[0] = length
+            elif length > bounds[1]:
+                bounds[1] = length
+        if isinstance(value, dict):
+            for key, child_value in value.items():
+                child = self.keys.get(key)
+                if child is None:
+                    if len(self.keys) >= MAX_KEYS:
+                        if self.other_keys is None:
+                            self.other_keys = HyperLogLog()
+                        self.other_keys.add(key)
+                        continue
+                    child = self.keys[key] = SchemaNode()
+                changed = child.add(child_value) or changed
+        elif isinstance(value, list):
+            if self.items is None:
+                self.items = SchemaNode()
+            for item in value:
+                changed = self.items.add(item) or changed
+        return changed
+
+    def describe(self) -> str:
+        """The types seen here, most common first, like `int 75% | float 25%`."""
+        parts = []
+        for name, count in sorted(self.types.items(), key=lambda item: -item[1]):
+            label = name
+            if name == "list" and self.items is not None and self.items.types:
+                element_types = sorted(self.items.types, key=lambda element_type: -self.items.types[element_type])
+                label = f"list[{' | '.join(element_types)}]"
+            if name in self.lengths:
+                low, high = self.lengths[name]
+                label += f" ({low} {LENGTH_UNITS[name]})" if low == high else f" ({low} to {high} {LENGTH_UNITS[name]})"
+            if len(self.types) > 1:
+                label += f" {count / self.count * 100:.0f}%"
+            parts.append(label)
+        return " | ".join(parts)
+
+
+def format_schema(node: SchemaNode, indent: int = 1, keys: list[str] = None, data_ranges: dict = None) -> str:
+    """Recursively formats a union schema, in the same style as `parsing.print_json_structure`."""
+    if keys is None:
+        keys = []
+    if not node.keys and "dict" not in node.types:
+        return "    " * (indent - 1) + node.describe()
+    num_dicts = node.types.get("dict", 0)
+    s = "    " * (indent - 1) + "{\n"
+    for key, child in node.keys.items():
+        line = f'"{key}": {child.describe()}'
+        if child.count < num_dicts:
+            line += f" (in {child.count / num_dicts * 100:.0f}%)"
+        if data_ranges is not None and "::".join(keys + [key]) in data_ranges:
+            line += f" ({data_ranges['::'.join(keys + [key])]})"
+        s += "    " * indent + line + "\n"
+        # Recursion!
+        if child.keys:
+            s += format_schema(child, indent + 1, keys=keys + [key], data_ranges=data_ranges) + "\n"
+        if child.items is not None and child.items.keys:
+            s += "    " * indent + "[\n"
+            s += format_schema(child.items, indent + 2, keys=keys + [key], data_ranges=data_ranges) + "\n"
+            s += "    " * indent + "]\n"
+    if node.other_keys is not None:
+        s += "    " * indent + f"... (about {node.other_keys.estimate()} more keys, past the first {MAX_KEYS})\n"
+    return s + "    " * (indent - 1) + "}"
@@ -0,0 +1,357 @@
+"""
+An optional persistent trigram index for `--search`, stored next to the file as `<file>.pptri`.
+
+The file is split into newline-aligned blocks of about a megabyte, and the index records which blocks contain each
+3-byte sequence. A search only has to scan the blocks that contain every trigram of the search string, instead of the
+whole file.
+
+Result files only ever grow, so the index is a list of segments that each cover the blocks of one stretch of the file.
+Rebuilding the index after the file grows only indexes the new bytes, and appends them to the index file as a new
+segment, without reading the old ones. Bytes appended after the last segment are scanned directly. Once there are too
+many segments, they're merged into one. Each segment is stamped with a checksum of the file up to its end (see
+`cache.stamp_prefix`), so the index is only used while the bytes it covers are unchanged.
+"""
+
+import os
+import struct
+import time
+from typing import Iterator
+from typing import Optional
+
+import numpy as np
+
+from cache import prefix_unchanged, stamp_prefix
+from reading import MappedFile
+
+SEARCH_INDEX_SUFFIX = ".pptri"
+SEARCH_INDEX_MAGIC = b"PPTRI\x00\x00\x02"
+# Start and end of the bytes it covers, line numbers at the start and end, number of blocks, trigrams and postings, and
+# the stamp of the file up to the end: the checksum, and the file's size and modification time
+SEGMENT_HEADER = struct.Struct("<QQQQQQQ16sQQ")
+BLOCK_SIZE = 1 << 20
+# Past this many segments, an update merges them all into one
+MAX_SEGMENTS = 16
+
+
+class Segment:
+    """The trigram posting lists for the blocks of one stretch of a file."""
+
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        first_line: int,
+        end_line: int,
+        block_starts: np.ndarray,
+        block_lines: np.ndarray,
+        keys: np.ndarray,
+        posting_starts: np.ndarray,
+        postings: np.ndarray,
+    ):
+        self.start = start
+        self.end = end
+        self.first_line = first_line
+        self.end_line = end_line
+        # Byte offset and first line number of each block, with an extra entry for the end
+        self.block_starts = block_starts
+        self.block_lines = block_lines
+        # Sorted trigram codes, and where each one's sorted block numbers (within the segment) start in `postings`
+        self.keys = keys
+        self.posting_starts = posting_starts
+        self.postings = postings
+
+    @property
+    def num_blocks(self) -> int:
+        return len(self.block_starts) - 1
+
+    def candidate_blocks(self, codes: np.ndarray) -> np.ndarray:
+        """The blocks that contain every one of the trigram codes."""
+        positions = np.searchsorted(self.keys, codes)
+        lists = []
+        for code, position in zip(codes, positions):
+            if position >= len(self.keys) or self.keys[position] != code:
+                return np.zeros(0, dtype=np.uint32)
+            lists.append(self.postings[self.posting_starts[position]:self.posting_starts[position + 1]])
+        # Intersect the shortest lists first, so the intermediate results stay small
+        lists.sort(key=len)
+        blocks = np.asarray(lists[0])
+        for postings in lists[1:]:
+            blocks = np.intersect1d(blocks, postings, assume_unique=True)
+            if len(blocks) == 0:
+                break
+        return blocks
+
+    def arrays(self) -> tuple[np.ndarray, ...]:
+        return self.block_starts, self.block_lines, self.keys, self.posting_starts, self.postings
+
+
+class SearchIndex:
+    """The segments that index the first `indexed_size` bytes of a file, in order."""
+
+    def __init__(self, segments: list[Segment], file_end: int = 0):
+        self.segments = segments
+        # Where the last complete segment ends in the index file, which is where the next one is written
+        self.file_end = file_end
+
+    @property
+    def indexed_size(self) -> int:
+        return self.segments[-1].end if self.segments else 0
+
+    @property
+    def indexed_lines(self) -> int:
+        return self.segments[-1].end_line if self.segments else 0
+
+    @property
+    def num_blocks(self) -> int:
+        return sum(segment.num_blocks for segment in self.segments)
+
+    def search(self, mapped: MappedFile, search: str) -> Iterator[tuple[int, str]]:
+        """Like `MappedFile.search`, but only scans the candidate blocks and whatever was appended after indexing."""
+        codes = np.unique(_trigram_codes(search.encode("utf-8")))
+        if len(codes) == 0:
+            # Too short to use the index
+            yield from mapped.search(search)
+            return
+        for segment in self.segments:
+            for block in segment.candidate_blocks(codes):
+                first_line = segment.first_line + int(segment.block_lines[block])
+                start, end = int(segment.block_starts[block]), int(segment.block_starts[block + 1])
+                for index, line in mapped.search(search, start, end):
+                    yield first_line + index, line
+        for index, line in mapped.search(search, self.indexed_size):
+            yield self.indexed_lines + index, line
+
+
+def search_index_path(path: str) -> str:
+    return path + SEARCH_INDEX_SUFFIX
+
+
+def _trigram_codes(data: bytes) -> np.ndarray:
+    """Every 3-byte sequence in the data, packed into a 24-bit integer."""
+    array = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    if len(array) < 3:
+        return np.zeros(0, dtype=np.uint32)
+    return (array[:-2] << 16) | (array[1:-1] << 8) | array[2:]
+
+
+def _index_segment(mapped: MappedFile, start: int, end: int, first_line: int) -> Segment:
+    """Splits `[start, end)` into blocks, and finds the blocks that each trigram is in."""
+    block_starts = []
+    block_lines = []
+    codes = []
+    blocks = []
+    line = 0
+    offset = start
+    while offset < end:
+        # Blocks end at a newline, so a match never spans two blocks
+        newline = mapped.buffer.find(b"\n", min(end - 1, offset + BLOCK_SIZE), end)
+        block_end = end if newline == -1 else newline + 1
+        block = mapped.buffer[offset:block_end]
+        block_codes = np.unique(_trigram_codes(block))
+        codes.append(block_codes)
+        blocks.append(np.full(len(block_codes), len(block_starts), dtype=np.uint32))
+        block_starts.append(offset)
+        block_lines.append(line)
+        line += block.count(b"\n")
+        offset = block_end
+    codes = np.concatenate(codes) if codes else np.zeros(0, dtype=np.uint32)
+    blocks = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.uint32)
+    # A stable sort keeps each trigram's blocks in order
+    order = np.argsort(codes, kind="stable")
+    codes, postings = codes[order], blocks[order]
+    keys, first_positions = np.unique(codes, return_index=True)
+    return Segment(
+        start,
+        end,
+        first_line,
+        first_line + line,
+        np.array(block_starts + [end], dtype=np.uint64),
+        np.array(block_lines + [line], dtype=np.uint64),
+        keys.astype(np.uint32),
+        np.append(first_positions, len(postings)).astype(np.uint64),
+        postings.astype(np.uint32),
+    )
+
+
+def _merge_segments(segments: list[Segment]) -> Segment:
+    """
+    Merges consecutive segments into one. Each trigram's posting list is the lists from each segment end to end, so
+    the already sorted lists are copied into place, without sorting the postings again.
+    """
+    keys = np.unique(np.concatenate([segment.keys for segment in segments]))
+    counts = np.zeros(len(keys), dtype=np.uint64)
+    key_positions = []
+    for segment in segments:
+        positions = np.searchsorted(keys, segment.keys)
+        key_positions.append(positions)
+        counts[positions] += np.diff(segment.posting_starts)
+    posting_starts = np.append(np.uint64(0), np.cumsum(counts)).astype(np.uint64)
+    postings = np.empty(int(posting_starts[-1]), dtype=np.uint32)
+    # Where each trigram's postings from the next segment go
+    filled = posting_starts[:-1].copy()
+    first_block = 0
+    block_starts, block_lines = [], []
+    first_line = segments[0].first_line
+    for segment, positions in zip(segments, key_positions):
+        lengths = np.diff(segment.posting_starts).astype(np.int64)
+        # The destination of every posting: where its trigram's list is filled up to, plus its place in the list
+        within = np.arange(len(segment.postings), dtype=np.int64) - np.repeat(segment.posting_starts[:-1].astype(np.int64), lengths)
+        destinations = np.repeat(filled[positions].astype(np.int64), lengths) + within
+        postings[destinations] = np.asarray(segment.postings) + np.uint32(first_block)
+        filled[positions] += lengths.astype(np.uint64)
+        block_starts.append(np.asarray(segment.block_starts[:-1]))
+        block_lines.append(np.asarray(segment.block_lines[:-1]) + np.uint64(segment.first_line - first_line))
+        first_block += segment.num_blocks
+    last = segments[-1]
+    block_starts.append(np.array([last.end], dtype=np.uint64))
+    block_lines.append(np.array([last.end_line - first_line], dtype=np.uint64))
+    return Segment(
+        segments[0].start,
+        last.end,
+        first_line,
+        last.end_line,
+        np.concatenate(block_starts),
+        np.concatenate(block_lines),
+        keys.astype(np.uint32),
+        posting_starts,
+        postings,
+    )
+
+
+def _write_segment_header(f, segment: Segment, stamp: dict) -> None:
+    f.write(SEGMENT_HEADER.pack(
+        segment.start,
+        segment.end,
+        segment.first_line,
+        segment.end_line,
+        segment.num_blocks,
+        len(segment.keys),
+        len(segment.postings),
+        bytes.fromhex(stamp["checksum"]),
+        stamp["size"],
+        stamp["mtime_ns"],
+    ))
+
+
+def _write_segment(f, segment: Segment, stamp: dict) -> None:
+    _write_segment_header(f, segment, stamp)
+    for array in segment.arrays():
+        f.write(np.ascontiguousarray(array).tobytes())
+
+
+def _read_segments(index_file: str) -> tuple[list[tuple[Segment, dict, int]], int]:
+    """
+    Every complete segment in the index file, with its stamp and where its header is, and where the last one ends.
+    """
+    try:
+        with open(index_file, "rb") as f:
+            if f.read(len(SEARCH_INDEX_MAGIC)) != SEARCH_INDEX_MAGIC:
+                return [], 0
+            file_size = os.fstat(f.fileno()).st_size
+            segments = []
+            offset = len(SEARCH_INDEX_MAGIC)
+            while offset + SEGMENT_HEADER.size <= file_size:
+                f.seek(offset)
+                start, end, first_line, end_line, num_blocks, num_keys, num_postings, checksum, size, mtime_ns = (
+                    SEGMENT_HEADER.unpack(f.read(SEGMENT_HEADER.size))
+                )
+                arrays = []
+                array_offset = offset + SEGMENT_HEADER.size
+                lengths = (num_blocks + 1, num_blocks + 1, num_keys, num_keys + 1, num_postings)
+                dtypes = (np.uint64, np.uint64, np.uint32, np.uint64, np.uint32)
+                if array_offset + sum(length * np.dtype(dtype).itemsize for dtype, length in zip(dtypes, lengths)) > file_size:
+                    # An update that didn't finish writing
+                    break
+                for dtype, length in zip(dtypes, lengths):
+                    if length == 0:
+                        arrays.append(np.zeros(0, dtype=dtype))
+                        continue
+                    arrays.append(np.memmap(index_file, dtype=dtype, mode="r", offset=array_offset, shape=(length,)))
+                    array_offset += length * np.dtype(dtype).itemsize
+                stamp = {"offset": end, "checksum": checksum.hex(), "size": size, "mtime_ns": mtime_ns}
+                segments.append((Segment(start, end, first_line, end_line, *arrays), stamp, offset))
+                offset = array_offset
+    except (OSError, struct.error, ValueError):
+        return [], 0
+    return segments, offset
+
+
+def build_search_index(path: str) -> Optional[SearchIndex]:
+    """
+    Builds or updates the trigram index for the file, and writes it next to the file. If the file has only been
+    appended to since the index was built, only the new bytes are indexed, and added to the index as a new segment.
+    Returns None if the file changed while it was being indexed.
+    """
+    start_time = time.time()
+    index_file = search_index_path(path)
+    with MappedFile(path) as mapped:
+        # Only index complete lines, since a partial last line may still be being written
+        indexed_size = mapped.complete_size()
+        old = load_search_index(path)
+        segments = old.segments if old is not None and old.indexed_size <= indexed_size else []
+        start = segments[-1].end if segments else 0
+        first_line = segments[-1].end_line if segments else 0
+        new_segment = _index_segment(mapped, start, indexed_size, first_line) if start < indexed_size or not segments else None
+        stamp = stamp_prefix(path, indexed_size)
+        if stamp is None:
+            # The file shrank or couldn't be read while it was being indexed, so leave the index as it was
+            print(f"{path} changed while it was being indexed, so its search index wasn't updated")
+            return None
+        num_new_blocks = new_segment.num_blocks if new_segment is not None else 0
+        if new_segment is None:
+            pass
+        elif segments and len(segments) < MAX_SEGMENTS:
+            # Only the new segment is written, after the ones that are already there
+            with open(index_file, "r+b") as f:
+                # Overwriting anything left over from an update that didn't finish
+                f.seek(old.file_end)
+                f.truncate()
+                _write_segment(f, new_segment, stamp)
+            segments = segments + [new_segment]
+        else:
+            if segments:
+                segments = [_merge_segments(segments + [new_segment])]
+            else:
+                segments = [new_segment]
+            tmp_path = index_file + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(SEARCH_INDEX_MAGIC)
+                _write_segment(f, segments[0], stamp)
+            # Let go of the memory-mapped old index before it's replaced
+            del old
+            os.replace(tmp_path, index_file)
+
+    index = load_search_index(path) if new_segment is not None else SearchIndex(segments)
+    index_size = os.path.getsize(index_file)
+    num_trigrams = max((len(segment.keys) for segment in index.segments), default=0)
+    print(
+        f"Built search index {index_file}: {index.num_blocks} blocks ({num_new_blocks} new) in {len(index.segments)} "
+        f"segments, up to {num_trigrams} trigrams each, {index_size / 1e6:.1f} MB, in {time.time() - start_time:.2f} seconds"
+    )
+    return index
+
+
+def load_search_index(path: str) -> Optional[SearchIndex]:
+    """
+    Loads the trigram index for the file, or returns None if there isn't one. The index is still valid if the file has
+    been appended to, as long as the bytes it covers haven't changed.
+    """
+    index_file = search_index_path(path)
+    segments, file_end = _read_segments(index_file)
+    if not segments:
+        return None
+    _, stamp, header_offset = segments[-1]
+    signature = os.stat(path)
+    if not prefix_unchanged(path, stamp):
+        return None
+    if (signature.st_size, signature.st_mtime_ns) != (stamp["size"], stamp["mtime_ns"]):
+        # The file was appended to, and the indexed bytes were checked. Remember that, so they aren't checked again.
+        stamp = dict(stamp, size=signature.st_size, mtime_ns=signature.st_mtime_ns)
+        segment = segments[-1][0]
+        try:
+            with open(index_file, "r+b") as f:
+                f.seek(header_offset)
+                _write_segment_header(f, segment, stamp)
+        except OSError:
+            pass
+    return SearchIndex([segment for segment, _, _ in segments], file_end)
@@ -0,0 +1,161 @@
+"""
+Reading several JSONL files as one dataset, like the shards of a sweep.
+
+The inputs can be any mix of files, globs (like `sweep/**/*.jsonl.gz`, quoted so the shell doesn't expand them) and
+directories, whose JSONL files are all read, locally or in S3. Problems are labelled with the file and line they came
+from, like `sweep/run_3.jsonl:17`, and keep the order of the files.
+
+Searching (--search and --where) and summarizing (--stats, --graph and --ranges) go through a pool of worker
+processes, one shard at a time, and the results are merged in order. Printing every problem just reads the shards one
+after another, since there's nothing to gain from reading ahead of the printing.
+"""
+
+import glob
+import itertools
+import multiprocessing
+import os
+from contextlib import contextmanager
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+from typing import TypeVar
+
+import json_backend
+from catalog import directory_files
+from compressed import CompressedFile, compression_of, compression_of_data
+from object_store import S3Object, is_s3_url, list_s3_objects
+from query import Query
+from reading import MappedFile, resolve_jobs, search_lines
+
+T = TypeVar("T")
+
+GLOB_CHARACTERS = "*?["
+
+
+def is_glob(path: str) -> bool:
+    return any(character in path for character in GLOB_CHARACTERS)
+
+
+def is_dataset(inputs: list[str], dataset: bool) -> bool:
+    """Whether the inputs should be read as a dataset of shards, rather than as a single file."""
+    if len(inputs) != 1 or dataset:
+        return True
+    path = inputs[0]
+    if is_s3_url(path):
+        return is_glob(path) or path.endswith("/")
+    return is_glob(path) and not os.path.exists(path)
+
+
+def expand_inputs(
+    inputs: list[str], s3_endpoint_url: Optional[str] = None, refresh_catalog: bool = False
+) -> list[str]:
+    """
+    The files that the inputs name, in order, with globs and directories expanded, and without duplicates. Local
+    directories are listed from their catalogs, checking every file again if `refresh_catalog`.
+    """
+    shards = []
+    for path in inputs:
+        if is_s3_url(path):
+            if is_glob(path) or path.endswith("/"):
+                shards.extend(list_s3_objects(path, s3_endpoint_url))
+            else:
+                shards.append(path)
+        elif os.path.isdir(path):
+            shards.extend(directory_files(path, refresh_catalog))
+        elif is_glob(path) and not os.path.exists(path):
+            for match in sorted(glob.glob(path, recursive=True)):
+                shards.extend(directory_files(match, refresh_catalog) if os.path.isdir(match) else [match])
+        else:
+            shards.append(path)
+    return list(dict.fromkeys(shards))
+
+
+def shard_size(path: str) -> int:
+    """The size of a local shard, or 0 if it's not a local file."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def shard_jobs(args, shards: list[str]) -> int:
+    """How many processes to read the shards with. By default, a small dataset isn't worth starting workers for."""
+    return min(len(shards), resolve_jobs(args.jobs, sum(shard_size(path) for path in shards)))
+
+
+@contextmanager
+def open_shard(path: str, s3_endpoint_url: Optional[str] = None):
+    """Opens a shard as a MappedFile, CompressedFile or S3Object, depending on where it is and how it's compressed."""
+    if is_s3_url(path):
+        with S3Object(path, s3_endpoint_url) as remote:
+            kind = compression_of_data(remote.read_range(0, 4))
+            yield CompressedFile(path, kind, remote) if kind is not None else remote
+    elif compression_of(path):
+        with CompressedFile(path) as compressed:
+            yield compressed
+    else:
+        with MappedFile(path) as mapped:
+            yield mapped
+
+
+def filter_shard_lines(source, search: Optional[str], query: Optional[Query]) -> Iterator[tuple[int, str]]:
+    """The lines of an open shard that match --search and --where, jumping between matches in local files."""
+    literal = search or (query.required_literals[0] if query is not None and query.required_literals else None)
+    if literal is not None and isinstance(source, MappedFile):
+        lines = source.search(literal)
+    else:
+        lines = source.iter_lines()
+        if literal is not None:
+            lines = search_lines(lines, literal)
+    if query is not None:
+        lines = query.filter_lines(lines)
+    return lines
+
+
+def _select_in_shard(
+    task: tuple[str, Optional[str], Optional[str], str, Optional[str], Optional[int]]
+) -> list[tuple[int, str]]:
+    """Worker for `iter_shard_lines`. Returns the matching lines of one shard, stopping after `limit` of them."""
+    path, search, where, backend, s3_endpoint_url, limit = task
+    json_backend.set_backend(backend)
+    with open_shard(path, s3_endpoint_url) as source:
+        return list(itertools.islice(filter_shard_lines(source, search, Query(where) if where else None), limit))
+
+
+def map_shards(function: Callable[[tuple], T], tasks: list[tuple], jobs: int) -> Iterator[T]:
+    """Calls the worker function on each task, in a pool of processes if there's more than one job, in order."""
+    if jobs <= 1:
+        yield from map(function, tasks)
+        return
+    with multiprocessing.Pool(jobs) as pool:
+        # `imap` hands back the results in order, as soon as each one is ready
+        yield from pool.imap(function, tasks)
+
+
+def iter_shard_lines(args, shards: list[str]) -> Iterator[tuple[str, str]]:
+    """
+    Yields `("file:line", line)` for the lines of every shard that are selected by --search and --where. Filtering is
+    done by a pool of worker processes that each take a shard at a time.
+    """
+    if args.search or args.query:
+        jobs = shard_jobs(args, shards)
+        if jobs > 1:
+            # Without --randomize, no shard can give more than the lines that --start and --number print, and once
+            # that many have been yielded, the workers are stopped
+            limit = None if args.randomize or args.number is None else (args.start or 0) + args.number
+            backend = json_backend.get_backend()
+            tasks = [(path, args.search, args.where, backend, args.s3_endpoint_url, limit) for path in shards]
+            remaining = limit
+            for path, matches in zip(shards, map_shards(_select_in_shard, tasks, jobs)):
+                for index, line in matches[:remaining]:
+                    yield f"{path}:{index}", line
+                if remaining is not None:
+                    remaining -= min(remaining, len(matches))
+                    if remaining == 0:
+                        return
+            return
+    for path in shards:
+        with open_shard(path, args.s3_endpoint_url) as source:
+            for index, line in filter_shard_lines(source, args.search, args.query):
+                yield f"{path}:{index}", line
+
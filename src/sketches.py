@@ -0,0 +1,97 @@
+"""
+Small streaming summaries that use a fixed amount of memory however many values they see, for `--ranges`.
+
+Both can be merged, so summaries of different parts of a file can be combined into a summary of the whole file.
+"""
+
+import hashlib
+import math
+from typing import Any
+
+
+class ExactSum:
+    """
+    A float sum without rounding error, kept as a few non-overlapping partial sums (Shewchuk's algorithm, as used by
+    `math.fsum`). The result doesn't depend on the order that values were added or merged in.
+    """
+
+    def __init__(self):
+        self.partials: list[float] = []
+
+    def add(self, x: float) -> None:
+        partials = self.partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            high = x + y
+            low = y - (high - x)
+            if low:
+                partials[i] = low
+                i += 1
+            x = high
+        partials[i:] = [x]
+
+    def merge(self, other: "ExactSum") -> None:
+        for x in other.partials:
+            self.add(x)
+
+    def value(self) -> float:
+        try:
+            return math.fsum(self.partials)
+        except (ValueError, OverflowError):
+            # Infinities of both signs, or an overflow
+            return sum(self.partials)
+
+
+def _canonical(value: Any) -> bytes:
+    """Bytes that are the same for values that are equal in Python, like 1, 1.0 and True."""
+    if isinstance(value, str):
+        return b"s" + value.encode("utf-8", "surrogatepass")
+    if isinstance(value, (bool, int)) or (isinstance(value, float) and value.is_integer()):
+        return b"n%d" % int(value)
+    return repr(value).encode("utf-8")
+
+
+def stable_hash(value: Any) -> int:
+    """
+    A 64-bit hash of a value that's the same in every process, unlike `hash`, and that's equal for equal values. Sets
+    of these stand in for sets of the values, which may be long strings, with a negligible chance of a collision.
+    """
+    return int.from_bytes(hashlib.blake2b(_canonical(value), digest_size=8).digest(), "little")
+
+
+class HyperLogLog:
+    """
+    An estimate of how many distinct values have been added, with a standard error of about 1.6%. Values are hashed
+    with `stable_hash`, so sketches built in different processes can be merged.
+    """
+
+    PRECISION = 12
+
+    def __init__(self):
+        self.registers = bytearray(1 << self.PRECISION)
+
+    def add(self, value: Any) -> None:
+        self.add_hash(stable_hash(value))
+
+    def add_hash(self, h: int) -> None:
+        """Adds a value by its `stable_hash`."""
+        bits = 64 - self.PRECISION
+        register = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small counts
+            return round(m * math.log(m / zeros))
+        return round(raw)
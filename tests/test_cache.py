@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+
+from cache import prefix_checksum, prefix_unchanged, stamp_prefix
+from graphing import extract_columns, load_file_columns
+from parsing import get_cached_file_data_ranges, get_data_ranges
+from reading import MappedFile
+
+
+def write_problems(path, problems, mode="w"):
+    with open(path, mode) as f:
+        for problem in problems:
+            f.write(json.dumps(problem) + "\n")
+
+
+def problems(start, stop):
+    return [{"i": i, "score": i / 7, "group": f"g{i % 3}", "tags": ["a"] * (i % 4)} for i in range(start, stop)]
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_prefix_checksum_hashes_the_whole_prefix(tmp_path):
+    path = tmp_path / "data.jsonl"
+    path.write_bytes(bytes(range(256)) * 1000)
+    assert prefix_checksum(str(path), 1000) == hashlib.blake2b(path.read_bytes()[:1000], digest_size=16).hexdigest()
+    # Carrying on from the last checksum gives the same answer as starting over
+    assert prefix_checksum(str(path), 5000) == hashlib.blake2b(path.read_bytes()[:5000], digest_size=16).hexdigest()
+    assert prefix_checksum(str(path), 10 ** 9) is None
+
+
+def test_prefix_unchanged(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 50))
+    stamp = stamp_prefix(str(path), os.path.getsize(path))
+    assert prefix_unchanged(str(path), stamp)
+    write_problems(path, problems(50, 60), mode="a")
+    assert prefix_unchanged(str(path), stamp)
+    # An edit in the middle that keeps the size the same
+    data = bytearray(path.read_bytes())
+    data[len(data) // 3] ^= 1
+    path.write_bytes(bytes(data))
+    bump_mtime(path)
+    assert not prefix_unchanged(str(path), stamp)
+
+
+def assert_same_columns(columns, expected):
+    assert columns.keys() == expected.keys()
+    for name in columns:
+        values = [columns[name].categories[code] if code >= 0 else None for code in columns[name].codes]
+        expected_values = [expected[name].categories[code] if code >= 0 else None for code in expected[name].codes]
+        assert values == expected_values
+
+
+def test_columns_resume_after_append(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 100))
+    columns, num_results, num_cached, _, _ = load_file_columns(str(path), ["group", "score"])
+    assert (num_results, num_cached) == (100, 0)
+    write_problems(path, problems(100, 150), mode="a")
+    # A last line that's still being written is read, but not cached
+    with open(path, "a") as f:
+        f.write('{"i": 150, "group": "g0"}')
+    columns, num_results, num_cached, _, _ = load_file_columns(str(path), ["group", "score", "i"])
+    assert (num_results, num_cached) == (151, 0)
+    columns, num_results, num_cached, _, _ = load_file_columns(str(path), ["group", "score", "i"])
+    assert (num_results, num_cached) == (151, 150)
+    with MappedFile(str(path)) as mapped:
+        expected, _, _, _ = extract_columns(mapped.iter_lines(), ["group", "score", "i"])
+    assert_same_columns(columns, expected)
+
+
+def test_columns_recomputed_after_rewrite(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 100))
+    load_file_columns(str(path), ["group"])
+    rewritten = problems(0, 100)
+    rewritten[10]["group"] = "g9"
+    write_problems(path, rewritten)
+    bump_mtime(path)
+    columns, num_results, num_cached, _, _ = load_file_columns(str(path), ["group"])
+    assert (num_results, num_cached) == (100, 0)
+    assert "g9" in columns["group"].categories
+
+
+def ranges_strings(data_ranges):
+    return {key: str(data_range) for key, data_range in data_ranges.items()}
+
+
+def test_data_ranges_resume_after_append(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 100))
+    with MappedFile(str(path)) as mapped:
+        _, num_problems, num_cached = get_cached_file_data_ranges(mapped, 1)
+    assert (num_problems, num_cached) == (100, 0)
+    write_problems(path, problems(100, 200), mode="a")
+    with MappedFile(str(path)) as mapped:
+        data_ranges, num_problems, num_cached = get_cached_file_data_ranges(mapped, 2)
+    assert (num_problems, num_cached) == (200, 100)
+    assert ranges_strings(data_ranges) == ranges_strings(get_data_ranges(problems(0, 200)))
+
+
+def test_data_ranges_recomputed_after_rewrite(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 100))
+    with MappedFile(str(path)) as mapped:
+        get_cached_file_data_ranges(mapped, 1)
+    rewritten = problems(0, 100)
+    rewritten[0]["score"] = -1.0
+    write_problems(path, rewritten)
+    bump_mtime(path)
+    with MappedFile(str(path)) as mapped:
+        data_ranges, num_problems, num_cached = get_cached_file_data_ranges(mapped, 1)
+    assert (num_problems, num_cached) == (100, 0)
+    assert ranges_strings(data_ranges) == ranges_strings(get_data_ranges(rewritten))
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+import catalog
+from catalog import directory_files, load_catalog, most_recent_file
+
+
+@pytest.fixture(autouse=True)
+def trust_new_directories(monkeypatch):
+    # Directories are made and changed in the same instant in these tests
+    monkeypatch.setattr(catalog, "RECENT_CHANGE_NS", 0)
+    monkeypatch.setattr(catalog, "NEWEST_FILES", 2)
+
+
+def write(path, text, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(text)
+    os.utime(path, (mtime, mtime))
+
+
+def make_tree(root):
+    for i, relative in enumerate(["a/1.jsonl", "a/2.jsonl", "b/c/3.jsonl", "b/4.jsonl", "5.jsonl"]):
+        write(os.path.join(root, relative), '{"x": 1}\n', 1_000_000 + i)
+    write(os.path.join(root, "a", "notes.txt"), "not jsonl", 2_000_000)
+
+
+def test_files_in_walk_order(tmp_path):
+    make_tree(tmp_path)
+    expected = ["5.jsonl", "a/1.jsonl", "a/2.jsonl", "b/4.jsonl", "b/c/3.jsonl"]
+    assert directory_files(str(tmp_path)) == [os.path.join(tmp_path, path) for path in expected]
+    assert most_recent_file(str(tmp_path)) == os.path.join(tmp_path, "5.jsonl")
+
+
+def test_new_and_deleted_files(tmp_path):
+    make_tree(tmp_path)
+    load_catalog(str(tmp_path))
+    write(os.path.join(tmp_path, "b", "c", "6.jsonl"), "{}\n", 3_000_000)
+    os.remove(os.path.join(tmp_path, "a", "1.jsonl"))
+    assert most_recent_file(str(tmp_path)) == os.path.join(tmp_path, "b", "c", "6.jsonl")
+    assert os.path.join(tmp_path, "a", "1.jsonl") not in directory_files(str(tmp_path))
+
+
+def test_appending_to_a_newest_file_is_noticed(tmp_path):
+    make_tree(tmp_path)
+    load_catalog(str(tmp_path))
+    write(os.path.join(tmp_path, "b", "4.jsonl"), '{"x": 2}\n', 3_000_000)
+    assert most_recent_file(str(tmp_path)) == os.path.join(tmp_path, "b", "4.jsonl")
+    files = dict(load_catalog(str(tmp_path)).files())
+    assert files[os.path.join("b", "4.jsonl")]["size"] == 18
+
+
+def test_appending_to_an_older_file_needs_a_refresh(tmp_path):
+    make_tree(tmp_path)
+    load_catalog(str(tmp_path))
+    write(os.path.join(tmp_path, "a", "1.jsonl"), '{"x": 2}\n', 3_000_000)
+    # Nothing in a/ was added, removed or renamed, and 1.jsonl wasn't one of the newest files
+    assert most_recent_file(str(tmp_path)) == os.path.join(tmp_path, "5.jsonl")
+    assert most_recent_file(str(tmp_path), refresh=True) == os.path.join(tmp_path, "a", "1.jsonl")
+    assert most_recent_file(str(tmp_path)) == os.path.join(tmp_path, "a", "1.jsonl")
+
+
+def test_inspect(tmp_path):
+    make_tree(tmp_path)
+    first = load_catalog(str(tmp_path))
+    first.inspect()
+    first.save()
+    files = dict(load_catalog(str(tmp_path)).files())
+    assert files["5.jsonl"]["lines"] == 1
+    assert len({entry["fingerprint"] for entry in files.values()}) == 1
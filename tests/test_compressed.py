@@ -0,0 +1,109 @@
+import argparse
+import gzip
+import json
+import os
+
+import pytest
+
+from cli import select_problems
+from compressed import CompressedFile, build_checkpoint_index, load_checkpoint_index
+
+
+def compress(kind, data):
+    if kind == "gzip":
+        return gzip.compress(data)
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def write_pieces(path, kind, lines, piece_size):
+    """Compresses the lines in pieces of about `piece_size` bytes, some of which start in the middle of a line."""
+    data = "".join(line + "\n" for line in lines).encode()
+    with open(path, "wb") as f:
+        for start in range(0, len(data), piece_size):
+            f.write(compress(kind, data[start:start + piece_size]))
+
+
+@pytest.fixture(params=["gzip", "zstd"])
+def compressed_file(request, tmp_path):
+    suffix = ".gz" if request.param == "gzip" else ".zst"
+    path = str(tmp_path / f"data.jsonl{suffix}")
+    lines = [json.dumps({"doc_id": i, "text": "x" * (i % 37)}) for i in range(2000)]
+    write_pieces(path, request.param, lines, 5000)
+    return path, lines
+
+
+def test_checkpoints_are_at_pieces(compressed_file):
+    path, lines = compressed_file
+    with CompressedFile(path) as f:
+        index = build_checkpoint_index(f)
+        assert len(index) == f.count_lines() == len(lines)
+    # One checkpoint per piece
+    assert len(index.checkpoints) > 10
+    loaded = load_checkpoint_index(path)
+    assert loaded is not None and len(loaded) == len(lines)
+    assert (loaded.checkpoints == index.checkpoints).all()
+
+
+@pytest.mark.parametrize("start", [0, 1, 137, 999, 1500, 1999, 2000])
+def test_iter_lines_from_a_checkpoint(compressed_file, start):
+    path, lines = compressed_file
+    with CompressedFile(path) as f:
+        index = build_checkpoint_index(f)
+        assert list(f.iter_lines(start, index)) == list(f.iter_lines(start))
+        assert [line for _, line in f.iter_lines(start, index)] == lines[start:]
+
+
+def test_lines_at(compressed_file):
+    path, lines = compressed_file
+    targets = [0, 3, 4, 250, 251, 1200, 1999, 5000]
+    with CompressedFile(path) as f:
+        index = build_checkpoint_index(f)
+        assert list(f.lines_at(targets, index)) == [(i, lines[i]) for i in targets if i < len(lines)]
+
+
+def test_index_is_out_of_date_after_a_change(compressed_file):
+    path, lines = compressed_file
+    with CompressedFile(path) as f:
+        build_checkpoint_index(f)
+    kind = "gzip" if path.endswith(".gz") else "zstd"
+    with open(path, "ab") as f:
+        f.write(compress(kind, b'{"doc_id": "new"}\n'))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load_checkpoint_index(path) is None
+
+
+def test_single_piece_reads_from_the_start(tmp_path):
+    path = str(tmp_path / "data.jsonl.gz")
+    lines = [json.dumps({"doc_id": i}) for i in range(100)]
+    write_pieces(path, "gzip", lines, 1 << 20)
+    with CompressedFile(path) as f:
+        index = build_checkpoint_index(f)
+        assert len(index.checkpoints) == 1
+        assert [line for _, line in f.iter_lines(50, index)] == lines[50:]
+
+
+def test_index_knows_which_lines_are_blank(tmp_path):
+    path = str(tmp_path / "data.jsonl.gz")
+    data = b'{"i": 0}\n   \n\r\n\n{"i": 4}\r\n \t\n{"i": 6}\n\xc2\xa0\n  '
+    with open(path, "wb") as f:
+        # Split inside the non-breaking space, so a piece starts in the middle of a blank line
+        f.write(gzip.compress(data[:3]) + gzip.compress(data[3:-4]) + gzip.compress(data[-4:]))
+    with CompressedFile(path) as f:
+        assert build_checkpoint_index(f).nonblank_lines().tolist() == [0, 4, 6]
+    assert load_checkpoint_index(path).nonblank_lines().tolist() == [0, 4, 6]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_sample_with_an_index_only_picks_problems(tmp_path, seed):
+    path = str(tmp_path / "data.jsonl.gz")
+    lines = [json.dumps({"doc_id": i}) if i % 3 else " " for i in range(300)]
+    write_pieces(path, "gzip", lines, 500)
+    args = argparse.Namespace(seed=seed, start=0, number=20, randomize=True, search=None, query=None, jobs=None)
+    with CompressedFile(path) as f:
+        without_index = list(select_problems(args, f))
+        index = build_checkpoint_index(f)
+        with_index = list(select_problems(args, f, index))
+    assert len(with_index) == 20
+    assert with_index == without_index
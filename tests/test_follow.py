@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+from follow import FollowedFile
+
+
+def problem(i):
+    return json.dumps({"doc_id": i}) + "\n"
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text(problem(0) + problem(1))
+    return path
+
+
+def test_new_lines_are_read_as_they_are_appended(path):
+    with FollowedFile(str(path)) as followed:
+        assert list(followed.iter_new_lines()) == [(0, problem(0).strip()), (1, problem(1).strip())]
+        assert list(followed.iter_new_lines()) == []
+        with open(path, "a") as f:
+            f.write("\n" + problem(3))
+        assert list(followed.iter_new_lines()) == [(3, problem(3).strip())]
+
+
+def test_a_partial_last_line_is_held_back(path):
+    with FollowedFile(str(path)) as followed:
+        list(followed.iter_new_lines())
+        with open(path, "a") as f:
+            f.write(problem(2)[:5])
+        assert list(followed.iter_new_lines()) == []
+        assert followed.index == 2
+        with open(path, "a") as f:
+            f.write(problem(2)[5:] + problem(3)[:3])
+        assert list(followed.iter_new_lines()) == [(2, problem(2).strip())]
+        with open(path, "a") as f:
+            f.write(problem(3)[3:])
+        assert list(followed.iter_new_lines()) == [(3, problem(3).strip())]
+
+
+def test_truncation_restarts_from_the_start(path, capsys):
+    with FollowedFile(str(path)) as followed:
+        list(followed.iter_new_lines())
+        path.write_text(problem(10))
+        assert list(followed.iter_new_lines()) == [(0, problem(10).strip())]
+    assert "truncated, so reading it again" in capsys.readouterr().out
+
+
+def test_replacement_restarts_from_the_start(path, tmp_path, capsys):
+    with FollowedFile(str(path)) as followed:
+        list(followed.iter_new_lines())
+        # Longer than before, so only the new inode shows that it's a different file
+        new_path = tmp_path / "new.jsonl"
+        new_path.write_text(problem(10) + problem(11) + problem(12))
+        os.replace(new_path, path)
+        assert [i for i, _ in followed.iter_new_lines()] == [0, 1, 2]
+    assert "replaced, so reading it again" in capsys.readouterr().out
+
+
+def test_invalid_utf8_is_replaced(path):
+    with FollowedFile(str(path)) as followed:
+        list(followed.iter_new_lines())
+        with open(path, "ab") as f:
+            f.write(b'{"text": "caf\xc3"}\n' + problem(3).encode())
+        assert list(followed.iter_new_lines()) == [(2, '{"text": "caf�"}'), (3, problem(3).strip())]
@@ -0,0 +1,77 @@
+import argparse
+import json
+import random
+
+import numpy as np
+import pytest
+
+import graphing
+from columns import RunningGroupStats, group_stats, one_way_anova
+
+
+def stats_args(**overrides):
+    args = dict(parts=["model", "size"], y_value="score", stats=True, full_combinatoric=False, min_n=1, file="x.jsonl",
+                display_graph=False)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def results(rng, start, stop):
+    lines = []
+    for i in range(start, stop):
+        result = {"model": rng.choice(["a", "b", "c"]), "size": rng.choice([1, 2, 4, 8]), "score": rng.random() * 100}
+        if i % 11 == 0:
+            del result["size"]
+        if i % 13 == 0:
+            result["score"] = None
+        lines.append((i, json.dumps(result)))
+    return lines
+
+
+def test_running_group_stats_match_group_stats():
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, 5, 3000)
+    values = rng.normal(1e6, 3, 3000)
+    running = RunningGroupStats()
+    for start in range(0, 3000, 700):
+        # Groups that don't have values yet come in later batches
+        num_groups = int(codes[:start + 700].max()) + 1
+        running.add(codes[start:start + 700], values[start:start + 700], num_groups)
+    expected = group_stats(codes, values, 5)
+    actual = running.stats()
+    for name in expected:
+        np.testing.assert_allclose(actual[name], expected[name], rtol=1e-9)
+    groups = [0, 1, 3, 4]
+    in_groups = np.isin(codes, groups)
+    np.testing.assert_allclose(running.anova(groups), one_way_anova(codes[in_groups], values[in_groups], 5))
+
+
+def test_running_regression_matches_scipy():
+    from scipy import stats
+    rng = np.random.default_rng(1)
+    codes = rng.integers(0, 4, 500)
+    x_values = np.array([1.0, 2.0, 4.0, 8.0])
+    values = x_values[codes] * 0.5 + rng.normal(0, 1, 500)
+    running = RunningGroupStats()
+    running.add(codes[:200], values[:200], 4)
+    running.add(codes[200:], values[200:], 4)
+    expected = stats.linregress(x_values[codes], values)
+    np.testing.assert_allclose(running.linregress([0, 1, 2, 3], x_values), tuple(expected), rtol=1e-9)
+
+
+@pytest.mark.parametrize("overrides", [{}, {"min_n": 200}, {"full_combinatoric": True}, {"y_value": None}])
+def test_follow_prints_the_same_stats_as_reading_everything(capsys, overrides):
+    pytest.importorskip("matplotlib")
+    args = stats_args(**overrides)
+    rng = random.Random(0)
+    batches = [results(rng, 0, 500), results(rng, 500, 510), [], results(rng, 510, 1300)]
+    graphing.follow(args, iter(batches))
+    followed = capsys.readouterr().out
+    # An update for each batch with new results
+    assert followed.count(" results at ") == 3 and "1300 results at" in followed
+    names = graphing.column_names(args.parts, args.y_value)
+    columns, *_ = graphing.extract_columns([line for batch in batches for line in batch], names)
+    graphing.report(args, columns, args.parts)
+    # The last update is the same as reading every result at once
+    expected = capsys.readouterr().out
+    assert followed.endswith(expected)
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+import json_backend
+from columns import ColumnBuilder
+
+VALUES = [
+    {"a": [1, 2.5, None], "b": {"c": "d", "é": "ü\n"}},
+    [True, False, 1e300, -0.0, 2 ** 63 - 1],
+    "  😀",
+    {"nested": [{"x": [[]]}, {}]},
+]
+
+
+@pytest.fixture(params=json_backend.available_backends())
+def backend(request):
+    previous = json_backend.get_backend()
+    json_backend.set_backend(request.param)
+    yield request.param
+    json_backend.set_backend(previous)
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_dumps_is_the_standard_library(backend, value):
+    assert json_backend.dumps(value) == json.dumps(value)
+    assert json_backend.dumps(value, indent=4) == json.dumps(value, indent=4)
+
+
+@pytest.mark.parametrize("text", [json.dumps(value) for value in VALUES] + ["NaN", '{"a": Infinity}', "1" * 400])
+def test_loads_matches_the_standard_library(backend, text):
+    assert json.dumps(json_backend.loads(text)) == json.dumps(json.loads(text))
+
+
+@pytest.mark.parametrize("text", ["{", '{"a": }', "[1,]", ""])
+def test_loads_raises_the_same_error(backend, text):
+    with pytest.raises(json.JSONDecodeError):
+        json_backend.loads(text)
+
+
+def test_column_categories_dont_depend_on_the_backend(backend):
+    builder = ColumnBuilder()
+    for value in VALUES:
+        builder.append(value)
+    assert builder.build().categories[:2] == [json.dumps(VALUES[0]), json.dumps(VALUES[1])]
@@ -0,0 +1,97 @@
+import json
+import random
+
+import pytest
+
+import lazy_json
+from lazy_json import PartialDecoder, build_path_tree
+
+
+@pytest.fixture(autouse=True)
+def always_lazy(monkeypatch):
+    # Scan every line, instead of only the long ones
+    monkeypatch.setattr(lazy_json, "LAZY_MIN_LENGTH", 0)
+
+
+def project(value, tree):
+    """What a partial decode should keep of a full decode."""
+    result = {}
+    for key, subtree in tree.items():
+        if key not in value:
+            continue
+        if subtree is True or not isinstance(value[key], dict):
+            result[key] = value[key]
+        else:
+            result[key] = project(value[key], subtree)
+    return result
+
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(9 if depth < 3 else 5)
+    if kind == 0:
+        return rng.choice([True, False, None])
+    if kind == 1:
+        return rng.choice([0, -1, 17, 2 ** 40, 1.5, -2.25e-7, 1e300])
+    if kind in (2, 3):
+        return "".join(rng.choice(['a', ' ', '"', '\\', '\n', '\t', 'é', '😀', '\x00', '/']) for _ in range(rng.randrange(12)))
+    if kind == 4:
+        return "x" * rng.randrange(200, 400)
+    if kind in (5, 6):
+        return [random_value(rng, depth + 1) for _ in range(rng.randrange(6))]
+    return {rng.choice(["a", "b", "doc", "q", 'k"ey']): random_value(rng, depth + 1) for _ in range(rng.randrange(5))}
+
+
+PATHS = ["a", "doc/q", "doc/b"]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_json_loads(seed):
+    rng = random.Random(seed)
+    value = {key: random_value(rng) for key in ["b", "a", "doc", "x", "q"] if rng.random() < 0.8}
+    if rng.random() < 0.5:
+        value["doc"] = {"q": random_value(rng), "b": random_value(rng), "other": random_value(rng)}
+    line = json.dumps(value, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, None, 1]))
+    if "\n" in line:
+        line = line.replace("\n", " ")
+    decoded = PartialDecoder(PATHS).loads(line)
+    assert project(decoded, build_path_tree(PATHS)) == project(json.loads(line), build_path_tree(PATHS))
+
+
+MALFORMED = [
+    '{"x": [1, 2,], "a": 1}',
+    '{"x": [1 2], "a": 1}',
+    '{"x": {"k" 1}, "a": 1}',
+    '{"x": {"k": 1,}, "a": 1}',
+    '{"x": {1: 1}, "a": 1}',
+    '{"x": [1, 2}, "a": 1}',
+    '{"x": tru, "a": 1}',
+    '{"x": 01, "a": 1}',
+    '{"x": 1., "a": 1}',
+    '{"x": "bad \\q escape", "a": 1}',
+    '{"x": "raw \t tab", "a": 1}',
+    '{"x": "\\u12", "a": 1}',
+    '{"x": "unterminated, "a": 1}',
+    '{"x": [[[], "a": 1}',
+    '{"x": 1 "a": 1}',
+    '{"x": 1, "a": 1,}',
+    '{"x": 1, "a": 1} trailing',
+    '{"x": undefined, "a": 1}',
+]
+
+
+@pytest.mark.parametrize("line", MALFORMED)
+def test_rejects_malformed_skipped_values(line):
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(line)
+    with pytest.raises(json.JSONDecodeError):
+        PartialDecoder(["a"]).loads(line)
+
+
+@pytest.mark.parametrize("line", [
+    '{"x": NaN, "a": [Infinity, -Infinity]}',
+    '{"x": "\\ud83d\\ude00 \\/ \\"", "a": "\\u00e9"}',
+    '{ "x" : [ 1 , { "y" : [ ] } ] , "a" : { } }',
+    '{"a": 1, "a": 2}',
+])
+def test_accepts_what_json_loads_accepts(line):
+    assert PartialDecoder(["a"]).loads(line)["a"] == json.loads(line)["a"]
@@ -0,0 +1,103 @@
+import json
+import sys
+
+import pytest
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+import object_store
+from object_store import S3Object, build_remote_index, list_s3_objects, load_remote_index
+
+BUCKET = "evals"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    # Small blocks, so that reading in order crosses many of them
+    monkeypatch.setattr(object_store, "BLOCK_SIZE", 1000)
+    with moto.mock_aws():
+        import boto3
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def lines(s3):
+    lines = [json.dumps({"doc_id": i, "text": "x" * (i % 23)}) for i in range(300)]
+    s3.put_object(Bucket=BUCKET, Key="run/results.jsonl", Body="".join(line + "\n" for line in lines).encode())
+    return lines
+
+
+def test_read_range(s3, lines):
+    data = "".join(line + "\n" for line in lines).encode()
+    with S3Object(f"s3://{BUCKET}/run/results.jsonl") as remote:
+        assert remote.size == len(data)
+        assert remote.read_range(10, 2500) == data[10:2500]
+        assert remote.read_range(len(data) - 5, len(data) + 100) == data[-5:]
+        assert remote.read_range(len(data), len(data) + 1) == b""
+        # Reading in order, across blocks
+        assert b"".join(remote.iter_blocks()) == data
+
+
+def test_read_fails_after_the_object_changes(s3, lines):
+    with S3Object(f"s3://{BUCKET}/run/results.jsonl") as remote:
+        s3.put_object(Bucket=BUCKET, Key="run/results.jsonl", Body=b'{"doc_id": "new"}\n')
+        from botocore.exceptions import ClientError
+        with pytest.raises(ClientError, match="PreconditionFailed"):
+            remote.read_range(0, 10)
+
+
+def test_index(s3, lines):
+    with S3Object(f"s3://{BUCKET}/run/results.jsonl") as remote:
+        assert load_remote_index(remote) is None
+        built = build_remote_index(remote)
+        assert len(built) == len(lines)
+    with S3Object(f"s3://{BUCKET}/run/results.jsonl") as remote:
+        index = load_remote_index(remote)
+        assert index is not None and len(index) == len(lines)
+        targets = [250, 0, 7, 299]
+        assert list(remote.lines_at(targets, index)) == [(i, lines[i]) for i in targets]
+        assert [line for _, line in remote.iter_lines(index.offset(100), 100)] == lines[100:]
+
+
+def test_index_is_per_version(s3, lines):
+    with S3Object(f"s3://{BUCKET}/run/results.jsonl") as remote:
+        build_remote_index(remote)
+    s3.put_object(Bucket=BUCKET, Key="run/results.jsonl", Body=b'{"doc_id": "new"}\n')
+    with S3Object(f"s3://{BUCKET}/run/results.jsonl") as remote:
+        assert load_remote_index(remote) is None
+
+
+def test_list_objects(s3):
+    for key in ["a/1.jsonl", "a/2.jsonl.gz", "a/notes.txt", "a/b/3.jsonl", "c/4.jsonl"]:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b"{}\n")
+    assert list_s3_objects(f"s3://{BUCKET}/a/") == [
+        f"s3://{BUCKET}/a/1.jsonl", f"s3://{BUCKET}/a/2.jsonl.gz", f"s3://{BUCKET}/a/b/3.jsonl",
+    ]
+    assert list_s3_objects(f"s3://{BUCKET}/a/*.jsonl") == [f"s3://{BUCKET}/a/1.jsonl", f"s3://{BUCKET}/a/b/3.jsonl"]
+
+
+def run_cli(monkeypatch, capsys, *argv):
+    import cli
+    monkeypatch.setattr(sys, "argv", ["pprint_problems", *argv, "--raw", "--renderer", "plain"])
+    cli.main()
+    return capsys.readouterr().out
+
+
+@pytest.mark.parametrize("build_index", [False, True])
+def test_cli_selection(s3, lines, monkeypatch, capsys, build_index):
+    url = f"s3://{BUCKET}/run/results.jsonl"
+    if build_index:
+        run_cli(monkeypatch, capsys, url, "--build-index", "-n", "0")
+    out = run_cli(monkeypatch, capsys, url, "--start", "120", "-n", "3")
+    for i in (120, 121, 122):
+        assert f'"doc_id": {i},' in out
+    assert '"doc_id": 119,' not in out and '"doc_id": 123,' not in out
+    assert ("Found 300 problems" in out) == build_index
+    out = run_cli(monkeypatch, capsys, url, "-r", "--seed", "1", "-n", "5")
+    assert out.count('"doc_id"') == 5
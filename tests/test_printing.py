@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+@pytest.mark.parametrize("suffix", [".html", ".txt"])
+def test_file_output(tmp_path, suffix):
+    pytest.importorskip("rich")
+    path = tmp_path / "data.jsonl"
+    path.write_text("".join(json.dumps({"doc_id": i, "question": f"question <{i}>"}) + "\n" for i in range(3)))
+    output = tmp_path / f"out{suffix}"
+    subprocess.run(
+        [sys.executable, "cli.py", str(path), "-p", "question", "--renderer", "rich", "--file-output", str(output)],
+        cwd=SRC, check=True, capture_output=True,
+    )
+    text = output.read_text()
+    if suffix == ".html":
+        assert text.startswith("<!DOCTYPE html>") and text.rstrip().endswith("</html>")
+        assert text.count("<pre") == 1 and "question &lt;2&gt;" in text
+        # Styles are inline, rather than in a stylesheet
+        assert "style=" in text and ".r1 {" not in text
+    else:
+        assert "question <2>" in text
+
+
+def test_file_output_needs_rich(tmp_path):
+    path = tmp_path / "data.jsonl"
+    path.write_text('{"doc_id": 0}\n')
+    output = tmp_path / "out.txt"
+    result = subprocess.run(
+        [sys.executable, "cli.py", str(path), "--renderer", "plain", "--file-output", str(output)],
+        cwd=SRC, capture_output=True, text=True,
+    )
+    assert result.returncode == 2
+    assert "--file-output needs the rich renderer" in result.stderr and "Traceback" not in result.stderr
+    assert not output.exists()
+
+
+def test_plain_renderer_matches_rich(tmp_path):
+    pytest.importorskip("rich")
+    path = tmp_path / "data.jsonl"
+    problem = {"doc_id": 0, "question": "How many marbles?", "answer": "4", "is_correct": True}
+    problem["doc"] = {"difficulty": 3, "tags": ["a", "b"]}
+    path.write_text(json.dumps(problem) + "\n")
+    command = [sys.executable, "cli.py", str(path), "--width", "90"]
+    plain = subprocess.run(command + ["--renderer", "plain"], cwd=SRC, check=True, capture_output=True, text=True)
+    output = tmp_path / "out.txt"
+    rich_command = command + ["--renderer", "rich", "--file-output", str(output)]
+    subprocess.run(rich_command, cwd=SRC, check=True, capture_output=True)
+    # Rich pads lines to the width and expands tabs
+    normalize = lambda text: [line.expandtabs().rstrip() for line in text.splitlines()]
+    assert normalize(plain.stdout) == normalize(output.read_text())
+
+
+def render_args(**overrides):
+    args = dict(manual_filter=False, follow=False, jobs=None, num_problems=None, search=None, query=None, start=None, number=None)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+@pytest.mark.parametrize("overrides, jobs", [
+    # Not known to be many problems
+    ({}, 1),
+    ({"number": 1000}, 1),
+    ({"num_problems": 10, "number": 1000}, 1),
+    ({"num_problems": 1000, "number": 5}, 1),
+    ({"num_problems": 1000, "start": 990}, 1),
+    ({"num_problems": 1000, "search": "x"}, 1),
+    ({"num_problems": 1000, "manual_filter": True, "jobs": 4}, 1),
+    # Known to be many
+    ({"num_problems": 1000}, 8),
+    ({"num_problems": 1000, "number": 100}, 8),
+    ({"jobs": 3}, 3),
+])
+def test_render_jobs(overrides, jobs, monkeypatch):
+    pytest.importorskip("rich")
+    import parsing
+    import printing
+    monkeypatch.setattr(printing, "USE_RICH", True)
+    monkeypatch.setattr(parsing.os, "cpu_count", lambda: 8)
+    assert parsing.get_render_jobs(render_args(**overrides)) == jobs
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from query import Query, json_equal
+
+
+def matching(expression, problems):
+    query = Query(expression)
+    return [problem for problem in problems if query.matches_line(json.dumps(problem))]
+
+
+PROBLEMS = [
+    {"doc_id": 1, "is_correct": True, "doc": {"difficulty": 2, "question": "how many marbles?"}, "tags": ["a", "b"]},
+    {"doc_id": 2, "is_correct": False, "doc": {"difficulty": 5, "question": "one marble"}, "tags": ["c"]},
+    {"doc_id": 3, "is_correct": False, "doc": {"difficulty": 4, "question": "nothing"}},
+]
+
+
+@pytest.mark.parametrize(
+    "expression, expected_ids",
+    [
+        ("is_correct == false and doc/difficulty > 3", [2, 3]),
+        ("doc/difficulty >= 4 or doc_id == 1", [1, 2, 3]),
+        ("not is_correct", [2, 3]),
+        ("doc_id in [1, 3]", [1, 3]),
+        ("tags contains 'c'", [2]),
+        ('doc/question ~ "marbles?"', [1, 2]),
+        ("doc/question contains 'marble' and not (doc_id == 1)", [2]),
+        ("tags == null", [3]),
+        ("tags != null", [1, 2]),
+        ("`doc/difficulty` < 3", [1]),
+        ("doc/missing > 1", []),
+    ],
+)
+def test_matching(expression, expected_ids):
+    assert [problem["doc_id"] for problem in matching(expression, PROBLEMS)] == expected_ids
+
+
+@pytest.mark.parametrize("expression", ["", "a ==", "(a == 1", "a == 1 b", "a in [b]", "a ~ 1", "a == 'x"])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        Query(expression)
+
+
+def test_required_literals():
+    query = Query('is_correct == false and doc/question contains "marble"')
+    assert set(query.required_literals) >= {"false", "marble", '"is_correct"'}
+    assert Query("a == 1 or b == 2").required_literals == []
+    assert Query("a != 'x'").required_literals == []
+
+
+@pytest.mark.parametrize(
+    "expression, problem",
+    [
+        ("a == false", {"a": 0, "b": "false"}),
+        ("a == false", {"a": 0, "b": "x"}),
+        ("a == 0", {"a": False}),
+        ("a == true", {"a": 1}),
+        ("a in [true]", {"a": 1}),
+        ("a in [1]", {"a": True}),
+        ("a == [1]", {"a": [True]}),
+        ("l contains 1", {"l": [True]}),
+        ("x > 0", {"x": True}),
+        ("x >= 1", {"x": True}),
+        ("x < 2", {"x": True}),
+        ("x <= 0", {"x": False}),
+        ("x > false", {"x": 1}),
+        ("x < y", {"x": False, "y": 1}),
+        ("l < [2]", {"l": [True]}),
+    ],
+)
+def test_booleans_are_not_numbers(expression, problem):
+    assert matching(expression, [problem]) == []
+    assert matching(f"not ({expression})", [problem]) == [problem]
+
+
+def test_booleans_are_ordered_with_booleans():
+    assert matching("x > false", [{"x": True}, {"x": False}, {"x": 1}]) == [{"x": True}]
+    assert matching("l >= [1, false]", [{"l": [1, True]}, {"l": [1.0, False]}, {"l": [1, 0]}]) == [
+        {"l": [1, True]}, {"l": [1.0, False]}
+    ]
+
+
+def test_numbers_compare_across_int_and_float():
+    assert matching("a == 1.0", [{"a": 1}]) == [{"a": 1}]
+    assert matching("a != false", [{"a": 0}]) == [{"a": 0}]
+
+
+def test_json_equal():
+    assert json_equal({"a": [1, "x"]}, {"a": [1.0, "x"]})
+    assert not json_equal({"a": True}, {"a": 1})
+    assert not json_equal(None, False)
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+import reading
+from reading import MappedFile, iter_lines, search_file, search_lines
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Many ranges, and workers even for a small file
+    monkeypatch.setattr(reading, "SEARCH_CHUNK_SIZE", 1000)
+    monkeypatch.setattr(reading, "PARALLEL_MIN_SIZE", 1)
+    monkeypatch.setattr(reading.os, "cpu_count", lambda: 4)
+
+
+def write_lines(path, num_lines, final_newline):
+    lines = []
+    for i in range(num_lines):
+        line = json.dumps({"i": i, "answer": "match" if i % 7 == 0 else "other"})
+        ending = "\r\n" if i % 3 == 0 else "\n"
+        if i % 11 == 0:
+            # A blank line, which still counts towards the line numbers
+            line = "   " if i % 2 else ""
+        lines.append(line + ending)
+    data = "".join(lines)
+    if not final_newline:
+        data = data.rstrip("\r\n") + "\n" + json.dumps({"i": "last", "answer": "match"})
+    path.write_bytes(data.encode())
+
+
+@pytest.mark.parametrize("final_newline", [True, False])
+@pytest.mark.parametrize("jobs", [4, None])
+def test_parallel_search_matches_a_serial_scan(tmp_path, small_chunks, final_newline, jobs):
+    path = tmp_path / "data.jsonl"
+    write_lines(path, 2000, final_newline)
+    with open(path, "rb") as f:
+        expected = list(search_lines(iter_lines(f), "match"))
+    with MappedFile(str(path)) as mapped:
+        assert len(mapped.split_ranges(mapped.size // reading.SEARCH_CHUNK_SIZE)) > 10
+        assert list(mapped.search("match")) == expected
+        assert list(search_file(mapped, "match", jobs=jobs)) == expected
+    assert expected[-1][1].endswith('"match"}') and not any(line.endswith("\r") for _, line in expected)
+    assert (expected[-1][0] == 2000) != final_newline
+
+
+def test_parallel_search_stops_early(tmp_path, small_chunks):
+    path = tmp_path / "data.jsonl"
+    write_lines(path, 2000, True)
+    with MappedFile(str(path)) as mapped:
+        matches = search_file(mapped, "match", jobs=4)
+        assert [next(matches)[0] for _ in range(3)] == [7, 14, 21]
+        matches.close()
@@ -0,0 +1,91 @@
+import argparse
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from cli import select_problems
+from indexing import build_index, load_index
+from reading import MappedFile, reservoir_sample
+
+
+def make_args(**kwargs):
+    defaults = dict(seed=None, start=0, number=None, randomize=True, search=None, query=None, jobs=None)
+    defaults.update(kwargs)
+    return argparse.Namespace(**defaults)
+
+
+def test_reservoir_sample_is_deterministic():
+    first = reservoir_sample(iter(range(10_000)), 5, random.Random(3))
+    second = reservoir_sample(iter(range(10_000)), 5, random.Random(3))
+    assert first == second
+    assert len(set(first)) == 5
+
+
+def test_reservoir_sample_of_sequence_matches_iterator():
+    for seed in range(20):
+        items = list(range(1000))
+        from_iterator = reservoir_sample(iter(items), 7, random.Random(seed))
+        assert reservoir_sample(items, 7, random.Random(seed)) == from_iterator
+        assert reservoir_sample(range(1000), 7, random.Random(seed)) == from_iterator
+        assert [int(i) for i in reservoir_sample(np.arange(1000), 7, random.Random(seed))] == from_iterator
+
+
+def test_reservoir_sample_with_fewer_items_than_k():
+    assert sorted(reservoir_sample(iter(range(3)), 5, random.Random(0))) == [0, 1, 2]
+    assert reservoir_sample(iter(range(3)), 0, random.Random(0)) == []
+
+
+def test_reservoir_sample_is_uniform():
+    rng = random.Random(0)
+    counts = Counter()
+    trials = 20_000
+    for _ in range(trials):
+        counts.update(reservoir_sample(iter(range(20)), 3, rng))
+    expected = trials * 3 / 20
+    assert all(abs(counts[i] - expected) < expected * 0.1 for i in range(20))
+
+
+@pytest.mark.parametrize("number", [3, None])
+def test_seeded_sample_is_the_same_with_and_without_an_index(tmp_path, number):
+    path = tmp_path / "problems.jsonl"
+    blank_lines = ["\n", "   \n", "\r\n", " \t\r\n"]
+    path.write_text("".join('{"i": %d}\n' % i if i % 13 else blank_lines[i % 4] for i in range(500)))
+    for seed in range(5):
+        args = make_args(seed=seed, number=number)
+        with MappedFile(str(path)) as mapped:
+            without_index = list(select_problems(args, mapped))
+        index = build_index(str(path))
+        with MappedFile(str(path)) as mapped:
+            with_index = list(select_problems(args, mapped, index))
+        assert with_index == without_index
+        assert all(line.strip() for _, line in with_index)
+        if number is not None:
+            assert len(with_index) == number
+
+
+def test_index_knows_which_lines_are_blank(tmp_path):
+    path = tmp_path / "problems.jsonl"
+    path.write_bytes(b'{"i": 0}\n   \n\r\n\n{"i": 4}\r\n \t\n{"i": 6}\n\xc2\xa0\n  ')
+    assert build_index(str(path)).nonblank_lines().tolist() == [0, 4, 6]
+    assert load_index(str(path)).nonblank_lines().tolist() == [0, 4, 6]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_sample_with_an_index_only_picks_problems(tmp_path, seed):
+    path = tmp_path / "problems.jsonl"
+    path.write_text("   \n".join('{"i": %d}\n' % i for i in range(6)))
+    index = build_index(str(path))
+    with MappedFile(str(path)) as mapped:
+        selected = list(select_problems(make_args(seed=seed, number=6), mapped, index))
+    assert sorted(i for i, _ in selected) == [0, 2, 4, 6, 8, 10]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_sample_only_picks_problems(tmp_path, seed):
+    path = tmp_path / "problems.jsonl"
+    path.write_text("   \n".join('{"i": %d}\n' % i for i in range(6)))
+    with MappedFile(str(path)) as mapped:
+        selected = list(select_problems(make_args(seed=seed, number=6), mapped))
+    assert sorted(i for i, _ in selected) == [0, 2, 4, 6, 8, 10]
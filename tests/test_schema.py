@@ -0,0 +1,25 @@
+import re
+
+import schema
+from schema import SchemaNode, format_schema
+
+
+def test_union_of_shapes():
+    node = SchemaNode()
+    node.add({"a": 1, "b": [1, "x"]})
+    node.add({"a": 2.5, "c": {"d": None}})
+    text = format_schema(node)
+    assert '"a": int 50% | float 50%' in text
+    assert '"b": list[int | str] (2 items) (in 50%)' in text
+    assert '"d": NoneType' in text
+
+
+def test_counts_distinct_keys_past_the_limit(monkeypatch):
+    monkeypatch.setattr(schema, "MAX_KEYS", 10)
+    node = SchemaNode()
+    # The same 500 extra keys in every problem
+    for _ in range(20):
+        node.add({f"id{i}": i for i in range(510)})
+    assert len(node.keys) == 10
+    more = int(re.search(r"about (\d+) more keys, past the first 10", format_schema(node)).group(1))
+    assert abs(more - 500) <= 25
@@ -0,0 +1,152 @@
+import json
+import os
+
+import pytest
+
+import search_index
+from reading import MappedFile
+from search_index import build_search_index, load_search_index
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # Many blocks, even in a small file
+    monkeypatch.setattr(search_index, "BLOCK_SIZE", 256)
+
+
+def write_problems(path, problems, mode="w"):
+    with open(path, mode) as f:
+        for problem in problems:
+            f.write(json.dumps(problem) + "\n")
+
+
+def problems(start, stop):
+    return [{"i": i, "answer": f"answer {i * 7919 % 1000}", "tag": "even" if i % 2 == 0 else "odd"} for i in range(start, stop)]
+
+
+def search_both(path, search):
+    with MappedFile(str(path)) as mapped:
+        index = load_search_index(str(path))
+        assert index is not None
+        return list(index.search(mapped, search)), list(mapped.search(search))
+
+
+SEARCHES = ["answer 12", "odd", '"i": 3', "answer 999", "not in the file", "ab"]
+
+
+def test_search_matches_a_full_scan(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 500))
+    index = build_search_index(str(path))
+    assert len(index.segments) == 1 and index.num_blocks > 10
+    for search in SEARCHES:
+        indexed, scanned = search_both(path, search)
+        assert indexed == scanned
+
+
+def test_appending_adds_a_segment(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 300))
+    build_search_index(str(path))
+    # Found through the index and by scanning the unindexed tail
+    write_problems(path, problems(300, 400), mode="a")
+    for search in SEARCHES:
+        indexed, scanned = search_both(path, search)
+        assert indexed == scanned
+    index = build_search_index(str(path))
+    assert len(index.segments) == 2
+    assert index.indexed_lines == 400
+    for search in SEARCHES:
+        indexed, scanned = search_both(path, search)
+        assert indexed == scanned
+
+
+def test_merging_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_SEGMENTS", 3)
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 100))
+    build_search_index(str(path))
+    for start, num_segments in [(100, 2), (200, 3), (300, 1), (400, 2)]:
+        write_problems(path, problems(start, start + 100), mode="a")
+        index = build_search_index(str(path))
+        assert len(index.segments) == num_segments
+        for search in SEARCHES:
+            indexed, scanned = search_both(path, search)
+            assert indexed == scanned
+
+
+def test_merged_segment_has_the_same_postings(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 100))
+    build_search_index(str(path))
+    for start in (100, 150):
+        write_problems(path, problems(start, start + 50), mode="a")
+        index = build_search_index(str(path))
+    segments = index.segments
+    merged = search_index._merge_segments(segments)
+    assert merged.num_blocks == sum(segment.num_blocks for segment in segments)
+    assert merged.block_starts.tolist() == sorted(set().union(*(segment.block_starts.tolist() for segment in segments)))
+    first_blocks = [0, segments[0].num_blocks, segments[0].num_blocks + segments[1].num_blocks]
+    for position, code in enumerate(merged.keys):
+        expected = []
+        for segment, first_block in zip(segments, first_blocks):
+            expected.extend(int(block) + first_block for block in segment.candidate_blocks([code]))
+        assert merged.postings[merged.posting_starts[position]:merged.posting_starts[position + 1]].tolist() == expected
+
+
+def test_partial_last_line_is_left_for_later(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 50))
+    with open(path, "a") as f:
+        f.write(json.dumps({"i": 50, "answer": "unfinished"}))
+    index = build_search_index(str(path))
+    assert index.indexed_lines == 50
+    indexed, scanned = search_both(path, "unfinished")
+    assert indexed == scanned == [(50, '{"i": 50, "answer": "unfinished"}')]
+
+
+def test_rewriting_the_file_invalidates_the_index(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 100))
+    build_search_index(str(path))
+    data = bytearray(path.read_bytes())
+    data[10:13] = b"999"
+    path.write_bytes(bytes(data))
+    assert load_search_index(str(path)) is None
+    # Rebuilt from scratch
+    index = build_search_index(str(path))
+    assert len(index.segments) == 1
+    indexed, scanned = search_both(path, "999")
+    assert indexed == scanned
+
+
+def test_unfinished_segment_is_ignored(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 100))
+    build_search_index(str(path))
+    write_problems(path, problems(100, 200), mode="a")
+    build_search_index(str(path))
+    index_path = tmp_path / "data.jsonl.pptri"
+    data = index_path.read_bytes()
+    index_path.write_bytes(data[:-5])
+    index = load_search_index(str(path))
+    assert len(index.segments) == 1 and index.indexed_lines == 100
+    # The next update writes over what's left of it
+    index = build_search_index(str(path))
+    assert len(index.segments) == 2 and index.file_end == len(data)
+
+
+def test_file_changing_while_it_is_indexed_leaves_the_index_alone(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "data.jsonl"
+    write_problems(path, problems(0, 300))
+    old = build_search_index(str(path))
+    index_size = os.path.getsize(search_index.search_index_path(str(path)))
+    write_problems(path, problems(300, 400), mode="a")
+    # Like the file shrinking between being mapped and being stamped
+    monkeypatch.setattr(search_index, "stamp_prefix", lambda *args: None)
+    assert build_search_index(str(path)) is None
+    assert "wasn't updated" in capsys.readouterr().out
+    assert os.path.getsize(search_index.search_index_path(str(path))) == index_size
+    monkeypatch.undo()
+    loaded = load_search_index(str(path))
+    assert len(loaded.segments) == 1 and loaded.indexed_size == old.indexed_size < path.stat().st_size
@@ -0,0 +1,39 @@
+import argparse
+import json
+
+import json_backend
+from shards import _select_in_shard, iter_shard_lines
+
+
+def write_shards(tmp_path, num_shards, num_lines):
+    paths = []
+    for shard in range(num_shards):
+        path = tmp_path / f"run_{shard}.jsonl"
+        path.write_text("".join(json.dumps({"shard": shard, "line": i}) + "\n" for i in range(num_lines)))
+        paths.append(str(path))
+    return paths
+
+
+def shard_args(**overrides):
+    args = dict(search='"line"', query=None, where=None, randomize=False, start=None, number=None, jobs=2,
+                s3_endpoint_url=None)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_select_in_shard_stops_at_the_limit(tmp_path):
+    [path] = write_shards(tmp_path, 1, 100)
+    backend = json_backend.get_backend()
+    assert len(_select_in_shard((path, '"line"', None, backend, None, None))) == 100
+    matches = _select_in_shard((path, '"line"', None, backend, None, 7))
+    assert [index for index, _ in matches] == list(range(7))
+
+
+def test_limited_selection_is_the_start_of_the_whole_selection(tmp_path):
+    paths = write_shards(tmp_path, 4, 30)
+    everything = list(iter_shard_lines(shard_args(), paths))
+    assert len(everything) == 120
+    assert everything[0][0] == f"{paths[0]}:0" and everything[-1][0] == f"{paths[3]}:29"
+    for start, number in [(0, 5), (25, 10), (100, 50)]:
+        selected = list(iter_shard_lines(shard_args(start=start, number=number), paths))
+        assert selected == everything[:start + number]
@@ -0,0 +1,112 @@
+import math
+import pickle
+import random
+
+import pytest
+
+from parsing import DataRange
+from sketches import ExactSum, HyperLogLog, stable_hash
+
+
+def test_exact_sum_is_exact():
+    rng = random.Random(0)
+    values = [rng.uniform(-1, 1) * 10 ** rng.randrange(-20, 20) for _ in range(10000)] + [1e100, 1.0, -1e100]
+    total = ExactSum()
+    for value in values:
+        total.add(value)
+    assert total.value() == math.fsum(values)
+
+
+def test_exact_sum_merge_is_order_independent():
+    rng = random.Random(1)
+    values = [rng.uniform(-1e10, 1e10) for _ in range(3000)]
+    parts = [ExactSum() for _ in range(3)]
+    for i, value in enumerate(values):
+        parts[i % 3].add(value)
+    merged = ExactSum()
+    for part in reversed(parts):
+        merged.merge(part)
+    assert merged.value() == math.fsum(values)
+
+
+def test_exact_sum_infinities():
+    total = ExactSum()
+    for value in [1.0, math.inf, -math.inf]:
+        total.add(value)
+    assert math.isnan(total.value())
+
+
+def test_stable_hash_is_equal_for_equal_values():
+    assert stable_hash(1) == stable_hash(1.0) == stable_hash(True)
+    assert stable_hash("1") != stable_hash(1)
+    assert stable_hash("a" * 1000) == stable_hash("a" * 1000)
+
+
+@pytest.mark.parametrize("n", [10, 1000, 100000])
+def test_hyperloglog_estimate(n):
+    sketch = HyperLogLog()
+    for i in range(n):
+        sketch.add(f"value {i}")
+        # Repeats don't count
+        sketch.add(f"value {i // 2}")
+    assert abs(sketch.estimate() - n) <= max(1, 0.05 * n)
+
+
+def test_hyperloglog_merge_is_the_union():
+    a, b, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(20000):
+        (a if i % 2 else b).add(i)
+        both.add(i)
+    a.merge(b)
+    assert a.registers == both.registers
+
+
+def summarize(values):
+    data_range = DataRange()
+    for value in values:
+        data_range.add(value)
+    return data_range
+
+
+def summary(data_range):
+    # The sums, minimum and maximum are only kept while all the values are numbers
+    numbers = data_range.minimum, data_range.maximum, data_range.int_sum, data_range.float_sum.value()
+    numbers = numbers if data_range.all_numbers else None
+    # Values mixed with lists aren't counted
+    distinct = (data_range.distinct_str(), data_range.counts) if not data_range.unhashable else None
+    return data_range.count, data_range.all_strings, numbers, distinct, str(data_range)
+
+
+@pytest.mark.parametrize("values", [
+    [1, 2, 3.5, -7, 2],
+    ["a", "b", "a", "x" * 1000, "x" * 1000, "y" * 1000],
+    [True, 1, 1.0, None, "s"],
+    [[1, 2], "abc", 5],
+    [f"long value {i} " * 10 for i in range(30000)],
+    list(range(20000)) + [f"{i}" for i in range(20000)],
+])
+def test_data_range_merge_is_like_adding_everything(values):
+    whole = summarize(values)
+    for split in (0, 1, len(values) // 3, len(values) - 1):
+        merged = summarize(values[:split])
+        merged.merge(summarize(values[split:]))
+        assert summary(merged) == summary(whole)
+
+
+def test_data_range_counts_equal_values_once():
+    data_range = summarize(["a", "b", "a", "x" * 1000, "x" * 1000, 1, 1.0, True])
+    assert data_range.distinct_str() == "4"
+
+
+def test_data_range_keeps_hashes_of_long_strings():
+    data_range = summarize(["x" * 100000 + str(i) for i in range(100)])
+    assert data_range.distinct_str() == "100"
+    assert len(pickle.dumps(data_range)) < 10000
+
+
+def test_data_range_switches_to_the_sketch(monkeypatch):
+    monkeypatch.setattr(DataRange, "MAX_EXACT_DISTINCT", 100)
+    data_range = summarize([f"value {i}" for i in range(1000)] + ["z" * 100 + str(i) for i in range(1000)])
+    assert data_range.distinct is None
+    assert data_range.distinct_str().startswith("~")
+    assert abs(int(data_range.distinct_str()[1:]) - 2000) <= 100